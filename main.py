@@ -6,14 +6,29 @@ Usage:
     python main.py [OPTIONS]
 
 Environment Variables:
-    PHONE_AGENT_BASE_URL: Model API base URL (default: http://localhost:8000/v1)
+    PHONE_AGENT_BASE_URL: Model API base URL (default: http://localhost:8000/v1).
+        Comma-separate several URLs to balance requests across servers
+    PHONE_AGENT_BALANCING: How requests are spread across several base URLs
+        (least_outstanding or latency_weighted)
+    PHONE_AGENT_HEDGE_PERCENTILE: Hedge slow requests to a second base URL once
+        the first token is later than this percentile of recent requests
     PHONE_AGENT_MODEL: Model name (default: autoglm-phone-9b)
     PHONE_AGENT_API_KEY: API key for model authentication (default: EMPTY)
     PHONE_AGENT_MAX_STEPS: Maximum steps per task (default: 100)
     PHONE_AGENT_DEVICE_ID: ADB device ID for multi-device setups
+    PHONE_AGENT_ADB_BACKEND: How ADB commands are sent (subprocess or socket)
+    PHONE_AGENT_PERSISTENT_SHELL: Set to 1 to send input commands through a
+        long-lived adb shell session per device
+    PHONE_AGENT_IMAGE_MAX_EDGE: Downscale screenshots to this long edge in pixels
+    PHONE_AGENT_IMAGE_FORMAT: Screenshot encoding sent to the model (png, jpeg, webp)
+    PHONE_AGENT_TASKS_FILE: Run the tasks in this file (one per line) across
+        all attached devices
+    PHONE_AGENT_METRICS_PORT: Serve Prometheus metrics on this port
 """
 
 import argparse
+import atexit
+import json
 import os
 import shutil
 import subprocess
@@ -23,10 +38,21 @@ from urllib.parse import urlparse
 from openai import OpenAI
 
 from phone_agent import PhoneAgent
-from phone_agent.adb import ADBConnection, list_devices
-from phone_agent.agent import AgentConfig
+from phone_agent.adb import (
+    ADBConnection,
+    ImageEncoding,
+    SettleConfig,
+    list_devices,
+    set_persistent_shell,
+    set_transport,
+)
+from phone_agent.agent import AgentConfig, FrameDiffPolicy
 from phone_agent.config.apps import list_supported_apps
-from phone_agent.model import ModelConfig
+from phone_agent.fleet import FleetRunner
+from phone_agent.metrics import start_metrics_server
+from phone_agent.model import ImageHistory, ModelConfig
+from phone_agent.replay import DEFAULT_CACHE_DIR, TrajectoryCache
+from phone_agent.trace import open_tracer
 
 
 def check_system_requirements() -> bool:
@@ -263,6 +289,9 @@ Examples:
     # Specify model endpoint
     python main.py --base-url http://localhost:8000/v1
 
+    # Balance requests across several model servers
+    python main.py --base-url http://10.0.0.2:8000/v1,http://10.0.0.3:8000/v1
+
     # Use API key for authentication
     python main.py --apikey sk-xxxxx
 
@@ -280,6 +309,9 @@ Examples:
 
     # List supported apps
     python main.py --list-apps
+
+    # Run a queue of tasks (one per line) on all connected devices
+    python main.py --tasks-file tasks.txt
         """,
     )
 
@@ -288,7 +320,29 @@ Examples:
         "--base-url",
         type=str,
         default=os.getenv("PHONE_AGENT_BASE_URL", "http://localhost:8000/v1"),
-        help="Model API base URL",
+        help="Model API base URL (comma-separate several URLs to load balance)",
+    )
+
+    parser.add_argument(
+        "--balancing",
+        type=str,
+        choices=["least_outstanding", "latency_weighted"],
+        default=os.getenv("PHONE_AGENT_BALANCING", "least_outstanding"),
+        help="How requests are spread across several base URLs "
+        "(default: least_outstanding)",
+    )
+
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=(
+            float(os.environ["PHONE_AGENT_HEDGE_PERCENTILE"])
+            if os.getenv("PHONE_AGENT_HEDGE_PERCENTILE")
+            else None
+        ),
+        help="Send a duplicate request to another base URL when the first "
+        "token is later than this percentile of recent requests, e.g. 95 "
+        "(default: off)",
     )
 
     parser.add_argument(
@@ -342,6 +396,30 @@ Examples:
         "--list-devices", action="store_true", help="List connected devices and exit"
     )
 
+    parser.add_argument(
+        "--adb-backend",
+        type=str,
+        choices=["subprocess", "socket"],
+        default=os.getenv("PHONE_AGENT_ADB_BACKEND", "subprocess"),
+        help="Run adb commands by forking adb (subprocess) or by talking to the "
+        "adb server socket directly (socket, default: subprocess)",
+    )
+
+    parser.add_argument(
+        "--persistent-shell",
+        action="store_true",
+        default=os.getenv("PHONE_AGENT_PERSISTENT_SHELL", "").lower() in ("1", "true"),
+        help="Send input commands through a long-lived adb shell session per device",
+    )
+
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=int(os.getenv("PHONE_AGENT_METRICS_PORT", "0")) or None,
+        help="Serve Prometheus metrics (step latency, model requests and "
+        "tokens, adb errors, tasks) over HTTP on this port",
+    )
+
     parser.add_argument(
         "--enable-tcpip",
         type=int,
@@ -351,6 +429,108 @@ Examples:
         help="Enable TCP/IP debugging on USB device (default port: 5555)",
     )
 
+    # Screenshot encoding options
+    parser.add_argument(
+        "--image-max-edge",
+        type=int,
+        default=(
+            int(os.getenv("PHONE_AGENT_IMAGE_MAX_EDGE"))
+            if os.getenv("PHONE_AGENT_IMAGE_MAX_EDGE")
+            else None
+        ),
+        metavar="PIXELS",
+        help="Downscale screenshots so the long edge is at most PIXELS (default: off)",
+    )
+
+    parser.add_argument(
+        "--image-format",
+        type=str,
+        choices=["png", "jpeg", "webp"],
+        default=os.getenv("PHONE_AGENT_IMAGE_FORMAT", "png"),
+        help="Screenshot encoding sent to the model (default: png)",
+    )
+
+    parser.add_argument(
+        "--image-quality",
+        type=int,
+        default=85,
+        help="Quality for jpeg/webp screenshots, 1-100 (default: 85)",
+    )
+
+    parser.add_argument(
+        "--adaptive-settle",
+        action="store_true",
+        help="Wait after actions until the screen stops changing, polling raw "
+        "frames, instead of sleeping a fixed delay",
+    )
+
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="Use the last frame of the post-action settle wait as the next "
+        "screenshot instead of capturing again (needs --adaptive-settle)",
+    )
+
+    parser.add_argument(
+        "--keep-screenshots",
+        type=int,
+        default=0,
+        help="Keep this many recent screenshots in the context as small "
+        "thumbnails (default: 0, only the current screenshot is sent)",
+    )
+
+    parser.add_argument(
+        "--skip-unchanged",
+        action="store_true",
+        help="When an action left the screen unchanged, wait and capture again "
+        "instead of asking the model about the same screen",
+    )
+
+    parser.add_argument(
+        "--replay-cache",
+        nargs="?",
+        const=DEFAULT_CACHE_DIR,
+        default=None,
+        metavar="DIR",
+        help="Record successful runs and replay them, without model calls, on "
+        "later runs of the same task while the screens match "
+        f"(default directory: {DEFAULT_CACHE_DIR})",
+    )
+
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write per-step stage timings to FILE: JSON lines for a .jsonl "
+        "file, otherwise Chrome trace events (open in chrome://tracing or "
+        "ui.perfetto.dev)",
+    )
+
+    parser.add_argument(
+        "--stable-prefix",
+        action="store_true",
+        help="Keep the prompt prefix identical across steps and tasks so the "
+        "model server's prefix cache is reused (moves the date out of the "
+        "system prompt and keeps earlier screenshots in the context)",
+    )
+
+    # Fleet options
+    parser.add_argument(
+        "--tasks-file",
+        type=str,
+        default=os.getenv("PHONE_AGENT_TASKS_FILE"),
+        metavar="FILE",
+        help="Run the tasks in FILE (one per line) concurrently across all "
+        "connected devices",
+    )
+
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=2,
+        help="Times a fleet task is retried on another device after its device "
+        "disconnects (default: 2)",
+    )
+
     # Other options
     parser.add_argument(
         "--quiet", "-q", action="store_true", help="Suppress verbose output"
@@ -448,6 +628,29 @@ def handle_device_commands(args) -> bool:
     return False
 
 
+def run_fleet(args, model_config: ModelConfig, agent_config: AgentConfig) -> None:
+    """Run the tasks file across all connected devices and print the report."""
+    with open(args.tasks_file, encoding="utf-8") as f:
+        tasks = [line.strip() for line in f if line.strip()]
+
+    print(f"\nRunning {len(tasks)} tasks across the connected devices...\n")
+    runner = FleetRunner(
+        model_config=model_config,
+        agent_config=agent_config,
+        max_retries=args.max_retries,
+    )
+    report = runner.run_sync(tasks)
+
+    print("=" * 50)
+    for result in report.results:
+        status_icon = "✓" if result.success else "✗"
+        print(
+            f"  {status_icon} [{result.device_id or '-'}] {result.task}: {result.message}"
+        )
+    print("-" * 50)
+    print(json.dumps(report.as_dict(), ensure_ascii=False, indent=2))
+
+
 def main():
     """Main entry point."""
     args = parse_args()
@@ -459,6 +662,11 @@ def main():
             print(f"  - {app}")
         return
 
+    set_transport(args.adb_backend)
+    set_persistent_shell(args.persistent_shell)
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
     # Handle device commands (these may need partial system checks)
     if handle_device_commands(args):
         return
@@ -468,14 +676,19 @@ def main():
         sys.exit(1)
 
     # Check model API connectivity and model availability
-    if not check_model_api(args.base_url, args.model, args.apikey):
-        sys.exit(1)
+    base_urls = [url.strip() for url in args.base_url.split(",") if url.strip()]
+    for base_url in base_urls:
+        if not check_model_api(base_url, args.model, args.apikey):
+            sys.exit(1)
 
     # Create configurations
     model_config = ModelConfig(
-        base_url=args.base_url,
+        base_url=base_urls[0],
         model_name=args.model,
         api_key=args.apikey,
+        endpoints=base_urls if len(base_urls) > 1 else [],
+        balancing=args.balancing,
+        hedge_percentile=args.hedge_percentile,
     )
 
     agent_config = AgentConfig(
@@ -483,8 +696,29 @@ def main():
         device_id=args.device_id,
         verbose=not args.quiet,
         lang=args.lang,
+        pipelined=args.pipelined,
+        stable_prefix=args.stable_prefix,
+        frame_diff=FrameDiffPolicy() if args.skip_unchanged else None,
+        replay_cache=TrajectoryCache(args.replay_cache) if args.replay_cache else None,
+        tracer=open_tracer(args.trace) if args.trace else None,
+        image_history=(
+            ImageHistory(keep=args.keep_screenshots) if args.keep_screenshots else None
+        ),
+        settle_config=SettleConfig() if args.adaptive_settle else None,
+        image_encoding=ImageEncoding(
+            max_long_edge=args.image_max_edge,
+            format=args.image_format,
+            quality=args.image_quality,
+        ),
     )
 
+    if agent_config.tracer is not None:
+        atexit.register(agent_config.tracer.close)
+
+    if args.tasks_file:
+        run_fleet(args, model_config, agent_config)
+        return
+
     # Create agent
     agent = PhoneAgent(
         model_config=model_config,
@@ -496,7 +730,7 @@ def main():
     print("Phone Agent - AI-powered phone automation")
     print("=" * 50)
     print(f"Model: {model_config.model_name}")
-    print(f"Base URL: {model_config.base_url}")
+    print(f"Base URL: {', '.join(base_urls)}")
     print(f"Max Steps: {agent_config.max_steps}")
     print(f"Language: {agent_config.lang}")
 
@@ -1,23 +1,33 @@
 """Action handler for processing AI model outputs."""
 
 import ast
+import asyncio
+import inspect
 import re
 import time
 from dataclasses import dataclass
 from typing import Any, Callable
 
 from phone_agent.adb import (
+    AsyncKeyboardManager,
+    KeyboardManager,
+    Screenshot,
+    SettleConfig,
+    SettleTracker,
     back,
-    clear_text,
-    detect_and_set_adb_keyboard,
+    back_async,
     double_tap,
+    double_tap_async,
     home,
+    home_async,
     launch_app,
+    launch_app_async,
     long_press,
-    restore_keyboard,
+    long_press_async,
     swipe,
+    swipe_async,
     tap,
-    type_text,
+    tap_async,
 )
 
 
@@ -29,6 +39,10 @@ class ActionResult:
     should_finish: bool
     message: str | None = None
     requires_confirmation: bool = False
+    # Settle wait still owed by the caller (defer_settle mode)
+    settle_delay: float = 0.0
+    # Seconds already spent waiting for the screen to settle
+    settle_time: float = 0.0
 
 
 class ActionHandler:
@@ -40,20 +54,51 @@ class ActionHandler:
         confirmation_callback: Optional callback for sensitive action confirmation.
             Should return True to proceed, False to cancel.
         takeover_callback: Optional callback for takeover requests (login, captcha).
+        action_delay: Seconds to let the screen settle after a device action
+            when adaptive settle detection is off or unsupported.
+        defer_settle: If True, return immediately after device actions and report
+            the pending wait in ActionResult.settle_delay so the caller can
+            overlap it with other work.
+        settle_config: Thresholds for adaptive settle detection, which waits
+            until the screen stops changing. If None, sleeps action_delay.
     """
 
+    # Actions that change the screen and need time to settle afterwards
+    SETTLING_ACTIONS = {
+        "Launch",
+        "Tap",
+        "Swipe",
+        "Back",
+        "Home",
+        "Double Tap",
+        "Long Press",
+        "Type",
+        "Type_Name",
+    }
+
     def __init__(
         self,
         device_id: str | None = None,
         confirmation_callback: Callable[[str], bool] | None = None,
         takeover_callback: Callable[[str], None] | None = None,
+        action_delay: float = 1.0,
+        defer_settle: bool = False,
+        settle_config: SettleConfig | None = None,
     ):
         self.device_id = device_id
         self.confirmation_callback = confirmation_callback or self._default_confirmation
         self.takeover_callback = takeover_callback or self._default_takeover
+        self.action_delay = action_delay
+        self.defer_settle = defer_settle
+        self.settle_tracker = SettleTracker(device_id, settle_config, action_delay)
+        self.keyboard = KeyboardManager(device_id)
 
     def execute(
-        self, action: dict[str, Any], screen_width: int, screen_height: int
+        self,
+        action: dict[str, Any],
+        screen_width: int,
+        screen_height: int,
+        before: Screenshot | None = None,
     ) -> ActionResult:
         """
         Execute an action from the AI model.
@@ -62,10 +107,54 @@ class ActionHandler:
             action: The action dictionary from the model.
             screen_width: Current screen width in pixels.
             screen_height: Current screen height in pixels.
+            before: Screen the action was chosen on, lets the settle wait tell
+                when the action took effect.
 
         Returns:
             ActionResult indicating success and whether to finish.
         """
+        action_name = action.get("action")
+        handler_method = self._get_handler(action_name)
+
+        result = self._check_action(action, handler_method)
+        if result is not None:
+            return result
+
+        try:
+            result = handler_method(action, screen_width, screen_height)
+        except Exception as e:
+            return ActionResult(
+                success=False, should_finish=False, message=f"Action failed: {e}"
+            )
+
+        if result.success and action_name in self.SETTLING_ACTIONS:
+            if self.defer_settle:
+                result.settle_delay = self.action_delay
+            else:
+                settle = self.settle_tracker.wait(action_name, before=before)
+                result.settle_time = settle.elapsed
+        return result
+
+    def settle_stats(self) -> dict[str, dict[str, float]]:
+        """Per-action settle metrics (count, timeouts, mean/max wait)."""
+        return self.settle_tracker.stats()
+
+    def release_keyboard(self) -> None:
+        """
+        Restore the user's keyboard if a Type action switched it this task.
+
+        Runs when a task ends, so errors are printed rather than raised and
+        never replace the task's result or the exception that ended it.
+        """
+        try:
+            self.keyboard.restore()
+        except Exception as e:
+            print(f"Error restoring keyboard: {e}")
+
+    def _check_action(
+        self, action: dict[str, Any], handler_method: Callable | None
+    ) -> ActionResult | None:
+        """Result for actions that need no handler (finish, unknown), else None."""
         action_type = action.get("_metadata")
 
         if action_type == "finish":
@@ -80,22 +169,14 @@ class ActionHandler:
                 message=f"Unknown action type: {action_type}",
             )
 
-        action_name = action.get("action")
-        handler_method = self._get_handler(action_name)
-
         if handler_method is None:
             return ActionResult(
                 success=False,
                 should_finish=False,
-                message=f"Unknown action: {action_name}",
+                message=f"Unknown action: {action.get('action')}",
             )
 
-        try:
-            return handler_method(action, screen_width, screen_height)
-        except Exception as e:
-            return ActionResult(
-                success=False, should_finish=False, message=f"Action failed: {e}"
-            )
+        return None
 
     def _get_handler(self, action_name: str) -> Callable | None:
         """Get the handler method for an action."""
@@ -131,7 +212,7 @@ class ActionHandler:
         if not app_name:
             return ActionResult(False, False, "No app name specified")
 
-        success = launch_app(app_name, self.device_id)
+        success = launch_app(app_name, self.device_id, delay=0)
         if success:
             return ActionResult(True, False)
         return ActionResult(False, False, f"App not found: {app_name}")
@@ -153,28 +234,20 @@ class ActionHandler:
                     message="User cancelled sensitive operation",
                 )
 
-        tap(x, y, self.device_id)
+        tap(x, y, self.device_id, delay=0)
         return ActionResult(True, False)
 
     def _handle_type(self, action: dict, width: int, height: int) -> ActionResult:
         """Handle text input action."""
         text = action.get("text", "")
 
-        # Switch to ADB keyboard
-        original_ime = detect_and_set_adb_keyboard(self.device_id)
-        time.sleep(1.0)
-
-        # Clear existing text and type new text
-        clear_text(self.device_id)
-        time.sleep(1.0)
-
-        type_text(text, self.device_id)
-        time.sleep(1.0)
-
-        # Restore original keyboard
-        restore_keyboard(original_ime, self.device_id)
-        time.sleep(1.0)
-
+        # ADB keyboard stays selected until release_keyboard() at task end
+        if not self.keyboard.type_text(text):
+            return ActionResult(
+                success=False,
+                should_finish=False,
+                message="Text input was not delivered to ADB Keyboard",
+            )
         return ActionResult(True, False)
 
     def _handle_swipe(self, action: dict, width: int, height: int) -> ActionResult:
@@ -188,17 +261,24 @@ class ActionHandler:
         start_x, start_y = self._convert_relative_to_absolute(start, width, height)
         end_x, end_y = self._convert_relative_to_absolute(end, width, height)
 
-        swipe(start_x, start_y, end_x, end_y, device_id=self.device_id)
+        swipe(
+            start_x,
+            start_y,
+            end_x,
+            end_y,
+            device_id=self.device_id,
+            delay=0,
+        )
         return ActionResult(True, False)
 
     def _handle_back(self, action: dict, width: int, height: int) -> ActionResult:
         """Handle back button action."""
-        back(self.device_id)
+        back(self.device_id, delay=0)
         return ActionResult(True, False)
 
     def _handle_home(self, action: dict, width: int, height: int) -> ActionResult:
         """Handle home button action."""
-        home(self.device_id)
+        home(self.device_id, delay=0)
         return ActionResult(True, False)
 
     def _handle_double_tap(self, action: dict, width: int, height: int) -> ActionResult:
@@ -208,7 +288,7 @@ class ActionHandler:
             return ActionResult(False, False, "No element coordinates")
 
         x, y = self._convert_relative_to_absolute(element, width, height)
-        double_tap(x, y, self.device_id)
+        double_tap(x, y, self.device_id, delay=0)
         return ActionResult(True, False)
 
     def _handle_long_press(self, action: dict, width: int, height: int) -> ActionResult:
@@ -218,7 +298,7 @@ class ActionHandler:
             return ActionResult(False, False, "No element coordinates")
 
         x, y = self._convert_relative_to_absolute(element, width, height)
-        long_press(x, y, device_id=self.device_id)
+        long_press(x, y, device_id=self.device_id, delay=0)
         return ActionResult(True, False)
 
     def _handle_wait(self, action: dict, width: int, height: int) -> ActionResult:
@@ -267,6 +347,203 @@ class ActionHandler:
         input(f"{message}\nPress Enter after completing manual operation...")
 
 
+class AsyncActionHandler(ActionHandler):
+    """
+    ActionHandler for asyncio agents.
+
+    Device actions and settle waits are awaited instead of blocking, so one
+    event loop can drive many devices. Confirmation and takeover callbacks may
+    be plain functions (run in a worker thread, since they usually wait for
+    console input) or coroutine functions.
+
+    Takes the same arguments as ActionHandler.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.keyboard = AsyncKeyboardManager(self.device_id)
+
+    async def execute(
+        self,
+        action: dict[str, Any],
+        screen_width: int,
+        screen_height: int,
+        before: Screenshot | None = None,
+    ) -> ActionResult:
+        """Async version of ActionHandler.execute()."""
+        action_name = action.get("action")
+        handler_method = self._get_handler(action_name)
+
+        result = self._check_action(action, handler_method)
+        if result is not None:
+            return result
+
+        try:
+            result = handler_method(action, screen_width, screen_height)
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception as e:
+            return ActionResult(
+                success=False, should_finish=False, message=f"Action failed: {e}"
+            )
+
+        if result.success and action_name in self.SETTLING_ACTIONS:
+            if self.defer_settle:
+                result.settle_delay = self.action_delay
+            else:
+                settle = await self.settle_tracker.wait_async(
+                    action_name, before=before
+                )
+                result.settle_time = settle.elapsed
+        return result
+
+    async def release_keyboard(self) -> None:
+        """
+        Restore the user's keyboard if a Type action switched it this task.
+
+        Runs when a task ends, so errors are printed rather than raised and
+        never replace the task's result or the exception that ended it.
+        """
+        try:
+            await self.keyboard.restore()
+        except Exception as e:
+            print(f"Error restoring keyboard: {e}")
+
+    def _get_handler(self, action_name: str) -> Callable | None:
+        """Get the handler method for an action, preferring async versions."""
+        handlers = {
+            "Launch": self._handle_launch_async,
+            "Tap": self._handle_tap_async,
+            "Type": self._handle_type_async,
+            "Type_Name": self._handle_type_async,
+            "Swipe": self._handle_swipe_async,
+            "Back": self._handle_back_async,
+            "Home": self._handle_home_async,
+            "Double Tap": self._handle_double_tap_async,
+            "Long Press": self._handle_long_press_async,
+            "Wait": self._handle_wait_async,
+            "Take_over": self._handle_takeover_async,
+        }
+        return handlers.get(action_name) or super()._get_handler(action_name)
+
+    async def _call(self, callback: Callable, message: str) -> Any:
+        """Call a sync or async callback without blocking the event loop."""
+        if inspect.iscoroutinefunction(callback):
+            return await callback(message)
+        return await asyncio.to_thread(callback, message)
+
+    async def _handle_launch_async(
+        self, action: dict, width: int, height: int
+    ) -> ActionResult:
+        app_name = action.get("app")
+        if not app_name:
+            return ActionResult(False, False, "No app name specified")
+
+        if await launch_app_async(app_name, self.device_id):
+            return ActionResult(True, False)
+        return ActionResult(False, False, f"App not found: {app_name}")
+
+    async def _handle_tap_async(
+        self, action: dict, width: int, height: int
+    ) -> ActionResult:
+        element = action.get("element")
+        if not element:
+            return ActionResult(False, False, "No element coordinates")
+
+        x, y = self._convert_relative_to_absolute(element, width, height)
+
+        # Check for sensitive operation
+        if "message" in action:
+            if not await self._call(self.confirmation_callback, action["message"]):
+                return ActionResult(
+                    success=False,
+                    should_finish=True,
+                    message="User cancelled sensitive operation",
+                )
+
+        await tap_async(x, y, self.device_id)
+        return ActionResult(True, False)
+
+    async def _handle_type_async(
+        self, action: dict, width: int, height: int
+    ) -> ActionResult:
+        if not await self.keyboard.type_text(action.get("text", "")):
+            return ActionResult(
+                success=False,
+                should_finish=False,
+                message="Text input was not delivered to ADB Keyboard",
+            )
+        return ActionResult(True, False)
+
+    async def _handle_swipe_async(
+        self, action: dict, width: int, height: int
+    ) -> ActionResult:
+        start = action.get("start")
+        end = action.get("end")
+
+        if not start or not end:
+            return ActionResult(False, False, "Missing swipe coordinates")
+
+        start_x, start_y = self._convert_relative_to_absolute(start, width, height)
+        end_x, end_y = self._convert_relative_to_absolute(end, width, height)
+
+        await swipe_async(start_x, start_y, end_x, end_y, device_id=self.device_id)
+        return ActionResult(True, False)
+
+    async def _handle_back_async(
+        self, action: dict, width: int, height: int
+    ) -> ActionResult:
+        await back_async(self.device_id)
+        return ActionResult(True, False)
+
+    async def _handle_home_async(
+        self, action: dict, width: int, height: int
+    ) -> ActionResult:
+        await home_async(self.device_id)
+        return ActionResult(True, False)
+
+    async def _handle_double_tap_async(
+        self, action: dict, width: int, height: int
+    ) -> ActionResult:
+        element = action.get("element")
+        if not element:
+            return ActionResult(False, False, "No element coordinates")
+
+        x, y = self._convert_relative_to_absolute(element, width, height)
+        await double_tap_async(x, y, self.device_id)
+        return ActionResult(True, False)
+
+    async def _handle_long_press_async(
+        self, action: dict, width: int, height: int
+    ) -> ActionResult:
+        element = action.get("element")
+        if not element:
+            return ActionResult(False, False, "No element coordinates")
+
+        x, y = self._convert_relative_to_absolute(element, width, height)
+        await long_press_async(x, y, device_id=self.device_id)
+        return ActionResult(True, False)
+
+    async def _handle_wait_async(
+        self, action: dict, width: int, height: int
+    ) -> ActionResult:
+        duration_str = action.get("duration", "1 seconds")
+        try:
+            duration = float(duration_str.replace("seconds", "").strip())
+        except ValueError:
+            duration = 1.0
+
+        await asyncio.sleep(duration)
+        return ActionResult(True, False)
+
+    async def _handle_takeover_async(
+        self, action: dict, width: int, height: int
+    ) -> ActionResult:
+        message = action.get("message", "User intervention required")
+        await self._call(self.takeover_callback, message)
+        return ActionResult(True, False)
+
+
 def parse_action(response: str) -> dict[str, Any]:
     """
     Parse action from model response.
@@ -285,7 +562,7 @@ def parse_action(response: str) -> dict[str, Any]:
         if response.startswith("do"):
             # Use AST parsing instead of eval for safety
             try:
-                tree = ast.parse(response, mode='eval')
+                tree = ast.parse(response, mode="eval")
                 if not isinstance(tree.body, ast.Call):
                     raise ValueError("Expected a function call")
 
@@ -1,5 +1,19 @@
 """ADB utilities for Android device interaction."""
 
+from phone_agent.adb.async_adb import (
+    AsyncKeyboardManager,
+    back_async,
+    double_tap_async,
+    get_current_app_async,
+    get_screenshot_async,
+    home_async,
+    launch_app_async,
+    long_press_async,
+    run_adb_async,
+    run_shell_async,
+    swipe_async,
+    tap_async,
+)
 from phone_agent.adb.connection import (
     ADBConnection,
     ConnectionType,
@@ -18,21 +32,61 @@ from phone_agent.adb.device import (
     tap,
 )
 from phone_agent.adb.input import (
+    KeyboardManager,
+    KeyboardUnavailableError,
     clear_text,
     detect_and_set_adb_keyboard,
     restore_keyboard,
     type_text,
 )
-from phone_agent.adb.screenshot import get_screenshot
+from phone_agent.adb.screenshot import (
+    ImageEncoding,
+    RawFrame,
+    Screenshot,
+    capture_frame,
+    get_screenshot,
+    screenshot_from_frame,
+)
+from phone_agent.adb.settle import (
+    SettleConfig,
+    SettleResult,
+    SettleStats,
+    SettleTracker,
+    frames_differ,
+    wait_for_settle,
+    wait_for_settle_async,
+)
+from phone_agent.adb.shell_session import (
+    ShellSession,
+    ShellSessionUnavailable,
+    close_shell_sessions,
+    get_shell_session,
+    run_shell,
+    set_persistent_shell,
+)
+from phone_agent.adb.socket_client import ADBSocketClient, SocketTransport
+from phone_agent.adb.transport import (
+    SubprocessTransport,
+    get_transport,
+    run_adb,
+    set_transport,
+)
 
 __all__ = [
     # Screenshot
     "get_screenshot",
+    "Screenshot",
+    "ImageEncoding",
+    "RawFrame",
+    "capture_frame",
+    "screenshot_from_frame",
     # Input
     "type_text",
     "clear_text",
     "detect_and_set_adb_keyboard",
     "restore_keyboard",
+    "KeyboardManager",
+    "KeyboardUnavailableError",
     # Device control
     "get_current_app",
     "tap",
@@ -42,10 +96,45 @@ __all__ = [
     "double_tap",
     "long_press",
     "launch_app",
+    # Settle detection
+    "wait_for_settle",
+    "wait_for_settle_async",
+    "frames_differ",
+    "SettleConfig",
+    "SettleResult",
+    "SettleStats",
+    "SettleTracker",
     # Connection management
     "ADBConnection",
     "DeviceInfo",
     "ConnectionType",
     "quick_connect",
     "list_devices",
+    # Transport
+    "run_adb",
+    "get_transport",
+    "set_transport",
+    "SubprocessTransport",
+    "SocketTransport",
+    "ADBSocketClient",
+    # Persistent shell
+    "run_shell",
+    "set_persistent_shell",
+    "get_shell_session",
+    "close_shell_sessions",
+    "ShellSession",
+    "ShellSessionUnavailable",
+    # Async
+    "run_adb_async",
+    "run_shell_async",
+    "get_screenshot_async",
+    "get_current_app_async",
+    "tap_async",
+    "swipe_async",
+    "back_async",
+    "home_async",
+    "double_tap_async",
+    "long_press_async",
+    "launch_app_async",
+    "AsyncKeyboardManager",
 ]
@@ -0,0 +1,378 @@
+"""Asyncio ADB helpers for driving many devices from one event loop."""
+
+import asyncio
+import os
+import subprocess
+import time
+
+from phone_agent.adb.device import _launch_args, _parse_current_app, _swipe_duration_ms
+from phone_agent.adb.input import (
+    _IME_QUERY,
+    ADB_KEYBOARD_IME,
+    KeyboardUnavailableError,
+    _deliver_command,
+    _delivered,
+    _restorable,
+    _unavailable_message,
+)
+from phone_agent.adb.screenshot import (
+    ImageEncoding,
+    RawFrame,
+    Screenshot,
+    _capture_via_pull,
+    _create_fallback_screenshot,
+    _raw_frame,
+    _screenshot_from_exec_out,
+)
+from phone_agent.adb.socket_client import (
+    ADBProtocolError,
+    SocketTransport,
+    parse_shell_v2,
+)
+from phone_agent.adb.transport import get_transport, record_adb_command
+from phone_agent.config.apps import APP_PACKAGES
+
+# adb commands that map onto a single device service stream
+_SOCKET_SERVICES = {"shell": "shell:", "exec-out": "exec:"}
+
+
+async def run_adb_async(
+    args: list[str],
+    device_id: str | None = None,
+    timeout: float | None = None,
+    text: bool = True,
+) -> subprocess.CompletedProcess:
+    """
+    Run an adb command without blocking the event loop.
+
+    With SocketTransport selected, shell and exec-out commands are sent to the
+    adb server over an asyncio connection; everything else runs the adb
+    executable with asyncio.create_subprocess_exec.
+
+    Args:
+        args: adb command line arguments, e.g. ["shell", "input", "tap", "1", "2"].
+        device_id: Optional ADB device ID for multi-device setups.
+        timeout: Timeout in seconds.
+        text: Decode stdout/stderr as UTF-8 text instead of returning bytes.
+
+    Returns:
+        CompletedProcess with stdout, stderr and returncode.
+
+    Raises:
+        subprocess.TimeoutExpired: If the command does not finish in time.
+    """
+    transport = get_transport()
+    if (
+        isinstance(transport, SocketTransport)
+        and len(args) > 1
+        and args[0] in _SOCKET_SERVICES
+    ):
+        run = _run_socket(transport, args, device_id)
+    else:
+        run = _run_subprocess(getattr(transport, "adb_path", "adb"), args, device_id)
+
+    start = time.perf_counter()
+    try:
+        returncode, stdout, stderr = await asyncio.wait_for(run, timeout)
+    except asyncio.TimeoutError:
+        error = subprocess.TimeoutExpired(["adb"] + args, timeout)
+        record_adb_command(args, start, error=error)
+        raise error
+    except Exception as e:
+        record_adb_command(args, start, error=e)
+        raise
+    record_adb_command(args, start, returncode=returncode)
+
+    if text:
+        stdout = stdout.decode("utf-8", errors="replace")
+        stderr = stderr.decode("utf-8", errors="replace")
+    return subprocess.CompletedProcess(["adb"] + args, returncode, stdout, stderr)
+
+
+async def run_shell_async(
+    command: str, device_id: str | None = None, timeout: float = 10
+) -> str:
+    """
+    Run a shell command without blocking the event loop.
+
+    Args:
+        command: Shell command line, e.g. "input tap 100 200".
+        device_id: Optional ADB device ID for multi-device setups.
+        timeout: Timeout in seconds.
+
+    Returns:
+        The command output (stdout and stderr combined).
+    """
+    result = await run_adb_async(["shell", command], device_id, timeout=timeout)
+    return result.stdout + result.stderr
+
+
+async def get_screenshot_async(
+    device_id: str | None = None,
+    timeout: int = 10,
+    encoding: ImageEncoding | None = None,
+) -> Screenshot:
+    """
+    Capture a screenshot without blocking the event loop.
+
+    Same behavior as get_screenshot(). Re-encoding (encoding set) runs in the
+    default executor, since decoding and resizing a frame is CPU-bound.
+
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+        timeout: Timeout in seconds for screenshot operations.
+        encoding: Optional encoding policy (downscaling, lossy format).
+
+    Returns:
+        Screenshot object containing base64 data and dimensions.
+    """
+    try:
+        result = await run_adb_async(
+            ["exec-out", "screencap", "-p"], device_id, timeout=timeout, text=False
+        )
+        if encoding is None:
+            screenshot = _screenshot_from_exec_out(result.stdout, result.stderr, None)
+        else:
+            screenshot = await asyncio.to_thread(
+                _screenshot_from_exec_out, result.stdout, result.stderr, encoding
+            )
+
+        if screenshot is None:
+            # Device does not support exec-out (pre-Lollipop), use the legacy path
+            screenshot = await asyncio.to_thread(
+                _capture_via_pull, device_id, timeout, encoding
+            )
+        return screenshot
+
+    except Exception as e:
+        print(f"Screenshot error: {e}")
+        return _create_fallback_screenshot(is_sensitive=False)
+
+
+async def capture_frame_async(
+    device_id: str | None = None, timeout: float = 10
+) -> RawFrame | None:
+    """Async version of capture_frame()."""
+    result = await run_adb_async(
+        ["exec-out", "screencap"], device_id, timeout=timeout, text=False
+    )
+    return _raw_frame(result.stdout)
+
+
+async def get_current_app_async(device_id: str | None = None) -> str:
+    """Async version of get_current_app()."""
+    result = await run_adb_async(["shell", "dumpsys", "window"], device_id)
+    return _parse_current_app(result.stdout)
+
+
+async def tap_async(x: int, y: int, device_id: str | None = None) -> None:
+    """Tap at the specified coordinates."""
+    await run_shell_async(f"input tap {x} {y}", device_id)
+
+
+async def double_tap_async(x: int, y: int, device_id: str | None = None) -> None:
+    """Double tap at the specified coordinates."""
+    await run_shell_async(
+        f"input tap {x} {y} & sleep 0.1; input tap {x} {y}; wait", device_id
+    )
+
+
+async def long_press_async(
+    x: int, y: int, duration_ms: int = 3000, device_id: str | None = None
+) -> None:
+    """Long press at the specified coordinates."""
+    await run_shell_async(f"input swipe {x} {y} {x} {y} {duration_ms}", device_id)
+
+
+async def swipe_async(
+    start_x: int,
+    start_y: int,
+    end_x: int,
+    end_y: int,
+    duration_ms: int | None = None,
+    device_id: str | None = None,
+) -> None:
+    """Swipe from start to end coordinates."""
+    if duration_ms is None:
+        duration_ms = _swipe_duration_ms(start_x, start_y, end_x, end_y)
+
+    await run_shell_async(
+        f"input swipe {start_x} {start_y} {end_x} {end_y} {duration_ms}", device_id
+    )
+
+
+async def back_async(device_id: str | None = None) -> None:
+    """Press the back button."""
+    await run_shell_async("input keyevent 4", device_id)
+
+
+async def home_async(device_id: str | None = None) -> None:
+    """Press the home button."""
+    await run_shell_async("input keyevent KEYCODE_HOME", device_id)
+
+
+async def launch_app_async(app_name: str, device_id: str | None = None) -> bool:
+    """
+    Launch an app by name.
+
+    Returns:
+        True if app was launched, False if app not found.
+    """
+    if app_name not in APP_PACKAGES:
+        return False
+
+    await run_adb_async(_launch_args(APP_PACKAGES[app_name]), device_id)
+    return True
+
+
+class AsyncKeyboardManager:
+    """
+    Async version of KeyboardManager.
+
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+        ready_timeout: Seconds to wait for ADB Keyboard to become the
+            selected IME after switching.
+    """
+
+    def __init__(self, device_id: str | None = None, ready_timeout: float = 3.0):
+        self.device_id = device_id
+        self.ready_timeout = ready_timeout
+        self._original_ime: str | None = None
+        self._active = False
+
+    @property
+    def active(self) -> bool:
+        """Whether ADB Keyboard has been switched on by this manager."""
+        return self._active
+
+    async def activate(self) -> None:
+        """Switch to ADB Keyboard if this task has not done so yet."""
+        if self._active:
+            return
+
+        current_ime = await self._current_ime()
+        if self._original_ime is None:
+            self._original_ime = current_ime
+
+        if ADB_KEYBOARD_IME not in current_ime:
+            await run_shell_async(f"ime set {ADB_KEYBOARD_IME}", self.device_id)
+            if not await self._wait_until_selected():
+                raise KeyboardUnavailableError(_unavailable_message(current_ime))
+
+        self._active = True
+
+    async def type_text(self, text: str) -> bool:
+        """
+        Replace the content of the focused input field with text.
+
+        Returns:
+            True if the input broadcasts were delivered.
+        """
+        await self.activate()
+        if await self._deliver(text):
+            return True
+
+        # The IME may have been switched away (e.g. by the app); try once more
+        self._active = False
+        await self.activate()
+        return await self._deliver(text)
+
+    async def restore(self) -> None:
+        """Restore the IME that was selected before the task started."""
+        if self._active and _restorable(self._original_ime):
+            await run_shell_async(f"ime set {self._original_ime}", self.device_id)
+        self._active = False
+        self._original_ime = None
+
+    async def _deliver(self, text: str) -> bool:
+        output = await run_shell_async(_deliver_command(text), self.device_id)
+        return _delivered(output)
+
+    async def _current_ime(self) -> str:
+        return (await run_shell_async(_IME_QUERY, self.device_id)).strip()
+
+    async def _wait_until_selected(self) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.ready_timeout
+        while loop.time() < deadline:
+            if ADB_KEYBOARD_IME in await self._current_ime():
+                return True
+            await asyncio.sleep(0.05)
+        return False
+
+
+async def _run_subprocess(
+    adb_path: str, args: list[str], device_id: str | None
+) -> tuple[int, bytes, bytes]:
+    """Run the adb executable, killing it if the caller is cancelled."""
+    cmd = [adb_path]
+    if device_id:
+        cmd.extend(["-s", device_id])
+    cmd.extend(args)
+
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+    return process.returncode, stdout, stderr
+
+
+async def _run_socket(
+    transport: SocketTransport, args: list[str], device_id: str | None
+) -> tuple[int, bytes, bytes]:
+    """Run a shell/exec-out command over an asyncio adb server connection."""
+    client = transport.client
+    try:
+        reader, writer = await asyncio.open_connection(client.host, client.port)
+    except ConnectionRefusedError:
+        # Server not running; the adb executable starts it
+        return await _run_subprocess(transport.fallback.adb_path, args, device_id)
+
+    serial = device_id or os.getenv("ANDROID_SERIAL")
+    service = _SOCKET_SERVICES[args[0]]
+    try:
+        shell_v2 = args[0] == "shell" and client._shell_v2.get(serial)
+        if shell_v2 is None:
+            # Feature query on first use per device, then cached
+            shell_v2 = await asyncio.to_thread(client.has_shell_v2, serial)
+        if shell_v2:
+            service = "shell,v2,raw:"
+
+        if serial:
+            await _request(reader, writer, f"host:transport:{serial}")
+        else:
+            await _request(reader, writer, "host:transport-any")
+        await _request(reader, writer, service + " ".join(args[1:]))
+        output = await reader.read()
+        return parse_shell_v2(output) if shell_v2 else (0, output, b"")
+    except (ADBProtocolError, OSError) as e:
+        return 1, b"", f"error: {e}\n".encode("utf-8")
+    finally:
+        writer.close()
+
+
+async def _request(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, payload: str
+) -> None:
+    """Send a length-prefixed request and read the OKAY/FAIL status."""
+    data = payload.encode("utf-8")
+    writer.write(f"{len(data):04x}".encode("ascii") + data)
+    await writer.drain()
+
+    try:
+        status = await reader.readexactly(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            length = int(await reader.readexactly(4), 16)
+            message = await reader.readexactly(length)
+            raise ADBProtocolError(message.decode("utf-8", errors="replace"))
+    except asyncio.IncompleteReadError:
+        raise ADBProtocolError("Connection closed by adb server")
+    raise ADBProtocolError(f"Unexpected response from adb server: {status!r}")
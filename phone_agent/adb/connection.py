@@ -6,6 +6,8 @@ from dataclasses import dataclass
 from enum import Enum
 from typing import Optional
 
+from phone_agent.adb.transport import SubprocessTransport, get_transport
+
 
 class ConnectionType(Enum):
     """Type of ADB connection."""
@@ -42,14 +44,27 @@ class ADBConnection:
         >>> conn.disconnect("192.168.1.100:5555")
     """
 
-    def __init__(self, adb_path: str = "adb"):
+    def __init__(self, adb_path: str = "adb", transport=None):
         """
         Initialize ADB connection manager.
 
         Args:
             adb_path: Path to ADB executable.
+            transport: Optional transport to run commands with. Defaults to the
+                globally selected backend (see phone_agent.adb.set_transport),
+                or the given adb executable if adb_path is customized.
         """
         self.adb_path = adb_path
+        if transport is None and adb_path != "adb":
+            transport = SubprocessTransport(adb_path)
+        self._transport = transport
+
+    def _run(
+        self, args: list[str], device_id: str | None = None, timeout: float = 5
+    ) -> subprocess.CompletedProcess:
+        """Run an adb command through the configured transport."""
+        transport = self._transport or get_transport()
+        return transport.run(args, device_id=device_id, timeout=timeout)
 
     def connect(self, address: str, timeout: int = 10) -> tuple[bool, str]:
         """
@@ -71,12 +86,7 @@ class ADBConnection:
             address = f"{address}:5555"  # Default ADB port
 
         try:
-            result = subprocess.run(
-                [self.adb_path, "connect", address],
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-            )
+            result = self._run(["connect", address], timeout=timeout)
 
             output = result.stdout + result.stderr
 
@@ -103,11 +113,11 @@ class ADBConnection:
             Tuple of (success, message).
         """
         try:
-            cmd = [self.adb_path, "disconnect"]
+            args = ["disconnect"]
             if address:
-                cmd.append(address)
+                args.append(address)
 
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+            result = self._run(args)
 
             output = result.stdout + result.stderr
             return True, output.strip() or "Disconnected"
@@ -123,12 +133,7 @@ class ADBConnection:
             List of DeviceInfo objects.
         """
         try:
-            result = subprocess.run(
-                [self.adb_path, "devices", "-l"],
-                capture_output=True,
-                text=True,
-                timeout=5,
-            )
+            result = self._run(["devices", "-l"])
 
             devices = []
             for line in result.stdout.strip().split("\n")[1:]:  # Skip header
@@ -234,12 +239,7 @@ class ADBConnection:
             After this, you can disconnect USB and connect via WiFi.
         """
         try:
-            cmd = [self.adb_path]
-            if device_id:
-                cmd.extend(["-s", device_id])
-            cmd.extend(["tcpip", str(port)])
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+            result = self._run(["tcpip", str(port)], device_id, timeout=10)
 
             output = result.stdout + result.stderr
 
@@ -263,12 +263,7 @@ class ADBConnection:
             IP address string or None if not found.
         """
         try:
-            cmd = [self.adb_path]
-            if device_id:
-                cmd.extend(["-s", device_id])
-            cmd.extend(["shell", "ip", "route"])
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+            result = self._run(["shell", "ip", "route"], device_id)
 
             # Parse IP from route output
             for line in result.stdout.split("\n"):
@@ -279,13 +274,7 @@ class ADBConnection:
                             return parts[i + 1]
 
             # Alternative: try wlan0 interface
-            cmd[-1] = "ip addr show wlan0"
-            result = subprocess.run(
-                cmd[:-1] + ["shell", "ip", "addr", "show", "wlan0"],
-                capture_output=True,
-                text=True,
-                timeout=5,
-            )
+            result = self._run(["shell", "ip", "addr", "show", "wlan0"], device_id)
 
             for line in result.stdout.split("\n"):
                 if "inet " in line:
@@ -308,16 +297,12 @@ class ADBConnection:
         """
         try:
             # Kill server
-            subprocess.run(
-                [self.adb_path, "kill-server"], capture_output=True, timeout=5
-            )
+            self._run(["kill-server"])
 
             time.sleep(1)
 
             # Start server
-            subprocess.run(
-                [self.adb_path, "start-server"], capture_output=True, timeout=5
-            )
+            self._run(["start-server"])
 
             return True, "ADB server restarted"
 
@@ -1,10 +1,10 @@
 """Device control utilities for Android automation."""
 
-import os
-import subprocess
 import time
 from typing import List, Optional, Tuple
 
+from phone_agent.adb.shell_session import run_shell
+from phone_agent.adb.transport import run_adb
 from phone_agent.config.apps import APP_PACKAGES
 
 
@@ -18,21 +18,8 @@ def get_current_app(device_id: str | None = None) -> str:
     Returns:
         The app name if recognized, otherwise "System Home".
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
-    result = subprocess.run(
-        adb_prefix + ["shell", "dumpsys", "window"], capture_output=True, text=True, encoding='utf-8'
-    )
-    output = result.stdout
-
-    # Parse window focus info
-    for line in output.split("\n"):
-        if "mCurrentFocus" in line or "mFocusedApp" in line:
-            for app_name, package in APP_PACKAGES.items():
-                if package in line:
-                    return app_name
-
-    return "System Home"
+    result = run_adb(["shell", "dumpsys", "window"], device_id)
+    return _parse_current_app(result.stdout)
 
 
 def tap(x: int, y: int, device_id: str | None = None, delay: float = 1.0) -> None:
@@ -45,11 +32,7 @@ def tap(x: int, y: int, device_id: str | None = None, delay: float = 1.0) -> Non
         device_id: Optional ADB device ID.
         delay: Delay in seconds after tap.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
-    subprocess.run(
-        adb_prefix + ["shell", "input", "tap", str(x), str(y)], capture_output=True
-    )
+    run_shell(f"input tap {x} {y}", device_id)
     time.sleep(delay)
 
 
@@ -65,15 +48,9 @@ def double_tap(
         device_id: Optional ADB device ID.
         delay: Delay in seconds after double tap.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
-    subprocess.run(
-        adb_prefix + ["shell", "input", "tap", str(x), str(y)], capture_output=True
-    )
-    time.sleep(0.1)
-    subprocess.run(
-        adb_prefix + ["shell", "input", "tap", str(x), str(y)], capture_output=True
-    )
+    # Schedule both taps on the device in one command, so the interval is not
+    # stretched by the first `input` process exiting before the second starts
+    run_shell(f"input tap {x} {y} & sleep 0.1; input tap {x} {y}; wait", device_id)
     time.sleep(delay)
 
 
@@ -94,13 +71,7 @@ def long_press(
         device_id: Optional ADB device ID.
         delay: Delay in seconds after long press.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
-    subprocess.run(
-        adb_prefix
-        + ["shell", "input", "swipe", str(x), str(y), str(x), str(y), str(duration_ms)],
-        capture_output=True,
-    )
+    run_shell(f"input swipe {x} {y} {x} {y} {duration_ms}", device_id)
     time.sleep(delay)
 
 
@@ -125,27 +96,11 @@ def swipe(
         device_id: Optional ADB device ID.
         delay: Delay in seconds after swipe.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
     if duration_ms is None:
-        # Calculate duration based on distance
-        dist_sq = (start_x - end_x) ** 2 + (start_y - end_y) ** 2
-        duration_ms = int(dist_sq / 1000)
-        duration_ms = max(1000, min(duration_ms, 2000))  # Clamp between 1000-2000ms
-
-    subprocess.run(
-        adb_prefix
-        + [
-            "shell",
-            "input",
-            "swipe",
-            str(start_x),
-            str(start_y),
-            str(end_x),
-            str(end_y),
-            str(duration_ms),
-        ],
-        capture_output=True,
+        duration_ms = _swipe_duration_ms(start_x, start_y, end_x, end_y)
+
+    run_shell(
+        f"input swipe {start_x} {start_y} {end_x} {end_y} {duration_ms}", device_id
     )
     time.sleep(delay)
 
@@ -158,11 +113,7 @@ def back(device_id: str | None = None, delay: float = 1.0) -> None:
         device_id: Optional ADB device ID.
         delay: Delay in seconds after pressing back.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
-    subprocess.run(
-        adb_prefix + ["shell", "input", "keyevent", "4"], capture_output=True
-    )
+    run_shell("input keyevent 4", device_id)
     time.sleep(delay)
 
 
@@ -174,11 +125,7 @@ def home(device_id: str | None = None, delay: float = 1.0) -> None:
         device_id: Optional ADB device ID.
         delay: Delay in seconds after pressing home.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
-    subprocess.run(
-        adb_prefix + ["shell", "input", "keyevent", "KEYCODE_HOME"], capture_output=True
-    )
+    run_shell("input keyevent KEYCODE_HOME", device_id)
     time.sleep(delay)
 
 
@@ -197,28 +144,36 @@ def launch_app(app_name: str, device_id: str | None = None, delay: float = 1.0)
     if app_name not in APP_PACKAGES:
         return False
 
-    adb_prefix = _get_adb_prefix(device_id)
-    package = APP_PACKAGES[app_name]
-
-    subprocess.run(
-        adb_prefix
-        + [
-            "shell",
-            "monkey",
-            "-p",
-            package,
-            "-c",
-            "android.intent.category.LAUNCHER",
-            "1",
-        ],
-        capture_output=True,
-    )
+    run_adb(_launch_args(APP_PACKAGES[app_name]), device_id)
     time.sleep(delay)
     return True
 
 
-def _get_adb_prefix(device_id: str | None) -> list:
-    """Get ADB command prefix with optional device specifier."""
-    if device_id:
-        return ["adb", "-s", device_id]
-    return ["adb"]
+def _parse_current_app(dumpsys_output: str) -> str:
+    """Map the focused window in `dumpsys window` output to an app name."""
+    for line in dumpsys_output.split("\n"):
+        if "mCurrentFocus" in line or "mFocusedApp" in line:
+            for app_name, package in APP_PACKAGES.items():
+                if package in line:
+                    return app_name
+
+    return "System Home"
+
+
+def _swipe_duration_ms(start_x: int, start_y: int, end_x: int, end_y: int) -> int:
+    """Swipe duration based on distance, clamped between 1000-2000ms."""
+    dist_sq = (start_x - end_x) ** 2 + (start_y - end_y) ** 2
+    return max(1000, min(int(dist_sq / 1000), 2000))
+
+
+def _launch_args(package: str) -> list[str]:
+    """adb arguments that start the launcher activity of a package."""
+    return [
+        "shell",
+        "monkey",
+        "-p",
+        package,
+        "-c",
+        "android.intent.category.LAUNCHER",
+        "1",
+    ]
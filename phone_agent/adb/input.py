@@ -1,11 +1,22 @@
 """Input utilities for Android device text input."""
 
 import base64
-import subprocess
+import time
 from typing import Optional
 
+from phone_agent.adb.shell_session import run_shell
 
-def type_text(text: str, device_id: str | None = None) -> None:
+ADB_KEYBOARD_IME = "com.android.adbkeyboard/.AdbIME"
+
+_CLEAR_COMMAND = "am broadcast -a ADB_CLEAR_TEXT"
+_IME_QUERY = "settings get secure default_input_method"
+
+
+class KeyboardUnavailableError(Exception):
+    """Raised when ADB Keyboard cannot be made the selected input method."""
+
+
+def type_text(text: str, device_id: str | None = None) -> str:
     """
     Type text into the currently focused input field using ADB Keyboard.
 
@@ -13,44 +24,27 @@ def type_text(text: str, device_id: str | None = None) -> None:
         text: The text to type.
         device_id: Optional ADB device ID for multi-device setups.
 
+    Returns:
+        Output of the `am broadcast` command.
+
     Note:
         Requires ADB Keyboard to be installed on the device.
         See: https://github.com/nicnocquee/AdbKeyboard
     """
-    adb_prefix = _get_adb_prefix(device_id)
-    encoded_text = base64.b64encode(text.encode("utf-8")).decode("utf-8")
-
-    subprocess.run(
-        adb_prefix
-        + [
-            "shell",
-            "am",
-            "broadcast",
-            "-a",
-            "ADB_INPUT_B64",
-            "--es",
-            "msg",
-            encoded_text,
-        ],
-        capture_output=True,
-        text=True,
-    )
+    return run_shell(_type_command(text), device_id)
 
 
-def clear_text(device_id: str | None = None) -> None:
+def clear_text(device_id: str | None = None) -> str:
     """
     Clear text in the currently focused input field.
 
     Args:
         device_id: Optional ADB device ID for multi-device setups.
-    """
-    adb_prefix = _get_adb_prefix(device_id)
 
-    subprocess.run(
-        adb_prefix + ["shell", "am", "broadcast", "-a", "ADB_CLEAR_TEXT"],
-        capture_output=True,
-        text=True,
-    )
+    Returns:
+        Output of the `am broadcast` command.
+    """
+    return run_shell(_CLEAR_COMMAND, device_id)
 
 
 def detect_and_set_adb_keyboard(device_id: str | None = None) -> str:
@@ -63,23 +57,12 @@ def detect_and_set_adb_keyboard(device_id: str | None = None) -> str:
     Returns:
         The original keyboard IME identifier for later restoration.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
     # Get current IME
-    result = subprocess.run(
-        adb_prefix + ["shell", "settings", "get", "secure", "default_input_method"],
-        capture_output=True,
-        text=True,
-    )
-    current_ime = (result.stdout + result.stderr).strip()
+    current_ime = run_shell(_IME_QUERY, device_id).strip()
 
     # Switch to ADB Keyboard if not already set
-    if "com.android.adbkeyboard/.AdbIME" not in current_ime:
-        subprocess.run(
-            adb_prefix + ["shell", "ime", "set", "com.android.adbkeyboard/.AdbIME"],
-            capture_output=True,
-            text=True,
-        )
+    if ADB_KEYBOARD_IME not in current_ime:
+        run_shell(f"ime set {ADB_KEYBOARD_IME}", device_id)
 
     # Warm up the keyboard
     type_text("", device_id)
@@ -95,15 +78,138 @@ def restore_keyboard(ime: str, device_id: str | None = None) -> None:
         ime: The IME identifier to restore.
         device_id: Optional ADB device ID for multi-device setups.
     """
-    adb_prefix = _get_adb_prefix(device_id)
+    run_shell(f"ime set {ime}", device_id)
 
-    subprocess.run(
-        adb_prefix + ["shell", "ime", "set", ime], capture_output=True, text=True
-    )
 
+class KeyboardManager:
+    """
+    Keeps ADB Keyboard active for the duration of a task.
+
+    The IME is switched once on the first text entry and restored by
+    restore() at the end of the task, instead of switching back and forth
+    around every Type action. `am broadcast` reports success even when no
+    receiver got the intent, so delivery is confirmed by reading the selected
+    IME in the same shell call as the broadcasts: ADB Keyboard only listens
+    while it is the selected IME.
 
-def _get_adb_prefix(device_id: str | None) -> list:
-    """Get ADB command prefix with optional device specifier."""
-    if device_id:
-        return ["adb", "-s", device_id]
-    return ["adb"]
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+        ready_timeout: Seconds to wait for ADB Keyboard to become the
+            selected IME after switching.
+    """
+
+    def __init__(self, device_id: str | None = None, ready_timeout: float = 3.0):
+        self.device_id = device_id
+        self.ready_timeout = ready_timeout
+        self._original_ime: str | None = None
+        self._active = False
+
+    @property
+    def active(self) -> bool:
+        """Whether ADB Keyboard has been switched on by this manager."""
+        return self._active
+
+    def activate(self) -> None:
+        """
+        Switch to ADB Keyboard if this task has not done so yet.
+
+        Raises:
+            KeyboardUnavailableError: If ADB Keyboard did not become the
+                selected IME within ready_timeout (e.g. not installed or not
+                enabled).
+        """
+        if self._active:
+            return
+
+        current_ime = self._current_ime()
+        if self._original_ime is None:
+            self._original_ime = current_ime
+
+        if ADB_KEYBOARD_IME not in current_ime:
+            run_shell(f"ime set {ADB_KEYBOARD_IME}", self.device_id)
+            if not self._wait_until_selected():
+                raise KeyboardUnavailableError(_unavailable_message(current_ime))
+
+        self._active = True
+
+    def type_text(self, text: str) -> bool:
+        """
+        Replace the content of the focused input field with text.
+
+        Args:
+            text: The text to type.
+
+        Returns:
+            True if the input broadcasts were delivered.
+
+        Raises:
+            KeyboardUnavailableError: If ADB Keyboard cannot be selected.
+        """
+        self.activate()
+        if self._deliver(text):
+            return True
+
+        # The IME may have been switched away (e.g. by the app); try once more
+        self._active = False
+        self.activate()
+        return self._deliver(text)
+
+    def restore(self) -> None:
+        """Restore the IME that was selected before the task started."""
+        if self._active and _restorable(self._original_ime):
+            restore_keyboard(self._original_ime, self.device_id)
+        self._active = False
+        self._original_ime = None
+
+    def _deliver(self, text: str) -> bool:
+        """Clear the field and type text, confirming ADB Keyboard received both."""
+        return _delivered(run_shell(_deliver_command(text), self.device_id))
+
+    def _current_ime(self) -> str:
+        return run_shell(_IME_QUERY, self.device_id).strip()
+
+    def _wait_until_selected(self) -> bool:
+        """Poll until ADB Keyboard is the selected IME."""
+        deadline = time.perf_counter() + self.ready_timeout
+        while time.perf_counter() < deadline:
+            if ADB_KEYBOARD_IME in self._current_ime():
+                return True
+            time.sleep(0.05)
+        return False
+
+
+def _type_command(text: str) -> str:
+    """
+    ADB Keyboard broadcast that types text (base64 keeps it shell-safe).
+
+    The value is quoted so that empty text still passes an (empty) extra.
+    """
+    encoded_text = base64.b64encode(text.encode("utf-8")).decode("utf-8")
+    return f"am broadcast -a ADB_INPUT_B64 --es msg '{encoded_text}'"
+
+
+def _restorable(ime: str | None) -> bool:
+    """Whether ime is a real IME other than ADB Keyboard."""
+    return bool(ime) and ime != "null" and ADB_KEYBOARD_IME not in ime
+
+
+def _deliver_command(text: str) -> str:
+    """Shell command that reads the selected IME, then clears and types text."""
+    return f"{_IME_QUERY}; {_CLEAR_COMMAND}; {_type_command(text)}"
+
+
+def _delivered(output: str) -> bool:
+    """
+    Whether the output of _deliver_command() shows both broadcasts reached
+    ADB Keyboard: it was the selected IME and both broadcasts completed.
+    """
+    selected_ime = output.split("\n", 1)[0]
+    return ADB_KEYBOARD_IME in selected_ime and output.count("Broadcast completed") == 2
+
+
+def _unavailable_message(current_ime: str) -> str:
+    return (
+        f"ADB Keyboard could not be selected (current IME: {current_ime or 'none'}). "
+        "Install it and enable it in the input method settings: "
+        "https://github.com/nicnocquee/AdbKeyboard"
+    )
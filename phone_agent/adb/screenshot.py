@@ -2,33 +2,197 @@
 
 import base64
 import os
-import subprocess
+import struct
 import tempfile
+import time
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 from io import BytesIO
 from typing import Tuple
 
 from PIL import Image
 
+from phone_agent.adb.transport import run_adb
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# Columns and rows of the grayscale block grid used to compare frames
+DIFF_GRID = (16, 32)
+
+# Pixel formats of raw screencap output -> (PIL raw mode, bytes per pixel)
+_RAW_FORMATS = {1: ("RGBX", 4), 2: ("RGBX", 4), 3: ("RGB", 3)}
+
+
+@dataclass
+class ImageEncoding:
+    """
+    Encoding policy applied to screenshots before they are sent to the model.
+
+    Args:
+        max_long_edge: Downscale so the longer side is at most this many pixels.
+            None keeps the device resolution.
+        format: Output format, one of "PNG", "JPEG" or "WEBP".
+        quality: Quality for lossy formats (1-100).
+    """
+
+    max_long_edge: int | None = None
+    format: str = "PNG"
+    quality: int = 85
+
+    def __post_init__(self):
+        self.format = self.format.upper()
+        if self.format == "JPG":
+            self.format = "JPEG"
+        if self.format not in MIME_TYPES:
+            raise ValueError(f"Unsupported image format: {self.format}")
+
+    @property
+    def mime_type(self) -> str:
+        """MIME type of the encoded image."""
+        return MIME_TYPES[self.format]
+
 
 @dataclass
 class Screenshot:
-    """Represents a captured screenshot."""
+    """
+    Represents a captured screenshot.
+
+    width and height are always the device screen dimensions, even when the
+    encoded image has been downscaled, so coordinate conversion stays exact.
+    """
 
     base64_data: str
     width: int
     height: int
     is_sensitive: bool = False
+    mime_type: str = "image/png"
+    # Seconds spent encoding the captured PNG for the model
+    encode_time: float = field(default=0.0, compare=False)
+    _blocks: bytes | None = field(default=None, init=False, repr=False, compare=False)
+    _hash: int | None = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def blocks(self) -> bytes:
+        """
+        Mean grayscale value (0-255) of each cell of a DIFF_GRID grid, row by row.
+
+        Computed on first use, which decodes the image once.
+        """
+        if self._blocks is None:
+            self._analyze()
+        return self._blocks
+
+    @property
+    def perceptual_hash(self) -> int:
+        """64-bit difference hash of the frame, computed on first use."""
+        if self._hash is None:
+            self._analyze()
+        return self._hash
+
+    def block_diff(self, other: "Screenshot", threshold: int = 12) -> float:
+        """
+        Fraction of grid cells that changed between two frames.
+
+        Args:
+            other: Frame to compare with.
+            threshold: Change in mean gray level above which a cell counts as
+                changed; absorbs compression noise.
+
+        Returns:
+            0.0 for identical frames, up to 1.0 when every cell changed.
+        """
+        if self.width != other.width or self.height != other.height:
+            return 1.0
+        return diff_blocks(self.blocks, other.blocks, threshold)
+
+    def hash_distance(self, other: "Screenshot") -> int:
+        """Number of differing bits between the perceptual hashes (0-64)."""
+        return bin(self.perceptual_hash ^ other.perceptual_hash).count("1")
+
+    def _analyze(self) -> None:
+        gray = Image.open(BytesIO(base64.b64decode(self.base64_data))).convert("L")
+        self._blocks = _block_grid(gray)
+
+        # Difference hash: is each pixel brighter than its right neighbour
+        pixels = gray.resize((9, 8), Image.Resampling.BOX).tobytes()
+        value = 0
+        for row in range(8):
+            for col in range(8):
+                left = pixels[row * 9 + col]
+                value = (value << 1) | (left > pixels[row * 9 + col + 1])
+        self._hash = value
+
+
+@dataclass
+class RawFrame:
+    """
+    An unencoded frame, as captured by `screencap` without -p.
+
+    Skipping the PNG compression on the device, which is most of the cost of
+    a screenshot, makes it cheap enough to poll while waiting for the screen
+    to settle. Its block grid compares with Screenshot.blocks.
+    """
 
+    width: int
+    height: int
+    raw_mode: str  # PIL raw mode of pixels
+    pixels: bytes = field(repr=False)
+    _blocks: bytes | None = field(default=None, init=False, repr=False)
+
+    @property
+    def blocks(self) -> bytes:
+        """Block grid of the frame (see Screenshot.blocks), computed on first use."""
+        if self._blocks is None:
+            self._blocks = _block_grid(self.image().convert("L"))
+        return self._blocks
+
+    def image(self) -> Image.Image:
+        """The frame as an RGB image."""
+        return Image.frombytes(
+            "RGB", (self.width, self.height), self.pixels, "raw", self.raw_mode
+        )
 
-def get_screenshot(device_id: str | None = None, timeout: int = 10) -> Screenshot:
+
+def _block_grid(gray: Image.Image) -> bytes:
+    """Mean gray level of each DIFF_GRID cell of a grayscale image."""
+    return gray.resize(DIFF_GRID, Image.Resampling.BOX).tobytes()
+
+
+def diff_blocks(a: bytes, b: bytes, threshold: int = 12) -> float:
+    """
+    Fraction of cells that differ between two block grids (Screenshot.blocks).
+
+    Args:
+        a: First block grid.
+        b: Second block grid.
+        threshold: Change in mean gray level above which a cell counts as
+            changed.
+
+    Returns:
+        0.0 for identical grids, 1.0 if every cell changed or the grids have
+        different sizes.
+    """
+    if len(a) != len(b) or not a:
+        return 1.0
+    return sum(1 for x, y in zip(a, b) if abs(x - y) > threshold) / len(a)
+
+
+def get_screenshot(
+    device_id: str | None = None,
+    timeout: int = 10,
+    encoding: ImageEncoding | None = None,
+) -> Screenshot:
     """
     Capture a screenshot from the connected Android device.
 
     Args:
         device_id: Optional ADB device ID for multi-device setups.
         timeout: Timeout in seconds for screenshot operations.
+        encoding: Optional encoding policy (downscaling, lossy format).
+            Defaults to sending the captured PNG unchanged.
 
     Returns:
         Screenshot object containing base64 data and dimensions.
@@ -37,73 +201,245 @@ def get_screenshot(device_id: str | None = None, timeout: int = 10) -> Screensho
         If the screenshot fails (e.g., on sensitive screens like payment pages),
         a black fallback image is returned with is_sensitive=True.
     """
+    try:
+        screenshot = _capture_exec_out(device_id, timeout, encoding)
+        if screenshot is None:
+            # Device does not support exec-out (pre-Lollipop), use the legacy path
+            screenshot = _capture_via_pull(device_id, timeout, encoding)
+        return screenshot
+
+    except Exception as e:
+        print(f"Screenshot error: {e}")
+        return _create_fallback_screenshot(is_sensitive=False)
+
+
+def capture_frame(device_id: str | None = None, timeout: float = 10) -> RawFrame | None:
+    """
+    Capture an unencoded frame with `exec-out screencap`.
+
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+        timeout: Timeout in seconds.
+
+    Returns:
+        The frame, or None if the device returned none (no exec-out support,
+        or a secure screen).
+
+    Raises:
+        subprocess.TimeoutExpired: If the capture does not finish in time.
+    """
+    result = run_adb(["exec-out", "screencap"], device_id, timeout=timeout, text=False)
+    return _raw_frame(result.stdout)
+
+
+def _raw_frame(data: bytes) -> RawFrame | None:
+    """Parse raw screencap output, None if it is not a frame."""
+    if len(data) < 12:
+        return None
+    width, height, pixel_format = struct.unpack("<III", data[:12])
+    if pixel_format not in _RAW_FORMATS:
+        return None
+    raw_mode, depth = _RAW_FORMATS[pixel_format]
+    # The header is 12 bytes, or 16 with the color space added in Android 9
+    header = len(data) - width * height * depth
+    if width * height == 0 or header not in (12, 16):
+        return None
+    return RawFrame(width, height, raw_mode, data[header:])
+
+
+def _capture_exec_out(
+    device_id: str | None, timeout: int, encoding: ImageEncoding | None
+) -> Screenshot | None:
+    """
+    Stream a PNG screenshot over the adb pipe with `exec-out screencap -p`.
+
+    The image bytes never touch the device storage or the host filesystem.
+
+    Returns:
+        Screenshot object, or None if exec-out is not supported by the device.
+    """
+    result = run_adb(
+        ["exec-out", "screencap", "-p"], device_id, timeout=timeout, text=False
+    )
+    return _screenshot_from_exec_out(result.stdout, result.stderr, encoding)
+
+
+def _screenshot_from_exec_out(
+    stdout: bytes, stderr: bytes, encoding: ImageEncoding | None
+) -> Screenshot | None:
+    """Build a Screenshot from `exec-out screencap -p` output, None if unsupported."""
+    if stdout.startswith(PNG_SIGNATURE):
+        return screenshot_from_png(stdout, encoding)
+
+    # Check for screenshot failure (sensitive screen)
+    output = (stdout + stderr).decode("utf-8", errors="replace")
+    if "Status: -1" in output or "Failed" in output:
+        return _create_fallback_screenshot(is_sensitive=True)
+
+    return None
+
+
+def _capture_via_pull(
+    device_id: str | None, timeout: int, encoding: ImageEncoding | None
+) -> Screenshot:
+    """Capture a screenshot by writing it to the device and pulling it back."""
     temp_path = os.path.join(tempfile.gettempdir(), f"screenshot_{uuid.uuid4()}.png")
-    adb_prefix = _get_adb_prefix(device_id)
 
-    try:
-        # Execute screenshot command
-        result = subprocess.run(
-            adb_prefix + ["shell", "screencap", "-p", "/sdcard/tmp.png"],
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-        )
+    # Execute screenshot command
+    result = run_adb(
+        ["shell", "screencap", "-p", "/sdcard/tmp.png"], device_id, timeout=timeout
+    )
+
+    # Check for screenshot failure (sensitive screen)
+    output = result.stdout + result.stderr
+    if "Status: -1" in output or "Failed" in output:
+        return _create_fallback_screenshot(is_sensitive=True)
+
+    # Pull screenshot to local temp path
+    run_adb(["pull", "/sdcard/tmp.png", temp_path], device_id, timeout=5)
+
+    if not os.path.exists(temp_path):
+        return _create_fallback_screenshot(is_sensitive=False)
+
+    with open(temp_path, "rb") as f:
+        data = f.read()
+
+    # Cleanup
+    os.remove(temp_path)
+
+    return screenshot_from_png(data, encoding)
 
-        # Check for screenshot failure (sensitive screen)
-        output = result.stdout + result.stderr
-        if "Status: -1" in output or "Failed" in output:
-            return _create_fallback_screenshot(is_sensitive=True)
-
-        # Pull screenshot to local temp path
-        subprocess.run(
-            adb_prefix + ["pull", "/sdcard/tmp.png", temp_path],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
 
-        if not os.path.exists(temp_path):
-            return _create_fallback_screenshot(is_sensitive=False)
+def screenshot_from_png(
+    data: bytes, encoding: ImageEncoding | None = None
+) -> Screenshot:
+    """
+    Build a Screenshot from raw PNG bytes.
 
-        # Read and encode image
-        img = Image.open(temp_path)
-        width, height = img.size
+    The dimensions are read from the IHDR header. When no resize or format
+    change is needed, the original bytes are base64-encoded as-is, so the
+    image is never decoded.
 
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        base64_data = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    Args:
+        data: Raw PNG bytes as captured from the device.
+        encoding: Optional encoding policy to apply.
 
-        # Cleanup
-        os.remove(temp_path)
+    Returns:
+        Screenshot with the device dimensions and the encoded image.
+    """
+    start = time.perf_counter()
+    width, height = _read_png_size(data)
+    needs_resize = (
+        encoding is not None
+        and encoding.max_long_edge is not None
+        and max(width, height) > encoding.max_long_edge
+    )
 
+    if encoding is None or (encoding.format == "PNG" and not needs_resize):
+        base64_data = base64.b64encode(data).decode("utf-8")
         return Screenshot(
-            base64_data=base64_data, width=width, height=height, is_sensitive=False
+            base64_data=base64_data,
+            width=width,
+            height=height,
+            is_sensitive=False,
+            encode_time=time.perf_counter() - start,
         )
 
-    except Exception as e:
-        print(f"Screenshot error: {e}")
-        return _create_fallback_screenshot(is_sensitive=False)
+    return Screenshot(
+        base64_data=_encode_image(Image.open(BytesIO(data)), encoding),
+        width=width,
+        height=height,
+        is_sensitive=False,
+        mime_type=encoding.mime_type,
+        encode_time=time.perf_counter() - start,
+    )
 
 
-def _get_adb_prefix(device_id: str | None) -> list:
-    """Get ADB command prefix with optional device specifier."""
-    if device_id:
-        return ["adb", "-s", device_id]
-    return ["adb"]
+def screenshot_from_frame(
+    frame: RawFrame, encoding: ImageEncoding | None = None
+) -> Screenshot:
+    """
+    Encode a raw frame for the model.
+
+    Used for the last frame of a settle wait, which becomes the next
+    screenshot. The block grid carries over.
+
+    Args:
+        frame: Frame from capture_frame().
+        encoding: Optional encoding policy. Defaults to a full-size PNG.
+
+    Returns:
+        Screenshot with the device dimensions and the encoded image.
+    """
+    start = time.perf_counter()
+    encoding = encoding or ImageEncoding()
+    screenshot = Screenshot(
+        base64_data=_encode_image(frame.image(), encoding),
+        width=frame.width,
+        height=frame.height,
+        is_sensitive=False,
+        mime_type=encoding.mime_type,
+        encode_time=time.perf_counter() - start,
+    )
+    screenshot._blocks = frame._blocks
+    return screenshot
+
+
+def _encode_image(img: Image.Image, encoding: ImageEncoding) -> str:
+    """Downscale and encode an image as the policy asks, as base64."""
+    if encoding.max_long_edge is not None and max(img.size) > encoding.max_long_edge:
+        img.thumbnail(
+            (encoding.max_long_edge, encoding.max_long_edge), Image.Resampling.LANCZOS
+        )
+
+    save_kwargs = {}
+    if encoding.format != "PNG":
+        save_kwargs["quality"] = encoding.quality
+    if encoding.format == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")
+
+    buffered = BytesIO()
+    img.save(buffered, format=encoding.format, **save_kwargs)
+    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+
+def _read_png_size(data: bytes) -> tuple[int, int]:
+    """
+    Read image dimensions from the PNG IHDR chunk.
+
+    Args:
+        data: Raw PNG bytes.
+
+    Returns:
+        Tuple of (width, height).
+
+    Raises:
+        ValueError: If the data is not a PNG with a leading IHDR chunk.
+    """
+    # Layout: 8-byte signature, 4-byte chunk length, b"IHDR", width, height
+    if len(data) < 24 or not data.startswith(PNG_SIGNATURE) or data[12:16] != b"IHDR":
+        raise ValueError("Invalid PNG data")
+
+    width, height = struct.unpack(">II", data[16:24])
+    return width, height
 
 
 def _create_fallback_screenshot(is_sensitive: bool) -> Screenshot:
     """Create a black fallback image when screenshot fails."""
     default_width, default_height = 1080, 2400
 
-    black_img = Image.new("RGB", (default_width, default_height), color="black")
-    buffered = BytesIO()
-    black_img.save(buffered, format="PNG")
-    base64_data = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
     return Screenshot(
-        base64_data=base64_data,
+        base64_data=_black_png_base64(default_width, default_height),
         width=default_width,
         height=default_height,
         is_sensitive=is_sensitive,
     )
+
+
+@lru_cache(maxsize=4)
+def _black_png_base64(width: int, height: int) -> str:
+    """Encode a black PNG of the given size (cached, the content never changes)."""
+    black_img = Image.new("RGB", (width, height), color="black")
+    buffered = BytesIO()
+    black_img.save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode("utf-8")
@@ -0,0 +1,346 @@
+"""Screen-settle detection for waiting after device actions."""
+
+import asyncio
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+
+from phone_agent.adb.async_adb import capture_frame_async
+from phone_agent.adb.screenshot import (
+    DIFF_GRID,
+    RawFrame,
+    Screenshot,
+    capture_frame,
+    diff_blocks,
+)
+
+
+@dataclass
+class SettleConfig:
+    """
+    Thresholds for adaptive settle detection.
+
+    Frames are polled unencoded (see capture_frame()) and compared as
+    low-resolution block grids (see Screenshot.blocks), so a blinking cursor,
+    a small spinner or the status bar clock do not keep the screen from
+    counting as settled.
+
+    Args:
+        stable_ms: The screen must stay unchanged for this many milliseconds.
+        timeout: Maximum seconds to wait before giving up. No capture starts
+            after it, and the last one is cut off at it. Keep it at or below
+            the fixed settle delay, which is the worst case it replaces.
+        poll_interval: Seconds between the end of one capture and the start
+            of the next.
+        min_wait: Seconds before a screen that never changed from the one the
+            action was chosen on counts as settled, so that the app has time to
+            react. Once a change is seen, the screen settles after stable_ms.
+        max_diff: Largest fraction of changed grid cells between two frames
+            that still counts as unchanged.
+        status_bar_rows: Grid rows at the top of the screen left out of the
+            comparison (one row is 1/32 of the screen height).
+    """
+
+    stable_ms: int = 300
+    timeout: float = 1.0
+    poll_interval: float = 0.05
+    min_wait: float = 0.5
+    max_diff: float = 0.01
+    status_bar_rows: int = 1
+
+
+@dataclass
+class SettleResult:
+    """Outcome of waiting for the screen to settle."""
+
+    settled: bool
+    elapsed: float
+    polls: int
+    supported: bool = True
+    # Last frame captured while polling, the settled screen if settled is True
+    frame: RawFrame | None = None
+
+
+@dataclass
+class SettleStats:
+    """Aggregated settle metrics for one action type."""
+
+    count: int = 0
+    settled: int = 0
+    timeouts: int = 0
+    polls: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    def record(self, result: SettleResult) -> None:
+        """Add a settle result."""
+        self.count += 1
+        if result.settled:
+            self.settled += 1
+        elif result.supported:
+            self.timeouts += 1
+        self.polls += result.polls
+        self.total_time += result.elapsed
+        self.max_time = max(self.max_time, result.elapsed)
+
+    @property
+    def mean_time(self) -> float:
+        """Mean seconds spent waiting."""
+        return self.total_time / self.count if self.count else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        """Summary suitable for logging or JSON export."""
+        return {
+            "count": self.count,
+            "settled": self.settled,
+            "timeouts": self.timeouts,
+            "mean_polls": self.polls / self.count if self.count else 0.0,
+            "mean_time": self.mean_time,
+            "max_time": self.max_time,
+        }
+
+
+def frames_differ(
+    a: Screenshot | RawFrame, b: Screenshot | RawFrame, config: SettleConfig
+) -> bool:
+    """
+    Whether two frames differ by more than the settle tolerance.
+
+    Args:
+        a: First frame.
+        b: Second frame.
+        config: Settle thresholds (max_diff, status_bar_rows).
+
+    Returns:
+        True if more than config.max_diff of the grid cells below the status
+        bar changed, or the frames have different sizes.
+    """
+    if a.width != b.width or a.height != b.height:
+        return True
+    skip = DIFF_GRID[0] * config.status_bar_rows
+    return diff_blocks(a.blocks[skip:], b.blocks[skip:]) > config.max_diff
+
+
+class _SettleWatch:
+    """Tracks polled frames until the screen has settled or the wait timed out."""
+
+    def __init__(self, config: SettleConfig, before: Screenshot | None):
+        self.config = config
+        self.before = before
+        self.start = time.perf_counter()
+        self.polls = 0
+        self.changed = False
+        self._anchor: RawFrame | None = None
+        self._last: RawFrame | None = None
+        self._stable_since = 0.0
+
+    def remaining(self) -> float:
+        """Seconds left before the timeout."""
+        return self.start + self.config.timeout - time.perf_counter()
+
+    def timed_out(self) -> SettleResult:
+        """Result of a wait that ran out of time between or during captures."""
+        return self._result(False, time.perf_counter(), self._last)
+
+    def unsupported(self) -> SettleResult:
+        """Result of a wait on a device that returned no frame."""
+        result = self._result(False, time.perf_counter(), self._last)
+        result.supported = False
+        return result
+
+    def add(self, frame: RawFrame) -> SettleResult | None:
+        """Add the next frame; return the result once the wait is over."""
+        now = time.perf_counter()
+        self.polls += 1
+        self._last = frame
+        config = self.config
+
+        if not self.changed and self.before is not None:
+            self.changed = frames_differ(frame, self.before, config)
+
+        if self._anchor is None or frames_differ(frame, self._anchor, config):
+            self._anchor = frame
+            self._stable_since = now
+        elif (now - self._stable_since) * 1000 >= config.stable_ms and (
+            self.changed or now - self.start >= config.min_wait
+        ):
+            return self._result(True, now, frame)
+
+        if now - self.start >= config.timeout:
+            return self._result(False, now, frame)
+        return None
+
+    def _result(
+        self, settled: bool, now: float, frame: RawFrame | None
+    ) -> SettleResult:
+        return SettleResult(
+            settled=settled,
+            elapsed=now - self.start,
+            polls=self.polls,
+            frame=frame,
+        )
+
+
+def wait_for_settle(
+    device_id: str | None = None,
+    config: SettleConfig | None = None,
+    before: Screenshot | None = None,
+) -> SettleResult:
+    """
+    Wait until the screen stops changing.
+
+    Captures unencoded frames and returns once consecutive frames have
+    matched (within config.max_diff) for config.stable_ms, or at the
+    config.timeout deadline, which also cuts off a capture in progress. A
+    screen that still matches before is only accepted after config.min_wait.
+
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+        config: Settle thresholds.
+        before: Screen the action was chosen on, used to tell when the action
+            took effect.
+
+    Returns:
+        SettleResult with the last captured frame. supported is False if the
+        device returned no frame.
+    """
+    watch = _SettleWatch(config or SettleConfig(), before)
+    while True:
+        time.sleep(max(0.0, min(watch.config.poll_interval, watch.remaining())))
+        remaining = watch.remaining()
+        if remaining <= 0:
+            return watch.timed_out()
+        try:
+            frame = capture_frame(device_id, timeout=remaining)
+        except subprocess.TimeoutExpired:
+            return watch.timed_out()
+        if frame is None:
+            return watch.unsupported()
+        result = watch.add(frame)
+        if result is not None:
+            return result
+
+
+async def wait_for_settle_async(
+    device_id: str | None = None,
+    config: SettleConfig | None = None,
+    before: Screenshot | None = None,
+) -> SettleResult:
+    """Async version of wait_for_settle()."""
+    watch = _SettleWatch(config or SettleConfig(), before)
+    while True:
+        await asyncio.sleep(
+            max(0.0, min(watch.config.poll_interval, watch.remaining()))
+        )
+        remaining = watch.remaining()
+        if remaining <= 0:
+            return watch.timed_out()
+        try:
+            frame = await capture_frame_async(device_id, timeout=remaining)
+        except subprocess.TimeoutExpired:
+            return watch.timed_out()
+        if frame is None:
+            return watch.unsupported()
+        # Computing the block grid is CPU work, keep it off the event loop
+        await asyncio.to_thread(lambda: frame.blocks)
+        result = watch.add(frame)
+        if result is not None:
+            return result
+
+
+class SettleTracker:
+    """
+    Waits for the screen to settle after actions and keeps per-action metrics.
+
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+        config: Adaptive settle thresholds. If None, or if the device returns
+            no frames, waits fixed_delay instead.
+        fixed_delay: Seconds to sleep when adaptive detection is off.
+    """
+
+    def __init__(
+        self,
+        device_id: str | None = None,
+        config: SettleConfig | None = None,
+        fixed_delay: float = 1.0,
+    ):
+        self.device_id = device_id
+        self.config = config
+        self.fixed_delay = fixed_delay
+        self._stats: dict[str, SettleStats] = {}
+        self._lock = threading.Lock()
+
+    def wait(
+        self,
+        action_name: str,
+        fixed_delay: float | None = None,
+        before: Screenshot | None = None,
+    ) -> SettleResult:
+        """
+        Wait for the screen to settle after an action and record the result.
+
+        Args:
+            action_name: Action label used to group metrics, e.g. "Tap".
+            fixed_delay: Overrides the fixed delay used when adaptive detection
+                is off.
+            before: Screen the action was chosen on (see wait_for_settle()).
+
+        Returns:
+            SettleResult of the wait.
+        """
+        if fixed_delay is None:
+            fixed_delay = self.fixed_delay
+
+        if self.config is not None:
+            result = wait_for_settle(self.device_id, self.config, before)
+            if not result.supported:
+                time.sleep(max(0.0, fixed_delay - result.elapsed))
+                result.elapsed = max(fixed_delay, result.elapsed)
+        else:
+            time.sleep(fixed_delay)
+            result = SettleResult(
+                settled=False, elapsed=fixed_delay, polls=0, supported=False
+            )
+
+        self._record(action_name, result)
+        return result
+
+    async def wait_async(
+        self,
+        action_name: str,
+        fixed_delay: float | None = None,
+        before: Screenshot | None = None,
+    ) -> SettleResult:
+        """Async version of wait()."""
+        if fixed_delay is None:
+            fixed_delay = self.fixed_delay
+
+        if self.config is not None:
+            result = await wait_for_settle_async(self.device_id, self.config, before)
+            if not result.supported:
+                await asyncio.sleep(max(0.0, fixed_delay - result.elapsed))
+                result.elapsed = max(fixed_delay, result.elapsed)
+        else:
+            await asyncio.sleep(fixed_delay)
+            result = SettleResult(
+                settled=False, elapsed=fixed_delay, polls=0, supported=False
+            )
+
+        self._record(action_name, result)
+        return result
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Per-action settle metrics, keyed by action label."""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def reset_stats(self) -> None:
+        """Clear the collected metrics."""
+        with self._lock:
+            self._stats.clear()
+
+    def _record(self, action_name: str, result: SettleResult) -> None:
+        with self._lock:
+            self._stats.setdefault(action_name, SettleStats()).record(result)
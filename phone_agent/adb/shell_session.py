@@ -0,0 +1,257 @@
+"""Persistent adb shell sessions for low-latency device commands."""
+
+import atexit
+import os
+import queue
+import subprocess
+import threading
+import time
+import uuid
+
+from phone_agent.adb.socket_client import ADBProtocolError, SocketTransport
+from phone_agent.adb.transport import get_transport, record_adb_command, run_adb
+
+_enabled = os.getenv("PHONE_AGENT_PERSISTENT_SHELL", "").lower() in ("1", "true")
+_sessions: dict[str | None, "ShellSession"] = {}
+_sessions_lock = threading.Lock()
+
+
+class ShellSessionUnavailable(ConnectionError):
+    """Raised when a command could not be handed to the shell; it did not run."""
+
+
+class ShellSession:
+    """
+    A long-lived interactive `adb shell` for one device.
+
+    Commands are written to the shell's stdin followed by an `echo` of a unique
+    sentinel, and output is collected until the sentinel line comes back, so
+    each command costs one pipe write instead of an adb process launch.
+
+    The session runs over the selected transport: an `adb shell` child process
+    for SubprocessTransport, or a shell: service socket for SocketTransport.
+
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+    """
+
+    def __init__(self, device_id: str | None = None):
+        self.device_id = device_id
+        self._lock = threading.Lock()
+        self._token = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self._lines: queue.Queue | None = None
+        self._process: subprocess.Popen | None = None
+        self._sock = None
+
+    @property
+    def alive(self) -> bool:
+        """Whether the underlying shell is running."""
+        if self._process is not None:
+            return self._process.poll() is None
+        return self._sock is not None
+
+    def run(self, command: str, timeout: float = 10) -> str:
+        """
+        Run a command in the session.
+
+        Args:
+            command: Shell command line, e.g. "input tap 100 200".
+            timeout: Timeout in seconds.
+
+        Returns:
+            The command output (stdout and stderr combined).
+
+        Raises:
+            ShellSessionUnavailable: If the shell could not be started or the
+                command could not be written to it.
+            subprocess.TimeoutExpired: If the sentinel does not arrive in time.
+                The session is closed and restarted on the next command.
+            ConnectionError: If the shell exits after the command was written.
+        """
+        with self._lock:
+            if not self.alive:
+                try:
+                    self._start()
+                except (ADBProtocolError, OSError, subprocess.TimeoutExpired) as e:
+                    self._close_locked()
+                    raise ShellSessionUnavailable(
+                        f"Cannot start adb shell session: {e}"
+                    ) from e
+            return self._run_locked(command, timeout)
+
+    def close(self) -> None:
+        """Terminate the shell."""
+        with self._lock:
+            self._close_locked()
+
+    def _run_locked(self, command: str, timeout: float) -> str:
+        self._seq += 1
+        sentinel = f"__phone_agent_{self._token}_{self._seq}__"
+        # The quotes keep the sentinel out of the input echo a pty would produce
+        self._write(f"{command}\necho {sentinel[:-2]}''{sentinel[-2:]}\n")
+
+        output = []
+        try:
+            while True:
+                line = self._lines.get(timeout=timeout)
+                if line is None:
+                    self._close_locked()
+                    raise ConnectionError("adb shell session closed")
+                idx = line.find(sentinel)
+                if idx >= 0:
+                    # Output without a trailing newline shares the sentinel line
+                    output.append(line[:idx])
+                    return "".join(output)
+                output.append(line)
+        except queue.Empty:
+            self._close_locked()
+            raise subprocess.TimeoutExpired(command, timeout)
+
+    def _start(self) -> None:
+        """Open the shell over the active transport."""
+        transport = get_transport()
+        self._lines = queue.Queue()
+
+        if isinstance(transport, SocketTransport):
+            # Interactive shell: services run under a pty
+            self._sock = transport.client.open_service("shell:", self.device_id)
+            self._sock.settimeout(None)
+            reader = self._sock.makefile("rb")
+        else:
+            cmd = [getattr(transport, "adb_path", "adb")]
+            if self.device_id:
+                cmd.extend(["-s", self.device_id])
+            cmd.append("shell")
+            self._process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            )
+            reader = self._process.stdout
+
+        threading.Thread(
+            target=self._read_lines,
+            args=(reader, self._lines),
+            name=f"adb-shell-{self.device_id or 'default'}",
+            daemon=True,
+        ).start()
+
+        # Silence prompt and echo in case the shell got a pty, then sync up
+        self._run_locked("PS1=''; stty -echo 2>/dev/null", timeout=10)
+
+    def _write(self, data: str) -> None:
+        payload = data.encode("utf-8")
+        try:
+            if self._sock is not None:
+                self._sock.sendall(payload)
+            else:
+                self._process.stdin.write(payload)
+                self._process.stdin.flush()
+        except OSError as e:
+            self._close_locked()
+            raise ShellSessionUnavailable(f"adb shell session closed: {e}") from e
+
+    @staticmethod
+    def _read_lines(reader, lines: queue.Queue) -> None:
+        """Forward shell output lines to the queue, None on EOF."""
+        try:
+            for raw in iter(reader.readline, b""):
+                lines.put(raw.decode("utf-8", errors="replace").rstrip("\r\n") + "\n")
+        except (OSError, ValueError):
+            pass
+        lines.put(None)
+
+    def _close_locked(self) -> None:
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+def set_persistent_shell(enabled: bool) -> None:
+    """
+    Enable or disable persistent shell sessions for input commands.
+
+    Also controlled by the PHONE_AGENT_PERSISTENT_SHELL environment variable.
+    """
+    global _enabled
+    _enabled = enabled
+    if not enabled:
+        close_shell_sessions()
+
+
+def get_shell_session(device_id: str | None = None) -> ShellSession:
+    """Get the shared shell session for a device, creating it on first use."""
+    with _sessions_lock:
+        if device_id not in _sessions:
+            _sessions[device_id] = ShellSession(device_id)
+        return _sessions[device_id]
+
+
+def close_shell_sessions(device_id: str | None = None) -> None:
+    """
+    Close shell sessions.
+
+    Args:
+        device_id: Device whose session to close. If None, closes all sessions.
+    """
+    with _sessions_lock:
+        if device_id is None:
+            sessions = list(_sessions.values())
+            _sessions.clear()
+        else:
+            session = _sessions.pop(device_id, None)
+            sessions = [session] if session else []
+
+    for session in sessions:
+        session.close()
+
+
+def run_shell(command: str, device_id: str | None = None, timeout: float = 10) -> str:
+    """
+    Run a shell command, through the persistent session if enabled.
+
+    Falls back to a one-off `adb shell` if the command could not be handed to
+    the session. Once it was written, a failure is raised instead, since
+    running the command again could repeat an input event.
+
+    Args:
+        command: Shell command line, e.g. "input tap 100 200".
+        device_id: Optional ADB device ID for multi-device setups.
+        timeout: Timeout in seconds.
+
+    Returns:
+        The command output (stdout and stderr combined).
+
+    Raises:
+        subprocess.TimeoutExpired: If the command does not finish in time.
+        ConnectionError: If the session closed while the command was running.
+    """
+    if _enabled:
+        start = time.perf_counter()
+        try:
+            output = get_shell_session(device_id).run(command, timeout)
+        except ShellSessionUnavailable as e:
+            record_adb_command(["shell"], start, error=e)
+        except (ConnectionError, subprocess.TimeoutExpired) as e:
+            # The session is already closed, the next command restarts it
+            record_adb_command(["shell"], start, error=e)
+            raise
+        else:
+            record_adb_command(["shell"], start, returncode=0)
+            return output
+
+    result = run_adb(["shell", command], device_id, timeout=timeout)
+    return result.stdout + result.stderr
+
+
+atexit.register(close_shell_sessions)
@@ -0,0 +1,471 @@
+"""Native client for the adb host protocol over the local adb server socket."""
+
+import os
+import socket
+import struct
+import subprocess
+import threading
+
+from phone_agent.adb.transport import SubprocessTransport
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5037
+
+# Packet ids of the shell v2 protocol
+_SHELL_STDOUT = 1
+_SHELL_STDERR = 2
+_SHELL_EXIT = 3
+
+
+class ADBProtocolError(Exception):
+    """Raised when the adb server or device rejects a request."""
+
+
+class ADBSocketClient:
+    """
+    Speaks the adb host protocol to the local adb server over TCP.
+
+    Requests are framed as a 4-digit hex length followed by the service name,
+    and answered with OKAY or FAIL (plus a length-prefixed message). Device
+    services (shell:, exec:, sync:, tcpip:) are reached by first switching the
+    connection to the device with host:transport. Shell commands use the shell
+    v2 protocol when the device supports it, which reports the exit status.
+
+    Args:
+        host: adb server host.
+        port: adb server port (default: $ANDROID_ADB_SERVER_PORT or 5037).
+        adb_path: Path to ADB executable, used to start the server if needed.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int | None = None,
+        adb_path: str = "adb",
+    ):
+        self.host = host
+        self.port = port or int(os.getenv("ANDROID_ADB_SERVER_PORT", DEFAULT_PORT))
+        self.adb_path = adb_path
+        self._server_started = False
+        # Whether each device supports shell v2, by serial
+        self._shell_v2: dict[str | None, bool] = {}
+
+    def host_query(self, service: str, timeout: float | None = None) -> str:
+        """
+        Run a host service that answers with a length-prefixed payload.
+
+        Args:
+            service: Host service, e.g. "host:devices-l" or "host:connect:ip:port".
+            timeout: Timeout in seconds.
+
+        Returns:
+            The decoded payload.
+        """
+        with self._connect(timeout) as sock:
+            self._send_request(sock, service)
+            self._read_status(sock)
+            return self._read_length_prefixed(sock).decode("utf-8", errors="replace")
+
+    def host_command(self, service: str, timeout: float | None = None) -> None:
+        """Run a host service that only answers OKAY (e.g. host:kill)."""
+        with self._connect(timeout) as sock:
+            self._send_request(sock, service)
+            self._read_status(sock)
+
+    def open_service(
+        self, service: str, serial: str | None = None, timeout: float | None = None
+    ) -> socket.socket:
+        """
+        Open a device service and return the connected socket.
+
+        Args:
+            service: Device service, e.g. "shell:ls" or "sync:".
+            serial: Device serial. If None, uses $ANDROID_SERIAL or the only device.
+            timeout: Timeout in seconds for socket operations.
+
+        Returns:
+            Socket positioned at the start of the service stream.
+        """
+        serial = serial or os.getenv("ANDROID_SERIAL")
+        sock = self._connect(timeout)
+        try:
+            if serial:
+                self._send_request(sock, f"host:transport:{serial}")
+            else:
+                self._send_request(sock, "host:transport-any")
+            self._read_status(sock)
+
+            self._send_request(sock, service)
+            self._read_status(sock)
+            return sock
+        except Exception:
+            sock.close()
+            raise
+
+    def read_service(
+        self, service: str, serial: str | None = None, timeout: float | None = None
+    ) -> bytes:
+        """Open a device service and read its output until the stream closes."""
+        with self.open_service(service, serial, timeout) as sock:
+            return self._read_all(sock)
+
+    def has_shell_v2(
+        self, serial: str | None = None, timeout: float | None = None
+    ) -> bool:
+        """Whether the device supports the shell v2 protocol (cached per serial)."""
+        serial = serial or os.getenv("ANDROID_SERIAL")
+        if serial not in self._shell_v2:
+            service = f"host-serial:{serial}:features" if serial else "host:features"
+            features = self.host_query(service, timeout).split(",")
+            self._shell_v2[serial] = "shell_v2" in features
+        return self._shell_v2[serial]
+
+    def shell(
+        self, command: str, serial: str | None = None, timeout: float | None = None
+    ) -> tuple[int, bytes, bytes]:
+        """
+        Run a shell command.
+
+        Args:
+            command: Shell command line.
+            serial: Device serial. If None, uses $ANDROID_SERIAL or the only device.
+            timeout: Timeout in seconds for socket operations.
+
+        Returns:
+            Tuple of (exit status, stdout, stderr). Devices without shell v2
+            (Android 6 and older) cannot report the exit status; for them it is
+            0 and stderr is merged into stdout.
+        """
+        if self.has_shell_v2(serial, timeout):
+            data = self.read_service(f"shell,v2,raw:{command}", serial, timeout)
+            return parse_shell_v2(data)
+        return 0, self.read_service(f"shell:{command}", serial, timeout), b""
+
+    def exec_out(
+        self, command: str, serial: str | None = None, timeout: float | None = None
+    ) -> bytes:
+        """Run a command with a raw binary-safe output stream."""
+        return self.read_service(f"exec:{command}", serial, timeout)
+
+    def _connect(self, timeout: float | None) -> socket.socket:
+        """Connect to the adb server, starting it once if it is not running."""
+        try:
+            return socket.create_connection((self.host, self.port), timeout=timeout)
+        except ConnectionRefusedError:
+            if self._server_started:
+                raise
+            self._server_started = True
+            subprocess.run(
+                [self.adb_path, "start-server"], capture_output=True, timeout=10
+            )
+            return socket.create_connection((self.host, self.port), timeout=timeout)
+
+    @staticmethod
+    def _send_request(sock: socket.socket, payload: str) -> None:
+        """Send a length-prefixed request."""
+        data = payload.encode("utf-8")
+        sock.sendall(f"{len(data):04x}".encode("ascii") + data)
+
+    @classmethod
+    def _read_status(cls, sock: socket.socket) -> None:
+        """Read an OKAY/FAIL status, raising ADBProtocolError on FAIL."""
+        status = cls._read_exactly(sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            message = cls._read_length_prefixed(sock).decode("utf-8", errors="replace")
+            raise ADBProtocolError(message)
+        raise ADBProtocolError(f"Unexpected response from adb server: {status!r}")
+
+    @classmethod
+    def _read_length_prefixed(cls, sock: socket.socket) -> bytes:
+        """Read a payload prefixed by a 4-digit hex length."""
+        length = int(cls._read_exactly(sock, 4), 16)
+        return cls._read_exactly(sock, length)
+
+    @staticmethod
+    def _read_exactly(sock: socket.socket, size: int) -> bytes:
+        """Read exactly size bytes from the socket."""
+        chunks = []
+        remaining = size
+        while remaining > 0:
+            chunk = sock.recv(remaining)
+            if not chunk:
+                raise ADBProtocolError("Connection closed by adb server")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    @staticmethod
+    def _read_all(sock: socket.socket) -> bytes:
+        """Read until the service closes the stream."""
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+
+class ADBDevice:
+    """
+    A device reached through the adb server socket.
+
+    shell: and exec: services consume their connection, so those open a new
+    localhost socket per command (no process fork). The sync: connection used
+    for file transfer supports many requests and is kept open and reused.
+
+    Args:
+        client: Socket client for the adb server.
+        serial: Device serial, or None for the only connected device.
+    """
+
+    def __init__(self, client: ADBSocketClient, serial: str | None = None):
+        self.client = client
+        self.serial = serial
+        self._sync_sock: socket.socket | None = None
+        self._sync_lock = threading.Lock()
+
+    def shell(
+        self, command: str, timeout: float | None = None
+    ) -> tuple[int, bytes, bytes]:
+        """Run a shell command and return its exit status, stdout and stderr."""
+        return self.client.shell(command, self.serial, timeout)
+
+    def exec_out(self, command: str, timeout: float | None = None) -> bytes:
+        """Run a command with a raw binary-safe output stream."""
+        return self.client.exec_out(command, self.serial, timeout)
+
+    def pull(self, remote_path: str, timeout: float | None = None) -> bytes:
+        """
+        Read a file from the device over the sync protocol.
+
+        Args:
+            remote_path: Path on the device.
+            timeout: Timeout in seconds.
+
+        Returns:
+            File contents.
+        """
+        with self._sync_lock:
+            if self._sync_sock is None:
+                self._sync_sock = self.client.open_service(
+                    "sync:", self.serial, timeout
+                )
+            sock = self._sync_sock
+            sock.settimeout(timeout)
+            try:
+                return self._recv_file(sock, remote_path)
+            except ADBProtocolError as e:
+                if "Connection closed" in str(e):
+                    self._close_sync()
+                raise
+            except OSError:
+                self._close_sync()
+                raise
+
+    def close(self) -> None:
+        """Close the persistent sync connection."""
+        with self._sync_lock:
+            self._close_sync()
+
+    def _close_sync(self) -> None:
+        if self._sync_sock is not None:
+            try:
+                self._sync_sock.sendall(b"QUIT" + struct.pack("<I", 0))
+            except OSError:
+                pass
+            self._sync_sock.close()
+            self._sync_sock = None
+
+    @staticmethod
+    def _recv_file(sock: socket.socket, remote_path: str) -> bytes:
+        """Send a sync RECV request and collect the DATA chunks until DONE."""
+        path = remote_path.encode("utf-8")
+        sock.sendall(b"RECV" + struct.pack("<I", len(path)) + path)
+
+        chunks = []
+        while True:
+            header = ADBSocketClient._read_exactly(sock, 8)
+            packet_id, length = header[:4], struct.unpack("<I", header[4:])[0]
+            if packet_id == b"DATA":
+                chunks.append(ADBSocketClient._read_exactly(sock, length))
+            elif packet_id == b"DONE":
+                return b"".join(chunks)
+            elif packet_id == b"FAIL":
+                message = ADBSocketClient._read_exactly(sock, length)
+                raise ADBProtocolError(message.decode("utf-8", errors="replace"))
+            else:
+                raise ADBProtocolError(f"Unexpected sync response: {packet_id!r}")
+
+
+class SocketTransport:
+    """
+    Runs adb commands over the adb server socket instead of forking adb.
+
+    Accepts the same command line arguments as the adb executable and returns
+    CompletedProcess results shaped like the CLI output, so it is a drop-in
+    replacement for SubprocessTransport. Commands without a native mapping
+    (e.g. start-server, install) fall back to the adb executable.
+
+    Args:
+        host: adb server host.
+        port: adb server port (default: $ANDROID_ADB_SERVER_PORT or 5037).
+        adb_path: Path to ADB executable.
+    """
+
+    name = "socket"
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int | None = None,
+        adb_path: str = "adb",
+    ):
+        self.client = ADBSocketClient(host, port, adb_path)
+        self.fallback = SubprocessTransport(adb_path)
+        self._devices: dict[str | None, ADBDevice] = {}
+        self._devices_lock = threading.Lock()
+
+    def device(self, device_id: str | None = None) -> ADBDevice:
+        """Get the reusable ADBDevice for a serial."""
+        with self._devices_lock:
+            if device_id not in self._devices:
+                self._devices[device_id] = ADBDevice(self.client, device_id)
+            return self._devices[device_id]
+
+    def run(
+        self,
+        args: list[str],
+        device_id: str | None = None,
+        timeout: float | None = None,
+        text: bool = True,
+    ) -> subprocess.CompletedProcess:
+        """
+        Run an adb command over the server socket.
+
+        Args:
+            args: adb command line arguments, e.g. ["shell", "input", "tap", "1", "2"].
+            device_id: Optional ADB device ID for multi-device setups.
+            timeout: Timeout in seconds.
+            text: Decode stdout/stderr as UTF-8 text instead of returning bytes.
+
+        Returns:
+            CompletedProcess with stdout, stderr and returncode.
+
+        Raises:
+            subprocess.TimeoutExpired: If the command does not finish in time.
+        """
+        try:
+            output = self._dispatch(args, device_id, timeout)
+        except socket.timeout:
+            raise subprocess.TimeoutExpired(["adb"] + args, timeout)
+        except (ADBProtocolError, OSError) as e:
+            return self._completed(args, 1, b"", f"error: {e}\n".encode(), text)
+
+        if output is None:
+            return self.fallback.run(args, device_id, timeout, text)
+        return self._completed(args, *output, text)
+
+    def _dispatch(
+        self, args: list[str], device_id: str | None, timeout: float | None
+    ) -> tuple[int, bytes, bytes] | None:
+        """
+        Map an adb command line onto host protocol services.
+
+        Returns:
+            Tuple of (exit status, stdout, stderr), or None if the command has
+            no socket mapping.
+        """
+        command, rest = (args[0], args[1:]) if args else ("", [])
+
+        if command == "shell" and rest:
+            return self.device(device_id).shell(" ".join(rest), timeout)
+
+        if command == "exec-out" and rest:
+            return 0, self.device(device_id).exec_out(" ".join(rest), timeout), b""
+
+        if command == "pull" and len(rest) == 2:
+            data = self.device(device_id).pull(rest[0], timeout)
+            with open(rest[1], "wb") as f:
+                f.write(data)
+            return 0, f"{rest[0]}: 1 file pulled\n".encode("utf-8"), b""
+
+        if command == "devices":
+            service = "host:devices-l" if "-l" in rest else "host:devices"
+            output = self.client.host_query(service, timeout)
+            return 0, f"List of devices attached\n{output}\n".encode("utf-8"), b""
+
+        if command == "connect" and len(rest) == 1:
+            output = self.client.host_query(f"host:connect:{rest[0]}", timeout)
+            return 0, f"{output}\n".encode("utf-8"), b""
+
+        if command == "disconnect":
+            address = rest[0] if rest else ""
+            output = self.client.host_query(f"host:disconnect:{address}", timeout)
+            return 0, f"{output}\n".encode("utf-8"), b""
+
+        if command == "tcpip" and len(rest) == 1:
+            output = self.client.read_service(f"tcpip:{rest[0]}", device_id, timeout)
+            return 0, output, b""
+
+        if command == "kill-server":
+            self.client.host_command("host:kill", timeout)
+            with self._devices_lock:
+                for device in self._devices.values():
+                    device.close()
+                self._devices.clear()
+            self.client._shell_v2.clear()
+            return 0, b"", b""
+
+        if command == "version":
+            version = int(self.client.host_query("host:version", timeout), 16)
+            output = f"Android Debug Bridge version 1.0.{version}\n"
+            return 0, output.encode("utf-8"), b""
+
+        return None
+
+    @staticmethod
+    def _completed(
+        args: list[str], returncode: int, stdout: bytes, stderr: bytes, text: bool
+    ) -> subprocess.CompletedProcess:
+        if text:
+            return subprocess.CompletedProcess(
+                ["adb"] + args,
+                returncode,
+                stdout.decode("utf-8", errors="replace"),
+                stderr.decode("utf-8", errors="replace"),
+            )
+        return subprocess.CompletedProcess(["adb"] + args, returncode, stdout, stderr)
+
+
+def parse_shell_v2(data: bytes) -> tuple[int, bytes, bytes]:
+    """
+    Split the output of a shell v2 service into its streams.
+
+    Each packet is a one-byte stream id, a little-endian 32-bit length and the
+    payload. The stream ends with an exit packet holding the exit status.
+
+    Args:
+        data: Everything read from the service socket.
+
+    Returns:
+        Tuple of (exit status, stdout, stderr).
+
+    Raises:
+        ADBProtocolError: If the stream ended without an exit packet.
+    """
+    stdout, stderr = [], []
+    pos = 0
+    while pos + 5 <= len(data):
+        packet_id = data[pos]
+        length = struct.unpack("<I", data[pos + 1 : pos + 5])[0]
+        payload = data[pos + 5 : pos + 5 + length]
+        pos += 5 + length
+        if packet_id == _SHELL_STDOUT:
+            stdout.append(payload)
+        elif packet_id == _SHELL_STDERR:
+            stderr.append(payload)
+        elif packet_id == _SHELL_EXIT and payload:
+            return payload[0], b"".join(stdout), b"".join(stderr)
+    raise ADBProtocolError("Shell stream ended without an exit status")
@@ -0,0 +1,162 @@
+"""ADB command transports (adb executable or native adb server socket)."""
+
+import os
+import subprocess
+import time
+
+from phone_agent import metrics
+
+BACKENDS = ("subprocess", "socket")
+
+
+class SubprocessTransport:
+    """
+    Runs ADB commands by forking the adb executable.
+
+    Args:
+        adb_path: Path to ADB executable.
+    """
+
+    name = "subprocess"
+
+    def __init__(self, adb_path: str = "adb"):
+        self.adb_path = adb_path
+
+    def run(
+        self,
+        args: list[str],
+        device_id: str | None = None,
+        timeout: float | None = None,
+        text: bool = True,
+    ) -> subprocess.CompletedProcess:
+        """
+        Run an adb command.
+
+        Args:
+            args: adb command line arguments, e.g. ["shell", "input", "tap", "1", "2"].
+            device_id: Optional ADB device ID for multi-device setups.
+            timeout: Timeout in seconds.
+            text: Decode stdout/stderr as UTF-8 text instead of returning bytes.
+
+        Returns:
+            CompletedProcess with stdout, stderr and returncode.
+
+        Raises:
+            subprocess.TimeoutExpired: If the command does not finish in time.
+        """
+        cmd = [self.adb_path]
+        if device_id:
+            cmd.extend(["-s", device_id])
+        cmd.extend(args)
+
+        if text:
+            return subprocess.run(
+                cmd,
+                capture_output=True,
+                encoding="utf-8",
+                errors="replace",
+                timeout=timeout,
+            )
+        return subprocess.run(cmd, capture_output=True, timeout=timeout)
+
+
+_transport = None
+
+
+def get_transport():
+    """
+    Get the transport used by the ADB helpers.
+
+    Defaults to the backend named by the PHONE_AGENT_ADB_BACKEND environment
+    variable ("subprocess" or "socket"), or "subprocess" if unset.
+    """
+    global _transport
+    if _transport is None:
+        set_transport(os.getenv("PHONE_AGENT_ADB_BACKEND", "subprocess"))
+    return _transport
+
+
+def set_transport(transport) -> None:
+    """
+    Select the transport used by the ADB helpers.
+
+    Args:
+        transport: A backend name ("subprocess" or "socket") or a transport
+            instance providing run(args, device_id, timeout, text).
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    global _transport
+    if isinstance(transport, str):
+        if transport == "subprocess":
+            transport = SubprocessTransport()
+        elif transport == "socket":
+            from phone_agent.adb.socket_client import SocketTransport
+
+            transport = SocketTransport()
+        else:
+            raise ValueError(
+                f"Unknown ADB backend: {transport} (expected one of {BACKENDS})"
+            )
+    _transport = transport
+
+
+def run_adb(
+    args: list[str],
+    device_id: str | None = None,
+    timeout: float | None = None,
+    text: bool = True,
+) -> subprocess.CompletedProcess:
+    """
+    Run an adb command through the selected transport.
+
+    Args:
+        args: adb command line arguments, e.g. ["shell", "input", "tap", "1", "2"].
+        device_id: Optional ADB device ID for multi-device setups.
+        timeout: Timeout in seconds.
+        text: Decode stdout/stderr as UTF-8 text instead of returning bytes.
+
+    Returns:
+        CompletedProcess with stdout, stderr and returncode.
+
+    Raises:
+        subprocess.TimeoutExpired: If the command does not finish in time.
+    """
+    start = time.perf_counter()
+    try:
+        result = get_transport().run(
+            args, device_id=device_id, timeout=timeout, text=text
+        )
+    except Exception as e:
+        record_adb_command(args, start, error=e)
+        raise
+    record_adb_command(args, start, returncode=result.returncode)
+    return result
+
+
+def record_adb_command(
+    args: list[str],
+    start: float,
+    returncode: int | None = None,
+    error: Exception | None = None,
+) -> None:
+    """
+    Count an adb command and its outcome in the metrics.
+
+    Args:
+        args: adb command line arguments; the first one labels the metrics.
+        start: time.perf_counter() when the command started.
+        returncode: Exit status, if the command ran.
+        error: Exception raised instead, if any.
+    """
+    if not metrics.metrics_enabled():
+        return
+    command = args[0] if args else ""
+    metrics.ADB_COMMANDS.inc(command=command)
+    metrics.ADB_SECONDS.observe(time.perf_counter() - start, command=command)
+    if error is not None:
+        kind = "timeout" if isinstance(error, subprocess.TimeoutExpired) else "error"
+        metrics.ADB_ERRORS.inc(command=command, kind=kind)
+    elif returncode:
+        metrics.ADB_ERRORS.inc(command=command, kind="exit")
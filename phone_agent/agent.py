@@ -1,16 +1,138 @@
 """Main PhoneAgent class for orchestrating phone automation."""
 
 import json
+import time
 import traceback
-from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Any, Callable
 
-from phone_agent.actions import ActionHandler
+from phone_agent import metrics
+from phone_agent.actions import ActionHandler, ActionResult
 from phone_agent.actions.handler import do, finish, parse_action
-from phone_agent.adb import get_current_app, get_screenshot
-from phone_agent.config import get_messages, get_system_prompt
-from phone_agent.model import ModelClient, ModelConfig
-from phone_agent.model.client import MessageBuilder
+from phone_agent.adb import (
+    ImageEncoding,
+    Screenshot,
+    SettleConfig,
+    close_shell_sessions,
+    get_current_app,
+    get_screenshot,
+    screenshot_from_frame,
+)
+from phone_agent.config import get_date_line, get_messages, get_system_prompt
+from phone_agent.model import FullHistory, HistoryPolicy, ModelClient, ModelConfig
+from phone_agent.model.client import ImageHistory, MessageBuilder, ModelResponse
+from phone_agent.model.sink import ConsoleSink, NullSink, TokenSink
+from phone_agent.replay import ReplaySession, TrajectoryCache, TrajectoryStep
+from phone_agent.trace import StepTracer
+
+
+@dataclass
+class FrameDiffPolicy:
+    """
+    Skips model calls when an action left the screen unchanged.
+
+    If the screen at the start of a step matches the one the model answered
+    in the previous step, the agent waits and captures again instead of
+    asking the model about a screen it has already seen.
+
+    Args:
+        max_diff: Largest fraction of changed grid cells (see
+            Screenshot.block_diff) that still counts as unchanged, so the
+            status bar clock does not count as a change.
+        retries: Re-captures before the model is asked anyway.
+        wait: Seconds to wait before each re-capture.
+        actions: Actions after which an unchanged screen means the app has
+            not reacted yet. Others (e.g. Note) are not expected to change it.
+    """
+
+    max_diff: float = 0.01
+    retries: int = 2
+    wait: float = 0.5
+    actions: tuple[str, ...] = (
+        "Tap",
+        "Double Tap",
+        "Long Press",
+        "Swipe",
+        "Back",
+        "Home",
+        "Launch",
+        "Wait",
+    )
+
+
+@dataclass
+class FrameDiffStats:
+    """Counters for FrameDiffPolicy."""
+
+    checks: int = 0
+    unchanged: int = 0
+    recaptures: int = 0
+    # Unchanged screens that changed after re-waiting, so the model was never
+    # asked about them
+    calls_avoided: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        """Summary suitable for logging or JSON export."""
+        return {
+            "checks": self.checks,
+            "unchanged": self.unchanged,
+            "recaptures": self.recaptures,
+            "calls_avoided": self.calls_avoided,
+        }
+
+
+@dataclass
+class TaskUsage:
+    """Model usage of one task, summed over its steps."""
+
+    model_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Calls whose token counts were estimated locally (see ModelResponse)
+    estimated_calls: int = 0
+    # Calls whose stream was closed after the action (early dispatch)
+    cut_off_calls: int = 0
+    # Seconds summed over all calls
+    time_to_first_token: float = 0.0
+    generation_time: float = 0.0
+    model_time: float = 0.0
+
+    def add(self, response: ModelResponse) -> None:
+        """Count one model response."""
+        self.model_calls += 1
+        self.prompt_tokens += response.prompt_tokens
+        self.completion_tokens += response.completion_tokens
+        self.estimated_calls += response.usage_estimated
+        self.cut_off_calls += response.cut_off
+        self.time_to_first_token += response.time_to_first_token
+        self.generation_time += response.generation_time
+        self.model_time += response.total_time
+
+    @property
+    def mean_time_to_first_token(self) -> float:
+        """Average seconds to the first token, mostly prefill (image) cost."""
+        return self.time_to_first_token / self.model_calls if self.model_calls else 0.0
+
+    @property
+    def mean_inter_token_latency(self) -> float:
+        """Average seconds per generated token after the first, the decode cost."""
+        intervals = self.completion_tokens - self.model_calls
+        return self.generation_time / intervals if intervals > 0 else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        """Summary suitable for logging or JSON export."""
+        return {
+            "model_calls": self.model_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "estimated_calls": self.estimated_calls,
+            "cut_off_calls": self.cut_off_calls,
+            "mean_time_to_first_token": self.mean_time_to_first_token,
+            "mean_inter_token_latency": self.mean_inter_token_latency,
+            "generation_time": self.generation_time,
+            "model_time": self.model_time,
+        }
 
 
 @dataclass
@@ -22,10 +144,69 @@ class AgentConfig:
     lang: str = "cn"
     system_prompt: str | None = None
     verbose: bool = True
+    image_encoding: ImageEncoding = field(default_factory=ImageEncoding)
+    # After device actions, wait until the screen stops changing (opt-in,
+    # e.g. SettleConfig()). None sleeps a fixed settle_delay instead.
+    settle_config: SettleConfig | None = None
+    # Seconds to let the screen settle after a device action when adaptive
+    # settle detection is off or not supported by the device
+    settle_delay: float = 1.0
+    # Use the last frame of the post-action settle wait as the next
+    # screenshot instead of capturing again, with the app probe overlapping
+    # its encoding. Needs adaptive settle detection; with a fixed settle
+    # delay the next capture still follows the sleep.
+    pipelined: bool = False
+    # Which part of the conversation history is sent with each request
+    history: HistoryPolicy = field(default_factory=FullHistory)
+    # Keep the prompt prefix byte-stable across steps and tasks so model
+    # servers with prefix caching can reuse it: the date moves from the system
+    # prompt to the task message, history must be append-only, and sent
+    # screenshots stay in the context at full size
+    stable_prefix: bool = False
+    # Keep recent screenshots in the context as thumbnails. None keeps only
+    # the current screenshot.
+    image_history: ImageHistory | None = None
+    # Re-capture instead of calling the model when an action left the screen
+    # unchanged. None always calls the model.
+    frame_diff: FrameDiffPolicy | None = None
+    # Replay recorded trajectories of earlier successful runs of the same
+    # task while the screens match, and record new ones. None always calls
+    # the model.
+    replay_cache: TrajectoryCache | None = None
+    # Receives every StepResult, e.g. to write a JSON-lines or Chrome trace
+    tracer: StepTracer | None = None
+    # Receives the model's thinking as it streams. None prints it when
+    # verbose and discards it otherwise.
+    token_sink: TokenSink | None = None
 
     def __post_init__(self):
         if self.system_prompt is None:
-            self.system_prompt = get_system_prompt(self.lang)
+            self.system_prompt = get_system_prompt(
+                self.lang, include_date=not self.stable_prefix
+            )
+        if self.stable_prefix and not self.history.append_only:
+            raise ValueError(
+                f"{type(self.history).__name__} rewrites earlier messages; "
+                "stable_prefix needs an append-only history policy"
+            )
+        if self.stable_prefix and self.image_history is not None:
+            raise ValueError(
+                "image_history removes old thumbnails from earlier messages, "
+                "which stable_prefix does not allow"
+            )
+
+
+@dataclass
+class Observation:
+    """Screen state captured at the start of a step."""
+
+    screenshot: Screenshot
+    current_app: str
+    # Wall-clock seconds spent in each probe: capture, encode, app_probe, and
+    # settle when the observation waited for the previous action to settle
+    timings: dict[str, float] = field(default_factory=dict)
+    # time.perf_counter() at which each timed probe began
+    starts: dict[str, float] = field(default_factory=dict)
 
 
 @dataclass
@@ -37,6 +218,21 @@ class StepResult:
     action: dict[str, Any] | None
     thinking: str
     message: str | None = None
+    # Wall-clock seconds per stage: capture, encode, app_probe, observe,
+    # inference (split into ttft and generation), parse, action, settle,
+    # total. "observe" is the time the step was blocked on the screen state,
+    # which includes the settle wait in pipelined mode (where capture is 0,
+    # since the screenshot is the settle wait's last frame).
+    timings: dict[str, float] = field(default_factory=dict)
+    # time.perf_counter() at which each stage in timings began. Prefetched
+    # stages (pipelined mode) began before the step itself.
+    starts: dict[str, float] = field(default_factory=dict)
+    # The model stream was closed after the action (see ModelResponse.cut_off)
+    cut_off: bool = False
+    # Token usage of this step's model call (see ModelResponse); 0 when the
+    # step was replayed without one
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
 
 
 class PhoneAgent:
@@ -71,15 +267,29 @@ class PhoneAgent:
         self.model_config = model_config or ModelConfig()
         self.agent_config = agent_config or AgentConfig()
 
-        self.model_client = ModelClient(self.model_config)
+        self.model_client = ModelClient(
+            self.model_config, _token_sink(self.agent_config)
+        )
         self.action_handler = ActionHandler(
             device_id=self.agent_config.device_id,
             confirmation_callback=confirmation_callback,
             takeover_callback=takeover_callback,
+            action_delay=self.agent_config.settle_delay,
+            defer_settle=self.agent_config.pipelined,
+            settle_config=self.agent_config.settle_config,
         )
 
         self._context: list[dict[str, Any]] = []
         self._step_count = 0
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending_observation: Future | None = None
+        # Screen the model last answered and the action it chose
+        self._last_frame: Screenshot | None = None
+        self._last_action: str | None = None
+        self.frame_stats = FrameDiffStats()
+        self._replay: ReplaySession | None = None
+        # Model usage of the current task
+        self.usage = TaskUsage()
 
     def run(self, task: str) -> str:
         """
@@ -91,23 +301,26 @@ class PhoneAgent:
         Returns:
             Final message from the agent.
         """
-        self._context = []
-        self._step_count = 0
-
-        # First step with user prompt
-        result = self._execute_step(task, is_first=True)
-
-        if result.finished:
-            return result.message or "Task completed"
+        self.reset()
 
-        # Continue until finished or max steps reached
-        while self._step_count < self.agent_config.max_steps:
-            result = self._execute_step(is_first=False)
+        try:
+            # First step with user prompt
+            result = self._execute_step(task)
 
             if result.finished:
                 return result.message or "Task completed"
 
-        return "Max steps reached"
+            # Continue until finished or max steps reached
+            while self._step_count < self.agent_config.max_steps:
+                result = self._execute_step()
+
+                if result.finished:
+                    return result.message or "Task completed"
+
+            metrics.TASKS.inc(outcome="max_steps")
+            return "Max steps reached"
+        finally:
+            self.action_handler.release_keyboard()
 
     def step(self, task: str | None = None) -> StepResult:
         """
@@ -126,87 +339,101 @@ class PhoneAgent:
         if is_first and not task:
             raise ValueError("Task is required for the first step")
 
-        return self._execute_step(task, is_first)
+        result = self._execute_step(task)
+        if result.finished:
+            self.action_handler.release_keyboard()
+        return result
 
     def reset(self) -> None:
         """Reset the agent state for a new task."""
         self._context = []
         self._step_count = 0
-
-    def _execute_step(
-        self, user_prompt: str | None = None, is_first: bool = False
-    ) -> StepResult:
+        self._last_frame = None
+        self._replay = None
+        self.usage = TaskUsage()
+        self._discard_pending_observation()
+        self.action_handler.release_keyboard()
+
+    def close(self) -> None:
+        """Release the worker threads and the device's persistent shell session."""
+        self._discard_pending_observation()
+        self.action_handler.release_keyboard()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        close_shell_sessions(self.agent_config.device_id)
+
+    def _execute_step(self, user_prompt: str | None = None) -> StepResult:
         """Execute a single step of the agent loop."""
         self._step_count += 1
+        step_start = time.perf_counter()
 
         # Capture current screen state
-        screenshot = get_screenshot(self.agent_config.device_id)
-        current_app = get_current_app(self.agent_config.device_id)
-
-        # Build messages
-        if is_first:
-            self._context.append(
-                MessageBuilder.create_system_message(self.agent_config.system_prompt)
-            )
-
-            screen_info = MessageBuilder.build_screen_info(current_app)
-            text_content = f"{user_prompt}\n\n{screen_info}"
-
-            self._context.append(
-                MessageBuilder.create_user_message(
-                    text=text_content, image_base64=screenshot.base64_data
-                )
-            )
-        else:
-            screen_info = MessageBuilder.build_screen_info(current_app)
-            text_content = f"** Screen Info **\n\n{screen_info}"
-
-            self._context.append(
-                MessageBuilder.create_user_message(
-                    text=text_content, image_base64=screenshot.base64_data
-                )
-            )
+        observation = self._wait_for_change(self._observe())
+        screenshot = observation.screenshot
+        timings = dict(observation.timings)
+        starts = dict(observation.starts)
+        timings["observe"] = time.perf_counter() - step_start
+        starts["observe"] = step_start
+
+        _append_observation(self._context, observation, self.agent_config, user_prompt)
+
+        if user_prompt and self.agent_config.replay_cache is not None:
+            self._replay = ReplaySession(self.agent_config.replay_cache, user_prompt)
+        cached = (
+            self._replay.next_step(screenshot, observation.current_app)
+            if self._replay is not None
+            else None
+        )
 
-        # Get model response
+        # Get model response, or the recorded one when replaying
         try:
-            msgs = get_messages(self.agent_config.lang)
-            print("\n" + "=" * 50)
-            print(f"💭 {msgs['thinking']}:")
-            print("-" * 50)
-            response = self.model_client.request(self._context)
+            if self.agent_config.verbose:
+                _print_thinking_header(self.agent_config.lang)
+            stage_start = time.perf_counter()
+            if cached is not None:
+                response = _replayed_response(cached, self.agent_config)
+            else:
+                response = self.model_client.request(
+                    self.agent_config.history.apply(self._context)
+                )
+            _time_inference(timings, starts, stage_start, response)
         except Exception as e:
             if self.agent_config.verbose:
                 traceback.print_exc()
-            return StepResult(
-                success=False,
-                finished=True,
-                action=None,
-                thinking="",
-                message=f"Model error: {e}",
+            timings["total"] = time.perf_counter() - step_start
+            starts["total"] = step_start
+            return _report_step(
+                self.agent_config,
+                self._step_count,
+                StepResult(
+                    success=False,
+                    finished=True,
+                    action=None,
+                    thinking="",
+                    message=f"Model error: {e}",
+                    timings=timings,
+                    starts=starts,
+                ),
             )
 
-        # Parse action from response
-        try:
-            action = parse_action(response.action)
-        except ValueError:
-            if self.agent_config.verbose:
-                traceback.print_exc()
-            action = finish(message=response.action)
-
-        if self.agent_config.verbose:
-            # Print thinking process
-            print("-" * 50)
-            print(f"🎯 {msgs['action']}:")
-            print(json.dumps(action, ensure_ascii=False, indent=2))
-            print("=" * 50 + "\n")
+        stage_start = time.perf_counter()
+        action = _parse_model_action(response, self.agent_config)
+        timings["parse"] = time.perf_counter() - stage_start
+        starts["parse"] = stage_start
 
-        # Remove image from context to save space
-        self._context[-1] = MessageBuilder.remove_images_from_message(self._context[-1])
+        # Remove or shrink images in the context to save space. A stable
+        # prefix never rewrites a message that was already sent.
+        if not self.agent_config.stable_prefix:
+            MessageBuilder.compact_images(
+                self._context, self.agent_config.image_history
+            )
 
         # Execute action
+        stage_start = time.perf_counter()
         try:
             result = self.action_handler.execute(
-                action, screenshot.width, screenshot.height
+                action, screenshot.width, screenshot.height, before=screenshot
             )
         except Exception as e:
             if self.agent_config.verbose:
@@ -214,33 +441,156 @@ class PhoneAgent:
             result = self.action_handler.execute(
                 finish(message=str(e)), screenshot.width, screenshot.height
             )
+        _time_action(timings, starts, stage_start, result)
+
+        # The usage chunk is read while the action runs
+        if cached is None:
+            self.model_client.complete_usage(response)
+            self.usage.add(response)
+
+        finished = _record_outcome(self._context, response, action, result)
+        self._last_frame, self._last_action = screenshot, action.get("action")
+        _record_replay(self._replay, observation, response, action, result, finished)
 
-        # Add assistant response to context
-        self._context.append(
-            MessageBuilder.create_assistant_message(
-                f"<think>{response.thinking}</think><answer>{response.action}</answer>"
+        # Capture the next observation as part of the settle wait
+        if self.agent_config.pipelined and not finished:
+            self._prefetch_observation(
+                action.get("action"), result.settle_delay, screenshot
             )
+
+        timings["total"] = time.perf_counter() - step_start
+        starts["total"] = step_start
+        _print_step_end(self.agent_config, timings, finished, result, action)
+
+        return _report_step(
+            self.agent_config,
+            self._step_count,
+            StepResult(
+                success=result.success,
+                finished=finished,
+                action=action,
+                thinking=response.thinking,
+                message=result.message or action.get("message"),
+                timings=timings,
+                starts=starts,
+                cut_off=response.cut_off,
+                prompt_tokens=response.prompt_tokens,
+                completion_tokens=response.completion_tokens,
+            ),
         )
 
-        # Check if finished
-        finished = action.get("_metadata") == "finish" or result.should_finish
+    def _observe(self) -> Observation:
+        """Get the screen state, using the prefetched observation if available."""
+        if self._pending_observation is not None:
+            pending, self._pending_observation = self._pending_observation, None
+            return pending.result()
+
+        return self._capture_observation()
+
+    def _wait_for_change(self, observation: Observation) -> Observation:
+        """Re-capture while the screen still matches the one the model answered."""
+        policy = self.agent_config.frame_diff
+        if not _unchanged(
+            policy,
+            self.frame_stats,
+            self._last_frame,
+            self._last_action,
+            observation.screenshot,
+        ):
+            return observation
+
+        for _ in range(policy.retries):
+            time.sleep(policy.wait)
+            observation = self._capture_observation()
+            self.frame_stats.recaptures += 1
+            if observation.screenshot.block_diff(self._last_frame) > policy.max_diff:
+                self.frame_stats.calls_avoided += 1
+                break
+        return observation
+
+    def _capture_observation(self) -> Observation:
+        """
+        Capture the screenshot and probe the current app in parallel.
 
-        if finished and self.agent_config.verbose:
-            msgs = get_messages(self.agent_config.lang)
-            print("\n" + "🎉 " + "=" * 48)
-            print(
-                f"✅ {msgs['task_completed']}: {result.message or action.get('message', msgs['done'])}"
+        The two ADB calls are independent, so the step waits for the slower of
+        the two instead of their sum. The app probe runs on the agent's worker
+        pool while the screenshot is taken in the calling thread, so this is
+        safe to call from a worker as well.
+        """
+
+        return self._observe_with(
+            lambda: get_screenshot(
+                self.agent_config.device_id, encoding=self.agent_config.image_encoding
             )
-            print("=" * 50 + "\n")
-
-        return StepResult(
-            success=result.success,
-            finished=finished,
-            action=action,
-            thinking=response.thinking,
-            message=result.message or action.get("message"),
         )
 
+    def _observe_with(self, get_frame: Callable[[], Screenshot]) -> Observation:
+        """Run get_frame in the calling thread while the app is probed."""
+
+        def probe_app() -> tuple[str, float, float]:
+            stage_start = time.perf_counter()
+            current_app = get_current_app(self.agent_config.device_id)
+            return current_app, stage_start, time.perf_counter() - stage_start
+
+        app_future = self._get_executor().submit(probe_app)
+
+        stage_start = time.perf_counter()
+        screenshot = get_frame()
+        capture_time = time.perf_counter() - stage_start
+
+        current_app, probe_start, probe_time = app_future.result()
+        return _build_observation(
+            screenshot, stage_start, capture_time, current_app, probe_start, probe_time
+        )
+
+    def _prefetch_observation(
+        self, action_name: str, settle_delay: float, before: Screenshot
+    ) -> None:
+        """
+        Start the settle wait after an action and build the next observation.
+
+        With adaptive settle detection, the last frame the wait captured
+        becomes the next screenshot, so only its encoding and the app probe
+        follow the wait.
+        """
+
+        def observe_after_settle() -> Observation:
+            if settle_delay <= 0:
+                return self._capture_observation()
+
+            settle_start = time.perf_counter()
+            settle = self.action_handler.settle_tracker.wait(
+                action_name, fixed_delay=settle_delay, before=before
+            )
+            if settle.frame is None:
+                observation = self._capture_observation()
+            else:
+                observation = self._observe_with(
+                    lambda: screenshot_from_frame(
+                        settle.frame, self.agent_config.image_encoding
+                    )
+                )
+            observation.timings["settle"] = settle.elapsed
+            observation.starts["settle"] = settle_start
+            return observation
+
+        self._pending_observation = self._get_executor().submit(observe_after_settle)
+
+    def _discard_pending_observation(self) -> None:
+        """Drop a prefetched observation that belongs to a previous task."""
+        if self._pending_observation is not None:
+            self._pending_observation.cancel()
+            self._pending_observation = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Get the worker pool, creating it on first use."""
+        if self._executor is None:
+            # One worker for the prefetch job, one for the app probe it spawns
+            self._executor = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix="phone-agent"
+            )
+        return self._executor
+
     @property
     def context(self) -> list[dict[str, Any]]:
         """Get the current conversation context."""
@@ -250,3 +600,215 @@ class PhoneAgent:
     def step_count(self) -> int:
         """Get the current step count."""
         return self._step_count
+
+
+def _build_observation(
+    screenshot: Screenshot,
+    capture_start: float,
+    capture_time: float,
+    current_app: str,
+    probe_start: float,
+    probe_time: float,
+) -> Observation:
+    """Build an observation, splitting the capture time into transfer and encode."""
+    transfer_time = capture_time - screenshot.encode_time
+    return Observation(
+        screenshot=screenshot,
+        current_app=current_app,
+        timings={
+            "capture": transfer_time,
+            "encode": screenshot.encode_time,
+            "app_probe": probe_time,
+        },
+        starts={
+            "capture": capture_start,
+            "encode": capture_start + transfer_time,
+            "app_probe": probe_start,
+        },
+    )
+
+
+def _append_observation(
+    context: list[dict[str, Any]],
+    observation: Observation,
+    config: AgentConfig,
+    user_prompt: str | None = None,
+) -> None:
+    """Add the user message for an observation, starting a new context if empty."""
+    screen_info = MessageBuilder.build_screen_info(observation.current_app)
+
+    if not context:
+        context.append(MessageBuilder.create_system_message(config.system_prompt))
+        text_content = f"{user_prompt}\n\n{screen_info}"
+        if config.stable_prefix:
+            # The date changes daily, so it follows the shared system prompt
+            text_content = f"{get_date_line(config.lang)}\n\n{text_content}"
+    else:
+        text_content = f"** Screen Info **\n\n{screen_info}"
+
+    context.append(
+        MessageBuilder.create_user_message(
+            text=text_content,
+            image_base64=observation.screenshot.base64_data,
+            mime_type=observation.screenshot.mime_type,
+        )
+    )
+
+
+def _unchanged(
+    policy: FrameDiffPolicy | None,
+    stats: FrameDiffStats,
+    last_frame: Screenshot | None,
+    last_action: str | None,
+    screenshot: Screenshot,
+) -> bool:
+    """Whether an action that should change the screen left it as it was."""
+    if policy is None or last_frame is None or last_action not in policy.actions:
+        return False
+    stats.checks += 1
+    if screenshot.block_diff(last_frame) > policy.max_diff:
+        return False
+    stats.unchanged += 1
+    return True
+
+
+def _replayed_response(step: TrajectoryStep, config: AgentConfig) -> ModelResponse:
+    """Build the model response for a step replayed from the cache."""
+    if config.verbose:
+        print(f"[replay] {step.thinking}")
+    return ModelResponse(thinking=step.thinking, action=step.action, raw_content="")
+
+
+def _record_replay(
+    replay: ReplaySession | None,
+    observation: Observation,
+    response: ModelResponse,
+    action: dict[str, Any],
+    result: ActionResult,
+    finished: bool,
+) -> None:
+    """Record an executed step and, at the end of the task, its trajectory."""
+    if replay is None:
+        return
+    replay.record(
+        observation.screenshot,
+        observation.current_app,
+        response.action,
+        response.thinking,
+    )
+    if finished:
+        replay.finish(result.success and action.get("_metadata") == "finish")
+
+
+def _time_inference(
+    timings: dict[str, float],
+    starts: dict[str, float],
+    stage_start: float,
+    response: ModelResponse,
+) -> None:
+    """Record the model request, split into time to first token and generation."""
+    timings["inference"] = time.perf_counter() - stage_start
+    starts["inference"] = stage_start
+    if response.time_to_first_token or response.generation_time:
+        timings["ttft"] = response.time_to_first_token
+        timings["generation"] = response.generation_time
+        starts["ttft"] = stage_start
+        starts["generation"] = stage_start + response.time_to_first_token
+
+
+def _time_action(
+    timings: dict[str, float],
+    starts: dict[str, float],
+    stage_start: float,
+    result: ActionResult,
+) -> None:
+    """Record the action, and the settle wait that followed it if any."""
+    timings["action"] = time.perf_counter() - stage_start - result.settle_time
+    starts["action"] = stage_start
+    if result.settle_time:
+        timings["settle"] = result.settle_time
+        starts["settle"] = stage_start + timings["action"]
+
+
+def _report_step(config: AgentConfig, step: int, result: StepResult) -> StepResult:
+    """Hand a step result to the metrics and the configured tracer, and return it."""
+    if metrics.metrics_enabled():
+        for stage, seconds in result.timings.items():
+            metrics.STEP_SECONDS.observe(seconds, stage=stage)
+        outcome = "success" if result.success else "failure"
+        metrics.STEPS.inc(outcome=outcome)
+        if result.finished:
+            metrics.TASKS.inc(outcome=outcome)
+    if config.tracer is not None:
+        config.tracer.record(result, step=step, device_id=config.device_id)
+    return result
+
+
+def _token_sink(config: AgentConfig) -> TokenSink:
+    """The sink for the model's streamed thinking."""
+    if config.token_sink is not None:
+        return config.token_sink
+    return ConsoleSink() if config.verbose else NullSink()
+
+
+def _print_thinking_header(lang: str) -> None:
+    msgs = get_messages(lang)
+    print("\n" + "=" * 50)
+    print(f"💭 {msgs['thinking']}:")
+    print("-" * 50)
+
+
+def _parse_model_action(response: ModelResponse, config: AgentConfig) -> dict[str, Any]:
+    """Parse the action from a model response, finishing on unparsable output."""
+    try:
+        action = parse_action(response.action)
+    except ValueError:
+        if config.verbose:
+            traceback.print_exc()
+        action = finish(message=response.action)
+
+    if config.verbose:
+        # Print thinking process
+        msgs = get_messages(config.lang)
+        print("-" * 50)
+        print(f"🎯 {msgs['action']}:")
+        print(json.dumps(action, ensure_ascii=False, indent=2))
+        print("=" * 50 + "\n")
+
+    return action
+
+
+def _record_outcome(
+    context: list[dict[str, Any]],
+    response: ModelResponse,
+    action: dict[str, Any],
+    result: ActionResult,
+) -> bool:
+    """Add the assistant response to the context and return whether it finished."""
+    context.append(
+        MessageBuilder.create_assistant_message(
+            f"<think>{response.thinking}</think><answer>{response.action}</answer>"
+        )
+    )
+    return action.get("_metadata") == "finish" or result.should_finish
+
+
+def _print_step_end(
+    config: AgentConfig,
+    timings: dict[str, float],
+    finished: bool,
+    result: ActionResult,
+    action: dict[str, Any],
+) -> None:
+    if not config.verbose:
+        return
+
+    print("⏱️  " + " | ".join(f"{stage} {sec:.2f}s" for stage, sec in timings.items()))
+
+    if finished:
+        msgs = get_messages(config.lang)
+        print("\n" + "🎉 " + "=" * 48)
+        print(
+            f"✅ {msgs['task_completed']}: {result.message or action.get('message', msgs['done'])}"
+        )
+        print("=" * 50 + "\n")
@@ -0,0 +1,402 @@
+"""Asyncio variant of PhoneAgent for driving many devices from one event loop."""
+
+import asyncio
+import time
+import traceback
+from typing import Any, Awaitable, Callable
+
+from phone_agent import metrics
+from phone_agent.actions import AsyncActionHandler
+from phone_agent.actions.handler import finish
+from phone_agent.adb import (
+    Screenshot,
+    get_current_app_async,
+    get_screenshot_async,
+    screenshot_from_frame,
+)
+from phone_agent.agent import (
+    AgentConfig,
+    FrameDiffStats,
+    Observation,
+    StepResult,
+    TaskUsage,
+    _append_observation,
+    _build_observation,
+    _parse_model_action,
+    _print_step_end,
+    _print_thinking_header,
+    _record_outcome,
+    _record_replay,
+    _replayed_response,
+    _report_step,
+    _time_action,
+    _time_inference,
+    _token_sink,
+    _unchanged,
+)
+from phone_agent.model import AsyncModelClient, ModelConfig
+from phone_agent.model.client import MessageBuilder
+from phone_agent.replay import ReplaySession
+
+
+class AsyncPhoneAgent:
+    """
+    PhoneAgent built on asyncio.
+
+    Same run/step semantics as PhoneAgent, but model streaming (AsyncOpenAI),
+    ADB calls (asyncio subprocesses or adb server connections) and settle
+    waits are awaited, so one event loop can drive dozens of devices without
+    a thread per device.
+
+    Args:
+        model_config: Configuration for the AI model.
+        agent_config: Configuration for the agent behavior.
+        confirmation_callback: Optional callback for sensitive action confirmation.
+            May be a coroutine function.
+        takeover_callback: Optional callback for takeover requests.
+            May be a coroutine function.
+
+    Example:
+        >>> import asyncio
+        >>> from phone_agent import AsyncPhoneAgent
+        >>> from phone_agent.agent import AgentConfig
+        >>>
+        >>> async def main():
+        ...     agents = [
+        ...         AsyncPhoneAgent(agent_config=AgentConfig(device_id=serial))
+        ...         for serial in ["emulator-5554", "emulator-5556"]
+        ...     ]
+        ...     await asyncio.gather(*(agent.run("Open Settings") for agent in agents))
+        >>>
+        >>> asyncio.run(main())
+    """
+
+    def __init__(
+        self,
+        model_config: ModelConfig | None = None,
+        agent_config: AgentConfig | None = None,
+        confirmation_callback: Callable[[str], bool | Awaitable[bool]] | None = None,
+        takeover_callback: Callable[[str], None | Awaitable[None]] | None = None,
+    ):
+        self.model_config = model_config or ModelConfig()
+        self.agent_config = agent_config or AgentConfig()
+
+        self.model_client = AsyncModelClient(
+            self.model_config, _token_sink(self.agent_config)
+        )
+        self.action_handler = AsyncActionHandler(
+            device_id=self.agent_config.device_id,
+            confirmation_callback=confirmation_callback,
+            takeover_callback=takeover_callback,
+            action_delay=self.agent_config.settle_delay,
+            defer_settle=self.agent_config.pipelined,
+            settle_config=self.agent_config.settle_config,
+        )
+
+        self._context: list[dict[str, Any]] = []
+        self._step_count = 0
+        self._pending_observation: asyncio.Task | None = None
+        # Screen the model last answered and the action it chose
+        self._last_frame: Screenshot | None = None
+        self._last_action: str | None = None
+        self.frame_stats = FrameDiffStats()
+        self._replay: ReplaySession | None = None
+        # Model usage of the current task
+        self.usage = TaskUsage()
+
+    async def run(self, task: str) -> str:
+        """
+        Run the agent to complete a task.
+
+        Args:
+            task: Natural language description of the task.
+
+        Returns:
+            Final message from the agent.
+        """
+        await self.reset()
+
+        try:
+            # First step with user prompt
+            result = await self._execute_step(task)
+
+            if result.finished:
+                return result.message or "Task completed"
+
+            # Continue until finished or max steps reached
+            while self._step_count < self.agent_config.max_steps:
+                result = await self._execute_step()
+
+                if result.finished:
+                    return result.message or "Task completed"
+
+            metrics.TASKS.inc(outcome="max_steps")
+            return "Max steps reached"
+        finally:
+            await self.action_handler.release_keyboard()
+
+    async def step(self, task: str | None = None) -> StepResult:
+        """
+        Execute a single step of the agent.
+
+        Args:
+            task: Task description (only needed for first step).
+
+        Returns:
+            StepResult with step details.
+        """
+        if not self._context and not task:
+            raise ValueError("Task is required for the first step")
+
+        result = await self._execute_step(task)
+        if result.finished:
+            await self.action_handler.release_keyboard()
+        return result
+
+    async def reset(self) -> None:
+        """Reset the agent state for a new task."""
+        self._context = []
+        self._step_count = 0
+        self._last_frame = None
+        self._replay = None
+        self.usage = TaskUsage()
+        self._discard_pending_observation()
+        await self.action_handler.release_keyboard()
+
+    async def close(self) -> None:
+        """Cancel background work and restore the device keyboard."""
+        self._discard_pending_observation()
+        await self.action_handler.release_keyboard()
+
+    async def _execute_step(self, user_prompt: str | None = None) -> StepResult:
+        """Execute a single step of the agent loop."""
+        self._step_count += 1
+        step_start = time.perf_counter()
+
+        # Capture current screen state
+        observation = await self._wait_for_change(await self._observe())
+        screenshot = observation.screenshot
+        timings = dict(observation.timings)
+        starts = dict(observation.starts)
+        timings["observe"] = time.perf_counter() - step_start
+        starts["observe"] = step_start
+
+        _append_observation(self._context, observation, self.agent_config, user_prompt)
+
+        if user_prompt and self.agent_config.replay_cache is not None:
+            self._replay = ReplaySession(self.agent_config.replay_cache, user_prompt)
+        cached = None
+        if self._replay is not None:
+            # Reads the cache file and decodes the screenshot
+            cached = await asyncio.to_thread(
+                self._replay.next_step, screenshot, observation.current_app
+            )
+
+        # Get model response, or the recorded one when replaying
+        try:
+            if self.agent_config.verbose:
+                _print_thinking_header(self.agent_config.lang)
+            stage_start = time.perf_counter()
+            if cached is not None:
+                response = _replayed_response(cached, self.agent_config)
+            else:
+                response = await self.model_client.request(
+                    self.agent_config.history.apply(self._context)
+                )
+            _time_inference(timings, starts, stage_start, response)
+        except Exception as e:
+            if self.agent_config.verbose:
+                traceback.print_exc()
+            timings["total"] = time.perf_counter() - step_start
+            starts["total"] = step_start
+            return _report_step(
+                self.agent_config,
+                self._step_count,
+                StepResult(
+                    success=False,
+                    finished=True,
+                    action=None,
+                    thinking="",
+                    message=f"Model error: {e}",
+                    timings=timings,
+                    starts=starts,
+                ),
+            )
+
+        stage_start = time.perf_counter()
+        action = _parse_model_action(response, self.agent_config)
+        timings["parse"] = time.perf_counter() - stage_start
+        starts["parse"] = stage_start
+
+        # Remove or shrink images in the context to save space. A stable
+        # prefix never rewrites a message that was already sent. Shrinking
+        # decodes and re-encodes screenshots, so it runs off the event loop.
+        if not self.agent_config.stable_prefix:
+            await asyncio.to_thread(
+                MessageBuilder.compact_images,
+                self._context,
+                self.agent_config.image_history,
+            )
+
+        # Execute action
+        stage_start = time.perf_counter()
+        try:
+            result = await self.action_handler.execute(
+                action, screenshot.width, screenshot.height, before=screenshot
+            )
+        except Exception as e:
+            if self.agent_config.verbose:
+                traceback.print_exc()
+            result = await self.action_handler.execute(
+                finish(message=str(e)), screenshot.width, screenshot.height
+            )
+        _time_action(timings, starts, stage_start, result)
+
+        # The usage chunk is read while the action runs
+        if cached is None:
+            await self.model_client.complete_usage(response)
+            self.usage.add(response)
+
+        finished = _record_outcome(self._context, response, action, result)
+        self._last_frame, self._last_action = screenshot, action.get("action")
+        if self._replay is not None:
+            await asyncio.to_thread(
+                _record_replay,
+                self._replay,
+                observation,
+                response,
+                action,
+                result,
+                finished,
+            )
+
+        # Capture the next observation as part of the settle wait
+        if self.agent_config.pipelined and not finished:
+            self._prefetch_observation(
+                action.get("action"), result.settle_delay, screenshot
+            )
+
+        timings["total"] = time.perf_counter() - step_start
+        starts["total"] = step_start
+        _print_step_end(self.agent_config, timings, finished, result, action)
+
+        return _report_step(
+            self.agent_config,
+            self._step_count,
+            StepResult(
+                success=result.success,
+                finished=finished,
+                action=action,
+                thinking=response.thinking,
+                message=result.message or action.get("message"),
+                timings=timings,
+                starts=starts,
+                cut_off=response.cut_off,
+                prompt_tokens=response.prompt_tokens,
+                completion_tokens=response.completion_tokens,
+            ),
+        )
+
+    async def _observe(self) -> Observation:
+        """Get the screen state, using the prefetched observation if available."""
+        if self._pending_observation is not None:
+            pending, self._pending_observation = self._pending_observation, None
+            return await pending
+
+        return await self._capture_observation()
+
+    async def _wait_for_change(self, observation: Observation) -> Observation:
+        """Re-capture while the screen still matches the one the model answered."""
+        policy = self.agent_config.frame_diff
+        if policy is None or self._last_frame is None:
+            return observation
+
+        # Comparing decodes both frames; keep that off the event loop
+        if not await asyncio.to_thread(
+            _unchanged,
+            policy,
+            self.frame_stats,
+            self._last_frame,
+            self._last_action,
+            observation.screenshot,
+        ):
+            return observation
+
+        for _ in range(policy.retries):
+            await asyncio.sleep(policy.wait)
+            observation = await self._capture_observation()
+            self.frame_stats.recaptures += 1
+            diff = await asyncio.to_thread(
+                observation.screenshot.block_diff, self._last_frame
+            )
+            if diff > policy.max_diff:
+                self.frame_stats.calls_avoided += 1
+                break
+        return observation
+
+    async def _capture_observation(self) -> Observation:
+        """Capture the screenshot and probe the current app concurrently."""
+        return await self._observe_with(
+            get_screenshot_async(
+                self.agent_config.device_id, encoding=self.agent_config.image_encoding
+            )
+        )
+
+    async def _observe_with(self, get_frame: Awaitable[Screenshot]) -> Observation:
+        """Await get_frame while the app is probed."""
+
+        async def timed(awaitable: Awaitable) -> tuple[Any, float, float]:
+            stage_start = time.perf_counter()
+            value = await awaitable
+            return value, stage_start, time.perf_counter() - stage_start
+
+        capture, probe = await asyncio.gather(
+            timed(get_frame),
+            timed(get_current_app_async(self.agent_config.device_id)),
+        )
+        return _build_observation(*capture, *probe)
+
+    def _prefetch_observation(
+        self, action_name: str, settle_delay: float, before: Screenshot
+    ) -> None:
+        """Async version of PhoneAgent._prefetch_observation()."""
+
+        async def observe_after_settle() -> Observation:
+            if settle_delay <= 0:
+                return await self._capture_observation()
+
+            settle_start = time.perf_counter()
+            settle = await self.action_handler.settle_tracker.wait_async(
+                action_name, fixed_delay=settle_delay, before=before
+            )
+            if settle.frame is None:
+                observation = await self._capture_observation()
+            else:
+                observation = await self._observe_with(
+                    asyncio.to_thread(
+                        screenshot_from_frame,
+                        settle.frame,
+                        self.agent_config.image_encoding,
+                    )
+                )
+            observation.timings["settle"] = settle.elapsed
+            observation.starts["settle"] = settle_start
+            return observation
+
+        self._pending_observation = asyncio.ensure_future(observe_after_settle())
+
+    def _discard_pending_observation(self) -> None:
+        """Drop a prefetched observation that belongs to a previous task."""
+        if self._pending_observation is not None:
+            self._pending_observation.cancel()
+            self._pending_observation = None
+
+    @property
+    def context(self) -> list[dict[str, Any]]:
+        """Get the current conversation context."""
+        return self._context.copy()
+
+    @property
+    def step_count(self) -> int:
+        """Get the current step count."""
+        return self._step_count
@@ -1,24 +1,43 @@
 """Configuration module for Phone Agent."""
 
+from phone_agent.config import prompts_en, prompts_zh
 from phone_agent.config.apps import APP_PACKAGES
 from phone_agent.config.i18n import get_message, get_messages
 from phone_agent.config.prompts_en import SYSTEM_PROMPT as SYSTEM_PROMPT_EN
 from phone_agent.config.prompts_zh import SYSTEM_PROMPT as SYSTEM_PROMPT_ZH
 
 
-def get_system_prompt(lang: str = "cn") -> str:
+def get_system_prompt(lang: str = "cn", include_date: bool = True) -> str:
     """
     Get system prompt by language.
 
     Args:
         lang: Language code, 'cn' for Chinese, 'en' for English.
+        include_date: Start the prompt with today's date. Without it the
+            prompt is byte-identical on every day, so model servers can reuse
+            its cached prefix; see get_date_line().
 
     Returns:
         System prompt string.
     """
-    if lang == "en":
-        return SYSTEM_PROMPT_EN
-    return SYSTEM_PROMPT_ZH
+    prompts = prompts_en if lang == "en" else prompts_zh
+    if not include_date:
+        return prompts.PROMPT_BODY
+    return get_date_line(lang) + "\n" + prompts.PROMPT_BODY
+
+
+def get_date_line(lang: str = "cn") -> str:
+    """
+    Get the line stating today's date, as used at the top of the system prompt.
+
+    Args:
+        lang: Language code, 'cn' for Chinese, 'en' for English.
+
+    Returns:
+        Date line without a trailing newline.
+    """
+    prompts = prompts_en if lang == "en" else prompts_zh
+    return prompts.DATE_PREFIX + prompts.format_date()
 
 
 # Default to Chinese for backward compatibility
@@ -30,6 +49,7 @@ __all__ = [
     "SYSTEM_PROMPT_ZH",
     "SYSTEM_PROMPT_EN",
     "get_system_prompt",
+    "get_date_line",
     "get_messages",
     "get_message",
 ]
@@ -2,14 +2,16 @@
 
 from datetime import datetime
 
-today = datetime.today()
-formatted_date = today.strftime("%Y-%m-%d, %A")
+DATE_PREFIX = "The current date: "
+
+
+def format_date(today: datetime | None = None) -> str:
+    """Format a date (default: now) the way the system prompt states it."""
+    return (today or datetime.today()).strftime("%Y-%m-%d, %A")
+
 
-SYSTEM_PROMPT = (
-    "The current date: "
-    + formatted_date
-    + """
-# Setup
+# System prompt without the date line, identical on every day
+PROMPT_BODY = """# Setup
 You are a professional Android operation agent assistant that can fulfill the user's high-level instructions. Given a screenshot of the Android interface at each step, you first analyze the situation, then plan the best course of action using Python-style pseudo-code.
 
 # More details about the code
@@ -76,4 +78,8 @@ REMEMBER:
 - Only ONE LINE of action in <answer> part per response: Each step must contain exactly one line of executable code.
 - Generate execution code strictly according to format requirements.
 """
-)
+
+today = datetime.today()
+formatted_date = format_date(today)
+
+SYSTEM_PROMPT = DATE_PREFIX + formatted_date + "\n" + PROMPT_BODY
@@ -0,0 +1,407 @@
+"""Fleet runner that spreads a queue of tasks across all attached devices."""
+
+import asyncio
+import dataclasses
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable
+
+from phone_agent import metrics
+from phone_agent.adb import list_devices
+from phone_agent.agent import AgentConfig
+from phone_agent.async_agent import AsyncPhoneAgent
+from phone_agent.model import ModelConfig
+
+
+class DeviceLostError(Exception):
+    """Raised when a leased device disconnects while running a task."""
+
+
+@dataclass
+class FleetTask:
+    """A task waiting in the fleet queue."""
+
+    task_id: int
+    task: str
+    attempts: int = 0
+
+
+@dataclass
+class TaskResult:
+    """Outcome of one task run by the fleet."""
+
+    task_id: int
+    task: str
+    success: bool
+    message: str
+    device_id: str | None = None
+    attempts: int = 1
+    duration: float = 0.0
+    steps: int = 0
+    # Model tokens used by the last attempt
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+@dataclass
+class DeviceStats:
+    """Work done by one device during a fleet run."""
+
+    device_id: str
+    tasks_completed: int = 0
+    tasks_failed: int = 0
+    times_lost: int = 0
+    busy_time: float = 0.0
+
+    def utilisation(self, wall_time: float) -> float:
+        """Fraction of the run this device spent executing tasks."""
+        return self.busy_time / wall_time if wall_time > 0 else 0.0
+
+
+@dataclass
+class FleetReport:
+    """Results and throughput of a fleet run."""
+
+    results: list[TaskResult]
+    devices: dict[str, DeviceStats]
+    wall_time: float
+
+    @property
+    def completed(self) -> int:
+        """Number of tasks that finished successfully."""
+        return sum(1 for result in self.results if result.success)
+
+    @property
+    def failed(self) -> int:
+        """Number of tasks that failed or ran out of retries."""
+        return len(self.results) - self.completed
+
+    @property
+    def tasks_per_hour(self) -> float:
+        """Successfully completed tasks per hour of wall time."""
+        return self.completed / self.wall_time * 3600 if self.wall_time > 0 else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Summary suitable for logging or JSON export."""
+        return {
+            "tasks": len(self.results),
+            "completed": self.completed,
+            "failed": self.failed,
+            "wall_time": self.wall_time,
+            "tasks_per_hour": self.tasks_per_hour,
+            "prompt_tokens": sum(result.prompt_tokens for result in self.results),
+            "completion_tokens": sum(
+                result.completion_tokens for result in self.results
+            ),
+            "devices": {
+                device_id: {
+                    "tasks_completed": stats.tasks_completed,
+                    "tasks_failed": stats.tasks_failed,
+                    "times_lost": stats.times_lost,
+                    "busy_time": stats.busy_time,
+                    "utilisation": stats.utilisation(self.wall_time),
+                }
+                for device_id, stats in self.devices.items()
+            },
+        }
+
+
+class DevicePool:
+    """
+    Leases attached devices to fleet workers.
+
+    The pool polls `adb devices` in the background, so devices that are
+    plugged in during a run join the pool, and devices that drop off are
+    reported as lost to the worker holding them.
+
+    Args:
+        device_ids: Restrict the pool to these serials. If None, every device
+            in the "device" state is used.
+        poll_interval: Seconds between device list refreshes.
+    """
+
+    def __init__(
+        self, device_ids: Iterable[str] | None = None, poll_interval: float = 5.0
+    ):
+        self.allowed = set(device_ids) if device_ids is not None else None
+        self.poll_interval = poll_interval
+        self._online: set[str] = set()
+        self._idle: list[str] = []
+        self._leased: set[str] = set()
+        self._changed = asyncio.Condition()
+
+    @property
+    def online(self) -> set[str]:
+        """Serials currently attached and usable."""
+        return set(self._online)
+
+    def is_online(self, device_id: str) -> bool:
+        """Whether the device was attached at the last refresh."""
+        return device_id in self._online
+
+    async def refresh(self) -> None:
+        """Re-read the attached devices and update the idle list."""
+        devices = await asyncio.to_thread(list_devices)
+        online = {
+            device.device_id
+            for device in devices
+            if device.status == "device"
+            and (self.allowed is None or device.device_id in self.allowed)
+        }
+
+        async with self._changed:
+            self._online = online
+            self._idle = [d for d in self._idle if d in online]
+            for device_id in sorted(online):
+                if device_id not in self._idle and device_id not in self._leased:
+                    self._idle.append(device_id)
+            self._changed.notify_all()
+
+    async def monitor(self) -> None:
+        """Refresh the device list every poll_interval seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self.refresh()
+
+    async def acquire(self, timeout: float | None = None) -> str:
+        """
+        Lease an idle device, waiting for one to become free.
+
+        Args:
+            timeout: Seconds to wait. None waits indefinitely.
+
+        Returns:
+            The leased device serial.
+
+        Raises:
+            TimeoutError: If no device became available in time.
+        """
+        async with self._changed:
+            await asyncio.wait_for(
+                self._changed.wait_for(lambda: bool(self._idle)), timeout
+            )
+            device_id = self._idle.pop(0)
+            self._leased.add(device_id)
+            return device_id
+
+    async def release(self, device_id: str) -> None:
+        """Return a leased device to the idle list."""
+        async with self._changed:
+            self._leased.discard(device_id)
+            if device_id in self._online and device_id not in self._idle:
+                self._idle.append(device_id)
+                self._changed.notify_all()
+
+    async def mark_lost(self, device_id: str) -> None:
+        """Drop a leased device until a refresh sees it attached again."""
+        async with self._changed:
+            self._leased.discard(device_id)
+            self._online.discard(device_id)
+
+
+class FleetRunner:
+    """
+    Runs a queue of tasks concurrently, one agent per attached device.
+
+    Each idle device takes the next task from the queue. If a device
+    disconnects mid-task, the task goes back to the queue for another device
+    (up to max_retries times) and the device rejoins the pool once it is
+    attached again. All agents share one event loop (see AsyncPhoneAgent).
+
+    Args:
+        model_config: Configuration for the AI model.
+        agent_config: Agent configuration used for every device; device_id is
+            filled in per device.
+        device_ids: Restrict the fleet to these serials. If None, uses every
+            attached device.
+        max_retries: Times a task is re-queued after losing its device.
+        device_timeout: Seconds to wait for a free device before failing the
+            remaining tasks. None waits indefinitely.
+        poll_interval: Seconds between device list refreshes.
+        confirmation_callback: Optional callback for sensitive action confirmation.
+        takeover_callback: Optional callback for takeover requests.
+
+    Example:
+        >>> runner = FleetRunner(ModelConfig(), AgentConfig(verbose=False))
+        >>> report = runner.run_sync(["Open Settings", "Open WeChat"])
+        >>> print(report.tasks_per_hour)
+    """
+
+    def __init__(
+        self,
+        model_config: ModelConfig | None = None,
+        agent_config: AgentConfig | None = None,
+        device_ids: Iterable[str] | None = None,
+        max_retries: int = 2,
+        device_timeout: float | None = 300.0,
+        poll_interval: float = 5.0,
+        confirmation_callback: Callable[[str], bool | Awaitable[bool]] | None = None,
+        takeover_callback: Callable[[str], None | Awaitable[None]] | None = None,
+    ):
+        self.model_config = model_config or ModelConfig()
+        self.agent_config = agent_config or AgentConfig()
+        self.device_ids = list(device_ids) if device_ids is not None else None
+        self.max_retries = max_retries
+        self.device_timeout = device_timeout
+        self.poll_interval = poll_interval
+        self.confirmation_callback = confirmation_callback
+        self.takeover_callback = takeover_callback
+
+    def run_sync(self, tasks: Iterable[str]) -> FleetReport:
+        """Run the tasks from synchronous code."""
+        return asyncio.run(self.run(tasks))
+
+    async def run(self, tasks: Iterable[str]) -> FleetReport:
+        """
+        Run all tasks across the fleet.
+
+        Args:
+            tasks: Natural language task descriptions.
+
+        Returns:
+            FleetReport with per-task results, per-device stats and throughput.
+        """
+        queue: asyncio.Queue[FleetTask] = asyncio.Queue()
+        for task_id, task in enumerate(tasks):
+            queue.put_nowait(FleetTask(task_id, task))
+
+        self._pool = DevicePool(self.device_ids, self.poll_interval)
+        self._agents: dict[str, AsyncPhoneAgent] = {}
+        self._stats: dict[str, DeviceStats] = {}
+        self._results: list[TaskResult] = []
+        self._running: set[asyncio.Task] = set()
+
+        start = time.perf_counter()
+        await self._pool.refresh()
+        monitor = asyncio.create_task(self._pool.monitor())
+        dispatcher = asyncio.create_task(self._dispatch(queue))
+        try:
+            await queue.join()
+        finally:
+            dispatcher.cancel()
+            monitor.cancel()
+            for running in self._running:
+                running.cancel()
+            for agent in self._agents.values():
+                await agent.close()
+        wall_time = time.perf_counter() - start
+
+        results = sorted(self._results, key=lambda result: result.task_id)
+        return FleetReport(results=results, devices=self._stats, wall_time=wall_time)
+
+    async def _dispatch(self, queue: asyncio.Queue) -> None:
+        """Hand queued tasks to devices as they become free."""
+        while True:
+            item = await queue.get()
+            try:
+                device_id = await self._pool.acquire(self.device_timeout)
+            except (TimeoutError, asyncio.TimeoutError):
+                self._results.append(
+                    TaskResult(
+                        task_id=item.task_id,
+                        task=item.task,
+                        success=False,
+                        message="No device available",
+                        attempts=item.attempts,
+                    )
+                )
+                queue.task_done()
+                continue
+
+            running = asyncio.create_task(self._run_task(item, device_id, queue))
+            self._running.add(running)
+            running.add_done_callback(self._running.discard)
+
+    async def _run_task(
+        self, item: FleetTask, device_id: str, queue: asyncio.Queue
+    ) -> None:
+        """Run one task on a leased device and record or re-queue it."""
+        item.attempts += 1
+        # Every exit path must reach task_done(), or queue.join() never returns
+        try:
+            stats = self._stats.setdefault(device_id, DeviceStats(device_id))
+            agent: AsyncPhoneAgent | None = None
+            start = time.perf_counter()
+
+            try:
+                agent = self._get_agent(device_id)
+                success, message = await self._drive(agent, item.task, device_id)
+                lost = False
+            except DeviceLostError:
+                lost = True
+            except Exception as e:
+                # ADB errors usually mean the device went away; check before blaming the task
+                await self._pool.refresh()
+                lost = not self._pool.is_online(device_id)
+                success, message = False, f"Error: {e}"
+
+            duration = time.perf_counter() - start
+            stats.busy_time += duration
+
+            if lost:
+                stats.times_lost += 1
+                await self._pool.mark_lost(device_id)
+                if item.attempts <= self.max_retries:
+                    queue.put_nowait(item)
+                    return
+                success, message = False, f"Device {device_id} lost"
+            else:
+                await self._pool.release(device_id)
+
+            if success:
+                stats.tasks_completed += 1
+            else:
+                stats.tasks_failed += 1
+            self._results.append(
+                TaskResult(
+                    task_id=item.task_id,
+                    task=item.task,
+                    success=success,
+                    message=message,
+                    device_id=device_id,
+                    attempts=item.attempts,
+                    duration=duration,
+                    steps=agent.step_count if agent else 0,
+                    prompt_tokens=agent.usage.prompt_tokens if agent else 0,
+                    completion_tokens=agent.usage.completion_tokens if agent else 0,
+                )
+            )
+        finally:
+            queue.task_done()
+
+    async def _drive(
+        self, agent: AsyncPhoneAgent, task: str, device_id: str
+    ) -> tuple[bool, str]:
+        """
+        Step the agent through a task, checking the device between steps.
+
+        Raises:
+            DeviceLostError: If the pool sees the device disconnect.
+        """
+        await agent.reset()
+        try:
+            result = await agent.step(task)
+            while not result.finished:
+                if not self._pool.is_online(device_id):
+                    raise DeviceLostError(device_id)
+                if agent.step_count >= self.agent_config.max_steps:
+                    metrics.TASKS.inc(outcome="max_steps")
+                    return False, "Max steps reached"
+                result = await agent.step()
+        finally:
+            await agent.action_handler.release_keyboard()
+
+        return result.success, result.message or "Task completed"
+
+    def _get_agent(self, device_id: str) -> AsyncPhoneAgent:
+        """Get the agent bound to a device, creating it on first use."""
+        if device_id not in self._agents:
+            self._agents[device_id] = AsyncPhoneAgent(
+                model_config=self.model_config,
+                agent_config=dataclasses.replace(
+                    self.agent_config, device_id=device_id
+                ),
+                confirmation_callback=self.confirmation_callback,
+                takeover_callback=self.takeover_callback,
+            )
+        return self._agents[device_id]
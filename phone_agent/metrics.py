@@ -0,0 +1,344 @@
+"""Prometheus-style metrics for long-running agent processes."""
+
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from fast ADB calls to slow model answers
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+_enabled = os.getenv("PHONE_AGENT_METRICS", "").lower() in ("1", "true")
+
+
+class _Metric:
+    """A named metric with one time series per combination of label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._series: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, object]) -> tuple[str, ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(
+                f"{self.name} expects labels {self.labels}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _format_labels(self, key: tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        """Lines of the text exposition format for this metric."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key: tuple[str, ...], value) -> list[str]:
+        return [f"{self.name}{self._format_labels(key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. requests served."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Add to the counter (no-op while metrics are disabled)."""
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """Current value of one series."""
+        return self._series.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. requests in flight."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        """Set the gauge (no-op while metrics are disabled)."""
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Add to the gauge (no-op while metrics are disabled)."""
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        """Subtract from the gauge (no-op while metrics are disabled)."""
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        """Current value of one series."""
+        return self._series.get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in cumulative buckets.
+
+    Args:
+        name: Metric name.
+        help: Description shown by scrapers.
+        labels: Label names.
+        buckets: Upper bounds of the buckets, ascending. +Inf is implied.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        """Record one value (no-op while metrics are disabled)."""
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        """Number of observations in one series."""
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _render_series(self, key: tuple[str, ...], series) -> list[str]:
+        counts, total, count = series
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == math.inf else _number(bound)
+            labels = self._format_labels(key, f'le="{le}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        lines.append(f"{self.name}_sum{self._format_labels(key)} {_number(total)}")
+        lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together for scraping."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        """Get or create a counter."""
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Gauge:
+        """Get or create a gauge."""
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Get or create a histogram."""
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is None:
+                self._metrics[metric.name] = metric
+                return metric
+        if type(existing) is not type(metric) or existing.labels != metric.labels:
+            raise ValueError(f"Metric {metric.name} is already registered differently")
+        return existing
+
+
+REGISTRY = MetricsRegistry()
+
+# Agent
+STEP_SECONDS = REGISTRY.histogram(
+    "phone_agent_step_seconds",
+    "Wall-clock seconds per agent step stage (see StepResult.timings)",
+    ("stage",),
+)
+STEPS = REGISTRY.counter(
+    "phone_agent_steps_total", "Agent steps executed", ("outcome",)
+)
+TASKS = REGISTRY.counter("phone_agent_tasks_total", "Agent tasks ended", ("outcome",))
+
+# Model
+MODEL_REQUESTS = REGISTRY.counter(
+    "phone_agent_model_requests_total",
+    "Streamed model requests by endpoint and outcome",
+    ("endpoint", "outcome"),
+)
+MODEL_FIRST_CHUNK_SECONDS = REGISTRY.histogram(
+    "phone_agent_model_first_chunk_seconds",
+    "Seconds to the first streamed chunk per endpoint",
+    ("endpoint",),
+)
+MODEL_OUTSTANDING = REGISTRY.gauge(
+    "phone_agent_model_outstanding_requests",
+    "Model requests in flight per endpoint",
+    ("endpoint",),
+)
+MODEL_TOKENS = REGISTRY.counter(
+    "phone_agent_model_tokens_total",
+    "Model tokens by kind: prompt and completion tokens (server-reported or estimated)",
+    ("kind",),
+)
+MODEL_STREAMS_CUT_OFF = REGISTRY.counter(
+    "phone_agent_model_streams_cut_off_total",
+    "Model streams closed after the action, before the server ended them",
+)
+MODEL_HEDGES = REGISTRY.counter(
+    "phone_agent_model_hedges_total",
+    "Hedged model requests issued, and won by the hedge",
+    ("event",),
+)
+
+# ADB
+ADB_COMMANDS = REGISTRY.counter(
+    "phone_agent_adb_commands_total", "ADB commands run", ("command",)
+)
+ADB_ERRORS = REGISTRY.counter(
+    "phone_agent_adb_errors_total",
+    "ADB commands that failed, by kind: exit (non-zero exit status), timeout "
+    "or error (the command could not be run)",
+    ("command", "kind"),
+)
+ADB_SECONDS = REGISTRY.histogram(
+    "phone_agent_adb_command_seconds", "Seconds per ADB command", ("command",)
+)
+
+
+def set_metrics_enabled(enabled: bool) -> None:
+    """
+    Enable or disable metric collection.
+
+    Metrics are off by default, so instrumented code costs only a flag check.
+    Also controlled by the PHONE_AGENT_METRICS environment variable.
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def metrics_enabled() -> bool:
+    """Whether metrics are being collected."""
+    return _enabled
+
+
+def start_metrics_server(
+    port: int = 9108, host: str = "0.0.0.0", registry: MetricsRegistry | None = None
+) -> ThreadingHTTPServer:
+    """
+    Enable metrics and serve them over HTTP on a background thread.
+
+    Every path returns the metrics in the Prometheus text format.
+
+    Args:
+        port: Port to listen on; 0 picks a free one.
+        host: Interface to bind.
+        registry: Registry to expose. Defaults to REGISTRY.
+
+    Returns:
+        The running server. Call shutdown() to stop it.
+    """
+    registry = registry or REGISTRY
+    set_metrics_enabled(True)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    return server
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
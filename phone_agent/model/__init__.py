@@ -1,5 +1,47 @@
 """Model client module for AI inference."""
 
-from phone_agent.model.client import ModelClient, ModelConfig
+from phone_agent.model.client import (
+    AsyncModelClient,
+    ImageHistory,
+    ModelClient,
+    ModelConfig,
+)
+from phone_agent.model.history import (
+    FullHistory,
+    HistoryPolicy,
+    LastTurns,
+    SummarizedHistory,
+    TokenBudget,
+    estimate_tokens,
+)
+from phone_agent.model.pool import Endpoint, EndpointPool, get_endpoint_pool
+from phone_agent.model.sink import (
+    CallbackSink,
+    ConsoleSink,
+    NullSink,
+    QueueSink,
+    TokenSink,
+)
 
-__all__ = ["ModelClient", "ModelConfig"]
+__all__ = [
+    "ModelClient",
+    "AsyncModelClient",
+    "ModelConfig",
+    "ImageHistory",
+    "Endpoint",
+    "EndpointPool",
+    "get_endpoint_pool",
+    # History policies
+    "HistoryPolicy",
+    "FullHistory",
+    "LastTurns",
+    "SummarizedHistory",
+    "TokenBudget",
+    "estimate_tokens",
+    # Token sinks
+    "TokenSink",
+    "NullSink",
+    "ConsoleSink",
+    "CallbackSink",
+    "QueueSink",
+]
@@ -1,10 +1,23 @@
 """Model client for AI inference using OpenAI-compatible API."""
 
+import ast
+import asyncio
+import base64
 import json
+import queue
+import threading
+import time
 from dataclasses import dataclass, field
+from io import BytesIO
 from typing import Any
 
-from openai import OpenAI
+from openai import BadRequestError
+from PIL import Image
+
+from phone_agent import metrics
+from phone_agent.model.history import estimate_message_tokens
+from phone_agent.model.pool import Endpoint, EndpointState, get_endpoint_pool
+from phone_agent.model.sink import ConsoleSink, MarkerMatcher, TokenSink
 
 
 @dataclass
@@ -19,6 +32,51 @@ class ModelConfig:
     top_p: float = 0.85
     frequency_penalty: float = 0.2
     extra_body: dict[str, Any] = field(default_factory=dict)
+    # Servers to balance requests across (URLs use api_key). If empty, only
+    # base_url is used.
+    endpoints: list[str | Endpoint] = field(default_factory=list)
+    # "least_outstanding" or "latency_weighted"
+    balancing: str = "least_outstanding"
+    # Hedging (opt-in): if the first chunk has not arrived within this
+    # percentile of recent first-chunk latencies, send a duplicate request to
+    # another endpoint and keep whichever finishes first. None disables.
+    hedge_percentile: float | None = None
+    # Stop sequences passed to the server
+    stop: list[str] = field(default_factory=lambda: ["</answer>"])
+    # Return as soon as the action call in the stream is complete, and cancel
+    # the rest of the generation (or drain it in the background if
+    # drain_after_action is set)
+    early_dispatch: bool = True
+    drain_after_action: bool = False
+    # Ask the server to report token usage at the end of the stream
+    # (stream_options.include_usage). With early dispatch the action is
+    # returned first, and up to usage_tail_chunks more chunks are read in the
+    # background for the usage chunk (see ModelClient.complete_usage()); the
+    # stop sequence normally ends the stream well before that. Streams cut
+    # off there, and servers that do not report usage or reject
+    # stream_options, fall back to local estimates.
+    include_usage: bool = True
+    usage_tail_chunks: int = 32
+
+
+@dataclass
+class ImageHistory:
+    """
+    Keeps recent screenshots in the context as small thumbnails.
+
+    Args:
+        keep: Number of most recent screenshots kept, including the current
+            one once its step is done.
+        max_long_edge: Thumbnail size of the longer side, in pixels.
+        quality: JPEG quality of the thumbnails (1-100).
+        max_bytes: Budget for the base64 data URLs of all kept thumbnails.
+            Older thumbnails that do not fit are removed.
+    """
+
+    keep: int = 3
+    max_long_edge: int = 320
+    quality: int = 40
+    max_bytes: int = 96 * 1024
 
 
 @dataclass
@@ -28,19 +86,52 @@ class ModelResponse:
     thinking: str
     action: str
     raw_content: str
+    # Token usage reported by the server, or estimated locally when the
+    # stream ended before the usage chunk (usage_estimated): prompt tokens
+    # from the message text and images, completion tokens as the number of
+    # content chunks streamed
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    usage_estimated: bool = False
+    # The stream was closed after the action, before the server ended it
+    # (early dispatch)
+    cut_off: bool = False
+    # Seconds from the request to the first content token, including any
+    # failover or hedging, and from there to the end of the answer
+    time_to_first_token: float = 0.0
+    generation_time: float = 0.0
+    # Mean seconds between streamed tokens after the first, and seconds for
+    # the whole request
+    inter_token_latency: float = 0.0
+    total_time: float = 0.0
+    # Attempt whose usage is still being read (see ModelClient.complete_usage())
+    _tail: Any = field(default=None, init=False, repr=False, compare=False)
 
 
 class ModelClient:
     """
     Client for interacting with OpenAI-compatible vision-language models.
 
+    Requests go through the process-wide EndpointPool for the configured
+    endpoints. A request that fails before anything was streamed is retried
+    on another endpoint. With config.hedge_percentile set, slow requests are
+    hedged to a second endpoint. With config.early_dispatch, request() returns
+    as soon as the action call has been streamed and the rest of the
+    generation is cancelled, or read in the background for the usage chunk
+    (see complete_usage()).
+
     Args:
         config: Model configuration.
+        token_sink: Destination of the streamed thinking text. Defaults to
+            printing it; use NullSink for headless runs.
     """
 
-    def __init__(self, config: ModelConfig | None = None):
+    def __init__(
+        self, config: ModelConfig | None = None, token_sink: TokenSink | None = None
+    ):
         self.config = config or ModelConfig()
-        self.client = OpenAI(base_url=self.config.base_url, api_key=self.config.api_key)
+        self.token_sink = token_sink or ConsoleSink()
+        self.pool = get_endpoint_pool(self.config)
 
     def request(self, messages: list[dict[str, Any]]) -> ModelResponse:
         """
@@ -55,9 +146,221 @@ class ModelClient:
         Raises:
             ValueError: If the response cannot be parsed.
         """
-        stream = self.client.chat.completions.create(
+        start = time.perf_counter()
+        printer = _LeaderPrinter(self.token_sink)
+        deadline = self._hedge_deadline()
+        if deadline is None:
+            attempt = self._request_with_failover(messages, printer)
+        else:
+            attempt = self._request_hedged(messages, printer, deadline)
+        printer.finish(attempt)
+
+        return self._build_response(attempt, messages, start)
+
+    def complete_usage(
+        self, response: ModelResponse, timeout: float = 5.0
+    ) -> ModelResponse:
+        """
+        Fill in the usage that was still being read when request() returned.
+
+        With early dispatch and config.include_usage, the rest of the stream
+        is read in the background after the action, and the response holds
+        local estimates until then. Call this once the action is dispatched.
+
+        Args:
+            response: Response returned by request().
+            timeout: Seconds to wait for the usage chunk. The estimates are
+                kept if it does not arrive in time.
+
+        Returns:
+            The same response, updated.
+        """
+        attempt, response._tail = response._tail, None
+        if attempt is not None and attempt.tail_read.wait(timeout):
+            _apply_usage(response, attempt)
+        return response
+
+    def _request_with_failover(
+        self,
+        messages: list[dict[str, Any]],
+        printer: "_LeaderPrinter",
+        failed: set[EndpointState] | None = None,
+    ) -> "_Attempt":
+        """Stream from one endpoint, moving on to another if it fails early."""
+        failed = set(failed or ())
+        while True:
+            attempt = _Attempt(self.pool.acquire(exclude=failed), threading.Event())
+            try:
+                return self._stream(attempt, messages, printer)
+            except Exception:
+                failed.add(attempt.endpoint)
+                if not self._should_retry(attempt.first_chunk, failed):
+                    raise
+
+    def _request_hedged(
+        self,
+        messages: list[dict[str, Any]],
+        printer: "_LeaderPrinter",
+        deadline: float,
+    ) -> "_Attempt":
+        """
+        Stream from one endpoint and hedge to a second one if it is slow.
+
+        If the first chunk has not arrived within deadline seconds, a
+        duplicate request goes to another endpoint. The first attempt to
+        finish wins, the other stream is closed, and only the winner's
+        thinking is written.
+        """
+        results: queue.Queue = queue.Queue()
+        attempts: list[_Attempt] = []
+
+        def launch(endpoint: EndpointState, hedge: bool) -> _Attempt:
+            attempt = _Attempt(endpoint, threading.Event(), hedge)
+            attempts.append(attempt)
+
+            def run() -> None:
+                try:
+                    results.put((attempt, self._stream(attempt, messages, printer)))
+                except BaseException as e:
+                    results.put((attempt, e))
+
+            threading.Thread(target=run, name="model-request", daemon=True).start()
+            return attempt
+
+        primary = launch(self.pool.acquire(), hedge=False)
+        if not primary.responded.wait(deadline) and printer.hold():
+            launch(self.pool.acquire(exclude={primary.endpoint}), hedge=True)
+            self.pool.record_hedge()
+
+        error = None
+        for _ in range(len(attempts)):
+            attempt, outcome = results.get()
+            if isinstance(outcome, _Attempt):
+                for other in attempts:
+                    if other is not attempt:
+                        other.cancel()
+                if attempt.hedge:
+                    self.pool.record_hedge(won=True)
+                return outcome
+            error = error or outcome
+
+        failed = {attempt.endpoint for attempt in attempts}
+        if isinstance(error, Exception) and self._should_retry(
+            _first_chunk(attempts), failed
+        ):
+            return self._request_with_failover(messages, printer, failed)
+        raise error
+
+    def _stream(
+        self,
+        attempt: "_Attempt",
+        messages: list[dict[str, Any]],
+        printer: "_LeaderPrinter",
+    ) -> "_Attempt":
+        """
+        Run one streamed request and report it to the pool.
+
+        With config.early_dispatch, returns once the action call is complete.
+        The rest of the generation is then cancelled by closing the stream,
+        or read in the background: up to the usage chunk if
+        config.include_usage, to its end if config.drain_after_action.
+        """
+        endpoint = attempt.endpoint
+        start = time.perf_counter()
+        scanner = _ActionScanner() if self.config.early_dispatch else None
+        raw_content = ""
+        stream = None
+
+        try:
+            kwargs = self._request_kwargs(messages, endpoint)
+            try:
+                stream = endpoint.client.chat.completions.create(**kwargs)
+            except BadRequestError:
+                if "stream_options" not in kwargs:
+                    raise
+                stream = endpoint.client.chat.completions.create(
+                    **self._without_usage(kwargs, endpoint)
+                )
+            attempt.stream = stream
+            # cancel() may have run while create() was waiting for headers
+            if attempt.cancelled:
+                raise _Cancelled()
+            for chunk in stream:
+                if attempt.cancelled:
+                    raise _Cancelled()
+                if attempt.first_chunk is None:
+                    attempt.first_chunk = time.perf_counter() - start
+                    attempt.responded.set()
+                if getattr(chunk, "usage", None) is not None:
+                    attempt.usage = chunk.usage
+                content = _chunk_content(chunk)
+                if not content:
+                    continue
+                if attempt.first_token is None:
+                    attempt.first_token = time.perf_counter()
+                attempt.tokens += 1
+                raw_content += content
+                printer.feed(attempt, content)
+                if scanner is not None and scanner.feed(content):
+                    raw_content = raw_content[: scanner.end]
+                    if self._drains_tail(attempt, kwargs):
+                        threading.Thread(
+                            target=self._drain,
+                            args=(attempt, stream, messages),
+                            name="model-drain",
+                            daemon=True,
+                        ).start()
+                        stream = None
+                        return attempt.done(raw_content)
+                    attempt.cut_off = chunk.choices[0].finish_reason is None
+                    break
+        except Exception:
+            success = None if attempt.cancelled else False
+            self.pool.release(endpoint, success=success, latency=attempt.first_chunk)
+            raise
+        except BaseException:
+            self.pool.release(endpoint, success=None, latency=attempt.first_chunk)
+            raise
+        finally:
+            attempt.responded.set()
+            if stream is not None:
+                stream.close()
+
+        self.pool.release(endpoint, success=True, latency=attempt.first_chunk)
+        return attempt.done(raw_content)
+
+    def _drain(
+        self, attempt: "_Attempt", stream, messages: list[dict[str, Any]]
+    ) -> None:
+        """Read the rest of a stream whose action was already returned."""
+        limit = self._tail_limit()
+        success = True
+        try:
+            with stream:
+                for chunk in stream:
+                    if not attempt.read_tail(chunk, limit):
+                        break
+        except Exception:
+            success = False
+        finally:
+            self.pool.release(
+                attempt.endpoint, success=success, latency=attempt.first_chunk
+            )
+            self._tail_read(attempt, messages)
+
+    def _hedge_deadline(self) -> float | None:
+        """First-chunk deadline for hedging, or None if hedging is off."""
+        if self.config.hedge_percentile is None or len(self.pool.endpoints) < 2:
+            return None
+        return self.pool.first_chunk_percentile(self.config.hedge_percentile)
+
+    def _request_kwargs(
+        self, messages: list[dict[str, Any]], endpoint: EndpointState
+    ) -> dict[str, Any]:
+        """Arguments for a streaming chat completion request."""
+        kwargs = dict(
             messages=messages,
-            model=self.config.model_name,
+            model=endpoint.endpoint.model_name or self.config.model_name,
             max_tokens=self.config.max_tokens,
             temperature=self.config.temperature,
             top_p=self.config.top_p,
@@ -65,60 +368,85 @@ class ModelClient:
             extra_body=self.config.extra_body,
             stream=True,
         )
+        if self.config.stop:
+            kwargs["stop"] = self.config.stop
+        if self.config.include_usage and not endpoint.rejects_stream_options:
+            kwargs["stream_options"] = {"include_usage": True}
+        return kwargs
 
-        raw_content = ""
-        buffer = ""  # Buffer to hold content that might be part of a marker
-        action_markers = ["finish(message=", "do(action="]
-        in_action_phase = False  # Track if we've entered the action phase
+    def _without_usage(
+        self, kwargs: dict[str, Any], endpoint: EndpointState
+    ) -> dict[str, Any]:
+        """
+        Request arguments to retry with after a 400 answer to stream_options.
 
-        for chunk in stream:
-            if len(chunk.choices) == 0:
-                continue
-            if chunk.choices[0].delta.content is not None:
-                content = chunk.choices[0].delta.content
-                raw_content += content
+        The endpoint is remembered so later requests leave it out. A server
+        that rejects the request for another reason fails the retry too.
+        """
+        endpoint.rejects_stream_options = True
+        return {k: v for k, v in kwargs.items() if k != "stream_options"}
 
-                if in_action_phase:
-                    # Already in action phase, just accumulate content without printing
-                    continue
+    def _drains_tail(self, attempt: "_Attempt", kwargs: dict[str, Any]) -> bool:
+        """
+        Whether to read the rest of the stream after the action in the
+        background, rather than closing it.
 
-                buffer += content
-
-                # Check if any marker is fully present in buffer
-                marker_found = False
-                for marker in action_markers:
-                    if marker in buffer:
-                        # Marker found, print everything before it
-                        thinking_part = buffer.split(marker, 1)[0]
-                        print(thinking_part, end="", flush=True)
-                        print()  # Print newline after thinking is complete
-                        in_action_phase = True
-                        marker_found = True
-                        break
+        Also marks the attempt's usage as pending if the usage chunk will be
+        read, which sets attempt.tail_read.
+        """
+        attempt.finished = time.perf_counter()
+        if "stream_options" in kwargs:
+            attempt.tail_read = type(attempt.responded)()
+            return True
+        return self.config.drain_after_action
 
-                if marker_found:
-                    continue  # Continue to collect remaining content
-
-                # Check if buffer ends with a prefix of any marker
-                # If so, don't print yet (wait for more content)
-                is_potential_marker = False
-                for marker in action_markers:
-                    for i in range(1, len(marker)):
-                        if buffer.endswith(marker[:i]):
-                            is_potential_marker = True
-                            break
-                    if is_potential_marker:
-                        break
+    def _tail_limit(self) -> int | None:
+        """Chunks read after the action before the stream is cut off."""
+        return None if self.config.drain_after_action else self.config.usage_tail_chunks
+
+    def _tail_read(self, attempt: "_Attempt", messages: list[dict[str, Any]]) -> None:
+        """Count the usage of an attempt whose tail was read in the background."""
+        if attempt.tail_read is None:
+            return
+        _record_usage(attempt, *self._token_counts(attempt, messages))
+        attempt.tail_read.set()
 
-                if not is_potential_marker:
-                    # Safe to print the buffer
-                    print(buffer, end="", flush=True)
-                    buffer = ""
+    def _token_counts(
+        self, attempt: "_Attempt", messages: list[dict[str, Any]]
+    ) -> tuple[int, int]:
+        """Prompt and completion tokens, server-reported or estimated."""
+        if attempt.usage is not None:
+            return attempt.usage.prompt_tokens, attempt.usage.completion_tokens
+        return sum(estimate_message_tokens(m) for m in messages), attempt.tokens
 
-        # Parse thinking and action from response
-        thinking, action = self._parse_response(raw_content)
+    def _build_response(
+        self, attempt: "_Attempt", messages: list[dict[str, Any]], start: float
+    ) -> ModelResponse:
+        """Parse the winning attempt into a ModelResponse."""
+        thinking, action = self._parse_response(attempt.raw_content)
+        first_token = attempt.first_token or attempt.finished
+        generation_time = attempt.finished - first_token
 
-        return ModelResponse(thinking=thinking, action=action, raw_content=raw_content)
+        prompt_tokens, completion_tokens = self._token_counts(attempt, messages)
+        if attempt.tail_read is None:
+            _record_usage(attempt, prompt_tokens, completion_tokens)
+
+        response = ModelResponse(
+            thinking=thinking,
+            action=action,
+            raw_content=attempt.raw_content,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            usage_estimated=attempt.usage is None,
+            cut_off=attempt.cut_off,
+            time_to_first_token=first_token - start,
+            generation_time=generation_time,
+            inter_token_latency=generation_time / max(1, attempt.tokens - 1),
+            total_time=attempt.finished - start,
+        )
+        if attempt.tail_read is not None:
+            response._tail = attempt
+        return response
 
     def _parse_response(self, content: str) -> tuple[str, str]:
         """
@@ -162,6 +490,463 @@ class ModelClient:
         # Rule 4: No markers found, return content as action
         return "", content
 
+    def _should_retry(
+        self, first_chunk: float | None, failed: set[EndpointState]
+    ) -> bool:
+        """Retry elsewhere only if nothing was streamed and endpoints remain."""
+        return first_chunk is None and len(failed) < len(self.pool.endpoints)
+
+
+class AsyncModelClient(ModelClient):
+    """
+    Async client for OpenAI-compatible vision-language models.
+
+    Streams with AsyncOpenAI, so many agents can wait on the model from one
+    event loop. Shares the endpoint pool with ModelClient.
+
+    Args:
+        config: Model configuration.
+    """
+
+    async def request(self, messages: list[dict[str, Any]]) -> ModelResponse:
+        """Async version of ModelClient.request()."""
+        start = time.perf_counter()
+        printer = _LeaderPrinter(self.token_sink)
+        deadline = self._hedge_deadline()
+        if deadline is None:
+            attempt = await self._request_with_failover_async(messages, printer)
+        else:
+            attempt = await self._request_hedged_async(messages, printer, deadline)
+        printer.finish(attempt)
+
+        return self._build_response(attempt, messages, start)
+
+    async def _request_with_failover_async(
+        self,
+        messages: list[dict[str, Any]],
+        printer: "_LeaderPrinter",
+        failed: set[EndpointState] | None = None,
+    ) -> "_Attempt":
+        failed = set(failed or ())
+        while True:
+            attempt = _Attempt(self.pool.acquire(exclude=failed), asyncio.Event())
+            try:
+                return await self._stream_async(attempt, messages, printer)
+            except Exception:
+                failed.add(attempt.endpoint)
+                if not self._should_retry(attempt.first_chunk, failed):
+                    raise
+
+    async def _request_hedged_async(
+        self,
+        messages: list[dict[str, Any]],
+        printer: "_LeaderPrinter",
+        deadline: float,
+    ) -> "_Attempt":
+        attempts: dict[asyncio.Task, _Attempt] = {}
+
+        def launch(endpoint: EndpointState, hedge: bool) -> _Attempt:
+            attempt = _Attempt(endpoint, asyncio.Event(), hedge)
+            task = asyncio.create_task(self._stream_async(attempt, messages, printer))
+            attempts[task] = attempt
+            return attempt
+
+        primary = launch(self.pool.acquire(), hedge=False)
+        pending = set(attempts)
+        try:
+            try:
+                await asyncio.wait_for(primary.responded.wait(), deadline)
+            except asyncio.TimeoutError:
+                if printer.hold():
+                    launch(self.pool.acquire(exclude={primary.endpoint}), hedge=True)
+                    self.pool.record_hedge()
+                    pending = set(attempts)
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if attempts[task].hedge:
+                            self.pool.record_hedge(won=True)
+                        return task.result()
+                    error = error or task.exception()
+        finally:
+            # Cancelling the loser closes its stream
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # the other attempt may have failed too
+
+        failed = {attempt.endpoint for attempt in attempts.values()}
+        if isinstance(error, Exception) and self._should_retry(
+            _first_chunk(attempts.values()), failed
+        ):
+            return await self._request_with_failover_async(messages, printer, failed)
+        raise error
+
+    async def _stream_async(
+        self,
+        attempt: "_Attempt",
+        messages: list[dict[str, Any]],
+        printer: "_LeaderPrinter",
+    ) -> "_Attempt":
+        endpoint = attempt.endpoint
+        start = time.perf_counter()
+        scanner = _ActionScanner() if self.config.early_dispatch else None
+        raw_content = ""
+        stream = None
+
+        try:
+            kwargs = self._request_kwargs(messages, endpoint)
+            create = endpoint.async_client.chat.completions.create
+            try:
+                stream = await create(**kwargs)
+            except BadRequestError:
+                if "stream_options" not in kwargs:
+                    raise
+                stream = await create(**self._without_usage(kwargs, endpoint))
+            async for chunk in stream:
+                if attempt.first_chunk is None:
+                    attempt.first_chunk = time.perf_counter() - start
+                    attempt.responded.set()
+                if getattr(chunk, "usage", None) is not None:
+                    attempt.usage = chunk.usage
+                content = _chunk_content(chunk)
+                if not content:
+                    continue
+                if attempt.first_token is None:
+                    attempt.first_token = time.perf_counter()
+                attempt.tokens += 1
+                raw_content += content
+                printer.feed(attempt, content)
+                if scanner is not None and scanner.feed(content):
+                    raw_content = raw_content[: scanner.end]
+                    if self._drains_tail(attempt, kwargs):
+                        drain = asyncio.create_task(
+                            self._drain_async(attempt, stream, messages)
+                        )
+                        _drains.add(drain)
+                        drain.add_done_callback(_drains.discard)
+                        stream = None
+                        return attempt.done(raw_content)
+                    attempt.cut_off = chunk.choices[0].finish_reason is None
+                    break
+        except Exception:
+            self.pool.release(endpoint, success=False, latency=attempt.first_chunk)
+            raise
+        except BaseException:
+            self.pool.release(endpoint, success=None, latency=attempt.first_chunk)
+            raise
+        finally:
+            attempt.responded.set()
+            if stream is not None:
+                await stream.close()
+
+        self.pool.release(endpoint, success=True, latency=attempt.first_chunk)
+        return attempt.done(raw_content)
+
+    async def _drain_async(
+        self, attempt: "_Attempt", stream, messages: list[dict[str, Any]]
+    ) -> None:
+        limit = self._tail_limit()
+        success = True
+        try:
+            async with stream:
+                async for chunk in stream:
+                    if not attempt.read_tail(chunk, limit):
+                        break
+        except Exception:
+            success = False
+        except BaseException:
+            success = None
+            raise
+        finally:
+            self.pool.release(
+                attempt.endpoint, success=success, latency=attempt.first_chunk
+            )
+            self._tail_read(attempt, messages)
+
+    async def complete_usage(
+        self, response: ModelResponse, timeout: float = 5.0
+    ) -> ModelResponse:
+        """Async version of ModelClient.complete_usage()."""
+        attempt, response._tail = response._tail, None
+        if attempt is not None:
+            try:
+                await asyncio.wait_for(attempt.tail_read.wait(), timeout)
+            except asyncio.TimeoutError:
+                return response
+            _apply_usage(response, attempt)
+        return response
+
+
+# Streams being drained after their action was returned early
+_drains: set[asyncio.Task] = set()
+
+
+def _record_usage(attempt: "_Attempt", prompt_tokens: int, completion_tokens: int):
+    """Count the tokens of a finished request in the metrics."""
+    metrics.MODEL_TOKENS.inc(prompt_tokens, kind="prompt")
+    metrics.MODEL_TOKENS.inc(completion_tokens, kind="completion")
+    if attempt.cut_off:
+        metrics.MODEL_STREAMS_CUT_OFF.inc()
+
+
+def _apply_usage(response: ModelResponse, attempt: "_Attempt") -> None:
+    """Update a response with the usage read after it was returned."""
+    if attempt.usage is not None:
+        response.prompt_tokens = attempt.usage.prompt_tokens
+        response.completion_tokens = attempt.usage.completion_tokens
+        response.usage_estimated = False
+    response.cut_off = attempt.cut_off
+
+
+def _chunk_content(chunk) -> str | None:
+    """Text delta of a streamed chat completion chunk."""
+    if len(chunk.choices) == 0:
+        return None
+    return chunk.choices[0].delta.content
+
+
+class _ActionScanner:
+    """
+    Finds where the action call ends in a streamed response.
+
+    After the first action marker, parentheses are counted outside of string
+    literals; the call is complete once they balance and it parses as a
+    Python call. If it does not parse, scanning stops and the whole response
+    is used as before.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.end: int | None = None  # Index just past the closing parenthesis
+        self._start: int | None = None
+        self._pos = 0
+        self._depth = 0
+        self._quote: str | None = None
+        self._escaped = False
+        self._done = False
+        self._matcher = MarkerMatcher(_ThinkingPrinter.ACTION_MARKERS)
+
+    def feed(self, content: str) -> bool:
+        """Add the next chunk; return True once the action call is complete."""
+        if self._done:
+            return self.end is not None
+        self.text += content
+
+        if self._start is None:
+            end = self._matcher.feed(content)
+            if end is None:
+                return False
+            offset = len(self.text) - len(content)
+            self._start = offset + end - self._matcher.matched_length()
+            self._pos = self._start
+
+        for i in range(self._pos, len(self.text)):
+            char = self.text[i]
+            if self._quote is not None:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == self._quote:
+                    self._quote = None
+            elif char in "\"'":
+                self._quote = char
+            elif char == "(":
+                self._depth += 1
+            elif char == ")":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._done = True
+                    if _is_call(self.text[self._start : i + 1]):
+                        self.end = i + 1
+                    return self.end is not None
+
+        self._pos = len(self.text)
+        return False
+
+
+def _is_call(text: str) -> bool:
+    try:
+        return isinstance(ast.parse(text, mode="eval").body, ast.Call)
+    except SyntaxError:
+        return False
+
+
+class _Cancelled(Exception):
+    """Raised inside a request stream that lost a hedge."""
+
+
+class _Attempt:
+    """
+    One streamed request to one endpoint.
+
+    responded is a threading.Event or asyncio.Event that is set on the first
+    chunk, or when the attempt ends without one.
+    """
+
+    def __init__(self, endpoint: EndpointState, responded, hedge: bool = False):
+        self.endpoint = endpoint
+        self.responded = responded
+        self.hedge = hedge
+        self.first_chunk: float | None = None
+        # perf_counter() of the first content chunk and of the end of the answer
+        self.first_token: float | None = None
+        self.finished = 0.0
+        self.cancelled = False
+        self.stream = None
+        self.raw_content = ""
+        self.tokens = 0  # Content chunks received, about one token each
+        self.usage = None  # Usage reported in the last chunk, if any
+        self.cut_off = False  # Generation was cancelled after the action
+        self.tail_chunks = 0  # Chunks read after the action
+        # Event of the same kind as responded, set once the usage chunk was
+        # read after the action was returned; None if it is not being read
+        self.tail_read = None
+
+    def done(self, raw_content: str) -> "_Attempt":
+        """Record the response text and return the finished attempt."""
+        self.raw_content = raw_content
+        self.finished = self.finished or time.perf_counter()
+        return self
+
+    def read_tail(self, chunk, limit: int | None) -> bool:
+        """
+        Handle a chunk read after the action.
+
+        Args:
+            chunk: The streamed chunk.
+            limit: Chunks to read before the stream is cut off; None reads
+                to the end.
+
+        Returns:
+            False once the usage chunk has arrived or limit chunks were read,
+            in which case the stream should be closed.
+        """
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = chunk.usage
+            return False
+        self.tail_chunks += 1
+        if limit is not None and self.tail_chunks >= limit:
+            self.cut_off = True
+            return False
+        return True
+
+    def cancel(self) -> None:
+        """Stop a synchronous stream from another thread."""
+        self.cancelled = True
+        if self.stream is not None:
+            try:
+                self.stream.close()
+            except Exception:
+                pass
+
+
+def _first_chunk(attempts) -> float | None:
+    """First-chunk latency of any attempt that streamed something."""
+    for attempt in attempts:
+        if attempt.first_chunk is not None:
+            return attempt.first_chunk
+    return None
+
+
+class _LeaderPrinter:
+    """
+    Writes thinking from the attempt that wins a request.
+
+    Output is written as it streams until the request is hedged. From then on
+    the text of every attempt is held back, and only the winner's is written
+    once it has finished.
+    """
+
+    def __init__(self, sink: TokenSink):
+        self.enabled = sink.enabled
+        self.printer = _ThinkingPrinter(sink)
+        self.written = False
+        # Text held back per attempt once the request is hedged
+        self.held: dict[_Attempt, list[str]] | None = None
+        self.winner: _Attempt | None = None
+        self._lock = threading.Lock()
+
+    def hold(self) -> bool:
+        """
+        Hold output back before a hedge is launched.
+
+        Returns:
+            False if output was already written, in which case the first
+            attempt has responded and should not be hedged.
+        """
+        with self._lock:
+            if self.written:
+                return False
+            self.held = {}
+            return True
+
+    def feed(self, attempt: _Attempt, content: str) -> None:
+        """Handle the next streamed chunk of an attempt."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.held is None:
+                self.written = True
+                self.printer.feed(content)
+            elif self.winner is None:
+                self.held.setdefault(attempt, []).append(content)
+
+    def finish(self, attempt: _Attempt) -> None:
+        """Write the held output of the winning attempt."""
+        with self._lock:
+            if self.held is None:
+                return
+            self.winner = attempt
+            for content in self.held.pop(attempt, []):
+                self.printer.feed(content)
+            self.held.clear()
+
+
+class _ThinkingPrinter:
+    """
+    Writes the thinking part of a streamed response to a sink as it arrives.
+
+    Output stops at the first action marker; text that might be the start of
+    a marker is held back until the next chunk decides it.
+    """
+
+    ACTION_MARKERS = ["finish(message=", "do(action="]
+
+    def __init__(self, sink: TokenSink):
+        self.sink = sink
+        self.matcher = MarkerMatcher(self.ACTION_MARKERS)
+        self.held = ""  # Trailing text that might be the start of a marker
+        self.in_action_phase = False
+
+    def feed(self, content: str) -> None:
+        """Handle the next streamed chunk."""
+        if self.in_action_phase:
+            return
+
+        text = self.held + content
+        end = self.matcher.feed(content)
+        if end is not None:
+            # Marker found, write everything before it
+            marker_start = len(self.held) + end - self.matcher.matched_length()
+            if marker_start > 0:
+                self.sink.write(text[:marker_start])
+            self.sink.end_thinking()
+            self.in_action_phase = True
+            return
+
+        split = len(text) - self.matcher.depth
+        if split > 0:
+            self.sink.write(text[:split])
+        self.held = text[split:]
+
 
 class MessageBuilder:
     """Helper class for building conversation messages."""
@@ -173,7 +958,7 @@ class MessageBuilder:
 
     @staticmethod
     def create_user_message(
-        text: str, image_base64: str | None = None
+        text: str, image_base64: str | None = None, mime_type: str = "image/png"
     ) -> dict[str, Any]:
         """
         Create a user message with optional image.
@@ -181,6 +966,7 @@ class MessageBuilder:
         Args:
             text: Text content.
             image_base64: Optional base64-encoded image.
+            mime_type: MIME type of the encoded image.
 
         Returns:
             Message dictionary.
@@ -191,7 +977,7 @@ class MessageBuilder:
             content.append(
                 {
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/png;base64,{image_base64}"},
+                    "image_url": {"url": f"data:{mime_type};base64,{image_base64}"},
                 }
             )
 
@@ -204,21 +990,92 @@ class MessageBuilder:
         """Create an assistant message."""
         return {"role": "assistant", "content": content}
 
+    @staticmethod
+    def compact_images(
+        context: list[dict[str, Any]], history: ImageHistory | None = None
+    ) -> None:
+        """
+        Shrink the images in a context once the last message has been sent.
+
+        Without a history policy, the image of the last message is removed.
+        With one, it is replaced by a thumbnail, and thumbnails stay on the
+        most recent history.keep messages while their total size fits
+        history.max_bytes. Once one thumbnail does not fit, every older one
+        is removed too. Messages are replaced in the list, not modified.
+
+        Args:
+            context: Conversation context, updated in place.
+            history: Optional policy for keeping recent screenshots.
+        """
+        if history is None or history.keep <= 0:
+            context[-1] = MessageBuilder.remove_images_from_message(context[-1])
+            return
+
+        context[-1] = MessageBuilder.thumbnail_images_in_message(
+            context[-1], history.max_long_edge, history.quality
+        )
+
+        kept = 0
+        used = 0
+        full = False
+        for index in range(len(context) - 1, -1, -1):
+            size = _image_bytes(context[index])
+            if not size:
+                continue
+            if not full and kept < history.keep and used + size <= history.max_bytes:
+                kept += 1
+                used += size
+                continue
+            full = True
+            context[index] = MessageBuilder.remove_images_from_message(context[index])
+
+    @staticmethod
+    def thumbnail_images_in_message(
+        message: dict[str, Any], max_long_edge: int, quality: int = 40
+    ) -> dict[str, Any]:
+        """
+        Replace the images of a message with downsampled JPEG thumbnails.
+
+        Args:
+            message: Message dictionary.
+            max_long_edge: Thumbnail size of the longer side, in pixels.
+            quality: JPEG quality (1-100).
+
+        Returns:
+            Copy of the message with thumbnails.
+        """
+        if not isinstance(message.get("content"), list):
+            return message
+
+        content = []
+        for item in message["content"]:
+            if item.get("type") == "image_url":
+                url = _thumbnail_url(item["image_url"]["url"], max_long_edge, quality)
+                item = {**item, "image_url": {**item["image_url"], "url": url}}
+            content.append(item)
+        return {**message, "content": content}
+
     @staticmethod
     def remove_images_from_message(message: dict[str, Any]) -> dict[str, Any]:
         """
         Remove image content from a message to save context space.
 
+        The message itself is left unmodified, so lists that already hold it
+        (earlier requests, history policies) are unaffected.
+
         Args:
             message: Message dictionary.
 
         Returns:
-            Message with images removed.
+            Copy of the message with images removed.
         """
         if isinstance(message.get("content"), list):
-            message["content"] = [
-                item for item in message["content"] if item.get("type") == "text"
-            ]
+            return {
+                **message,
+                "content": [
+                    item for item in message["content"] if item.get("type") == "text"
+                ],
+            }
         return message
 
     @staticmethod
@@ -235,3 +1092,33 @@ class MessageBuilder:
         """
         info = {"current_app": current_app, **extra_info}
         return json.dumps(info, ensure_ascii=False)
+
+
+def _image_bytes(message: dict[str, Any]) -> int:
+    """Size of the image data URLs in a message."""
+    content = message.get("content")
+    if not isinstance(content, list):
+        return 0
+    return sum(
+        len(item["image_url"]["url"])
+        for item in content
+        if item.get("type") == "image_url"
+    )
+
+
+def _thumbnail_url(url: str, max_long_edge: int, quality: int) -> str:
+    """Downsample a base64 image data URL into a JPEG data URL."""
+    header, _, data = url.partition(",")
+    if not header.startswith("data:") or not data:
+        return url
+
+    img = Image.open(BytesIO(base64.b64decode(data)))
+    img.thumbnail((max_long_edge, max_long_edge), Image.Resampling.LANCZOS)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    buffered = BytesIO()
+    img.save(buffered, format="JPEG", quality=quality)
+    return "data:image/jpeg;base64," + base64.b64encode(buffered.getvalue()).decode(
+        "utf-8"
+    )
@@ -0,0 +1,218 @@
+"""Policies that bound how much of the conversation history is sent per step."""
+
+import json
+import re
+from typing import Any
+
+# Rough token cost of one screenshot for estimates
+DEFAULT_IMAGE_TOKENS = 1000
+
+_CJK = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+_ANSWER = re.compile(r"<answer>(.*?)</answer>", re.DOTALL)
+
+
+class HistoryPolicy:
+    """
+    Decides which part of the agent context is sent to the model.
+
+    The agent keeps the full context (PhoneAgent.context); apply() builds the
+    message list for one request from it and must not modify it.
+
+    The context is laid out as a head (system message and the first user
+    message, which holds the task) followed by turns of (assistant message,
+    next user message). The last user message is the current screen.
+
+    append_only is True for policies that only ever extend the messages sent
+    with the previous request, which keeps the prompt prefix cacheable.
+    """
+
+    append_only = False
+
+    def apply(self, context: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Build the messages for the next request.
+
+        Args:
+            context: Full conversation context.
+
+        Returns:
+            Messages to send to the model.
+        """
+        return list(context)
+
+
+class FullHistory(HistoryPolicy):
+    """Send the whole history on every step."""
+
+    append_only = True
+
+
+class LastTurns(HistoryPolicy):
+    """
+    Keep the task and the most recent turns.
+
+    Args:
+        turns: Number of recent (assistant, user) turns kept. The last turn
+            holds the current screen, so at least one is always kept.
+    """
+
+    def __init__(self, turns: int = 10):
+        self.turns = max(1, turns)
+
+    def apply(self, context: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        head, turns = _split(context)
+        return head + _flatten(turns[-self.turns :])
+
+
+class SummarizedHistory(HistoryPolicy):
+    """
+    Keep the most recent turns and summarise older ones.
+
+    Older turns are reduced to one line each (the action taken), appended to
+    the task message, so the model still knows what it has already done. The
+    summary is built locally without another model call.
+
+    Args:
+        turns: Number of recent turns kept in full (at least one).
+    """
+
+    def __init__(self, turns: int = 5):
+        self.turns = max(1, turns)
+
+    def apply(self, context: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        head, turns = _split(context)
+        if len(turns) <= self.turns:
+            return head + _flatten(turns)
+
+        older = turns[: -self.turns]
+        recent = turns[-self.turns :]
+        lines = [
+            f"{index}. {_summarize_turn(assistant)}"
+            for index, (assistant, _) in enumerate(older, start=1)
+        ]
+        summary = "** Earlier Steps **\n\n" + "\n".join(lines)
+        return head[:-1] + [_append_text(head[-1], summary)] + _flatten(recent)
+
+
+class TokenBudget(HistoryPolicy):
+    """
+    Drop the oldest turns until the estimated prompt size fits a budget.
+
+    The system message, the task message and the current screen are always
+    kept, even if they alone exceed the budget.
+
+    Args:
+        max_tokens: Budget for the whole prompt, in estimated tokens.
+        image_tokens: Estimated cost of one image.
+    """
+
+    def __init__(
+        self, max_tokens: int = 8000, image_tokens: int = DEFAULT_IMAGE_TOKENS
+    ):
+        self.max_tokens = max_tokens
+        self.image_tokens = image_tokens
+
+    def apply(self, context: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        head, turns = _split(context)
+        used = sum(estimate_message_tokens(m, self.image_tokens) for m in head)
+
+        # The last turn holds the current screen
+        kept = 0
+        for turn in reversed(turns):
+            cost = sum(
+                estimate_message_tokens(message, self.image_tokens)
+                for message in turn
+                if message is not None
+            )
+            if kept and used + cost > self.max_tokens:
+                break
+            used += cost
+            kept += 1
+
+        return head + _flatten(turns[len(turns) - kept :] if kept else [])
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of a text without a tokenizer.
+
+    CJK characters count as one token each, other text as one token per four
+    characters.
+
+    Args:
+        text: Text to measure.
+
+    Returns:
+        Estimated number of tokens.
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def estimate_message_tokens(
+    message: dict[str, Any], image_tokens: int = DEFAULT_IMAGE_TOKENS
+) -> int:
+    """
+    Estimate the token count of a chat message.
+
+    Args:
+        message: Message dictionary in OpenAI format.
+        image_tokens: Estimated cost of one image.
+
+    Returns:
+        Estimated number of tokens, including a small per-message overhead.
+    """
+    content = message.get("content")
+    if isinstance(content, str):
+        return 4 + estimate_tokens(content)
+
+    tokens = 4
+    for item in content or []:
+        if item.get("type") == "text":
+            tokens += estimate_tokens(item["text"])
+        elif item.get("type") == "image_url":
+            tokens += image_tokens
+    return tokens
+
+
+def _split(
+    context: list[dict[str, Any]],
+) -> tuple[list[dict[str, Any]], list[tuple[dict[str, Any], dict[str, Any]]]]:
+    """Split the context into its head and (assistant, user) turns."""
+    head = context[:2]
+    rest = context[2:]
+    turns = [(rest[i], rest[i + 1]) for i in range(0, len(rest) - 1, 2)]
+    if len(rest) % 2:
+        # Ends with an assistant message (between steps); keep it as a turn
+        # without a following screen
+        return head, turns + [(rest[-1], None)]
+    return head, turns
+
+
+def _flatten(turns: list[tuple[dict[str, Any], dict[str, Any] | None]]) -> list:
+    return [message for turn in turns for message in turn if message is not None]
+
+
+def _summarize_turn(assistant: dict[str, Any]) -> str:
+    content = assistant.get("content", "")
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False)
+    match = _ANSWER.search(content)
+    return (match.group(1) if match else content).strip()
+
+
+def _append_text(message: dict[str, Any], text: str) -> dict[str, Any]:
+    """Copy a message with text appended to its last text part."""
+    content = message.get("content")
+    if isinstance(content, str):
+        return {**message, "content": f"{content}\n\n{text}"}
+
+    content = list(content)
+    for index in range(len(content) - 1, -1, -1):
+        if content[index].get("type") == "text":
+            item = content[index]
+            content[index] = {**item, "text": f"{item['text']}\n\n{text}"}
+            break
+    else:
+        content.append({"type": "text", "text": text})
+    return {**message, "content": content}
@@ -0,0 +1,364 @@
+"""Load balancing across multiple OpenAI-compatible model servers."""
+
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+from openai import AsyncOpenAI, OpenAI
+
+from phone_agent import metrics
+
+POLICIES = ("least_outstanding", "latency_weighted")
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """
+    One OpenAI-compatible server.
+
+    Args:
+        base_url: API base URL, e.g. "http://10.0.0.2:8000/v1".
+        api_key: API key for this server.
+        model_name: Model name served by this endpoint. None uses
+            ModelConfig.model_name.
+    """
+
+    base_url: str
+    api_key: str = "EMPTY"
+    model_name: str | None = None
+
+
+class EndpointState:
+    """
+    Load and health of one endpoint, with its API clients.
+
+    latency is an exponentially weighted moving average of the time to the
+    first streamed chunk, which reflects queueing on the server independently
+    of how long the generated answer is.
+
+    Args:
+        endpoint: The server.
+        max_retries: Retries the OpenAI client makes on its own before
+            reporting a failure.
+    """
+
+    def __init__(self, endpoint: Endpoint, max_retries: int = 2):
+        self.endpoint = endpoint
+        self.max_retries = max_retries
+        self.outstanding = 0
+        self.latency: float | None = None
+        self.samples = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        # The server answered 400 to stream_options; usage is not requested
+        self.rejects_stream_options = False
+        self._client: OpenAI | None = None
+        self._async_clients: dict[asyncio.AbstractEventLoop, AsyncOpenAI] = {}
+        self._clients_lock = threading.Lock()
+
+    @property
+    def client(self) -> OpenAI:
+        """Synchronous client for this endpoint, created on first use."""
+        if self._client is None:
+            self._client = OpenAI(
+                base_url=self.endpoint.base_url,
+                api_key=self.endpoint.api_key,
+                max_retries=self.max_retries,
+            )
+        return self._client
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """
+        Async client for this endpoint on the running event loop.
+
+        The connection pool of an AsyncOpenAI client is bound to the loop that
+        first used it, so each loop gets its own client, created on first
+        use. Clients of closed loops are dropped.
+        """
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                self._async_clients = {
+                    other: other_client
+                    for other, other_client in self._async_clients.items()
+                    if not other.is_closed()
+                }
+                client = AsyncOpenAI(
+                    base_url=self.endpoint.base_url,
+                    api_key=self.endpoint.api_key,
+                    max_retries=self.max_retries,
+                )
+                self._async_clients[loop] = client
+            return client
+
+    def healthy(self, now: float) -> bool:
+        """Whether the endpoint is not currently ejected."""
+        return now >= self.ejected_until
+
+    def as_dict(self) -> dict[str, Any]:
+        """Summary suitable for logging or JSON export."""
+        return {
+            "base_url": self.endpoint.base_url,
+            "outstanding": self.outstanding,
+            "latency": self.latency,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "healthy": self.healthy(time.monotonic()),
+        }
+
+
+class EndpointPool:
+    """
+    Picks an endpoint for each request and tracks endpoint health.
+
+    Policies:
+        least_outstanding: the endpoint with the fewest in-flight requests.
+        latency_weighted: the endpoint with the lowest expected wait, i.e.
+            latency * (outstanding + 1). Endpoints without latency samples
+            (new, or back from ejection) count with the median latency of
+            the others.
+
+    An endpoint is ejected for ejection_time seconds after max_failures
+    consecutive failed requests, or when its latency is more than slow_factor
+    times the median of the other healthy endpoints. If every endpoint is
+    ejected, the one that comes back soonest is used.
+
+    Args:
+        endpoints: Servers to balance across.
+        policy: One of POLICIES.
+        max_failures: Consecutive failures before ejection.
+        ejection_time: Seconds an ejected endpoint is skipped.
+        slow_factor: Latency ratio to the other endpoints' median that counts
+            as slow. None disables latency-based ejection.
+        ewma_alpha: Weight of the newest sample in the latency average.
+        min_samples: Latency samples needed before an endpoint can be
+            judged slow.
+        window: Recent first-chunk latencies kept for hedging deadlines.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[Endpoint],
+        policy: str = "least_outstanding",
+        max_failures: int = 3,
+        ejection_time: float = 30.0,
+        slow_factor: float | None = 3.0,
+        ewma_alpha: float = 0.3,
+        min_samples: int = 5,
+        window: int = 200,
+    ):
+        if not endpoints:
+            raise ValueError("At least one endpoint is required")
+        if policy not in POLICIES:
+            raise ValueError(
+                f"Unknown balancing policy: {policy} (expected one of {POLICIES})"
+            )
+
+        # With several endpoints, fail over to another one instead of letting
+        # the client retry the same server with backoff
+        client_retries = 0 if len(endpoints) > 1 else 2
+        self.endpoints = [
+            EndpointState(endpoint, client_retries) for endpoint in endpoints
+        ]
+        self.policy = policy
+        self.max_failures = max_failures
+        self.ejection_time = ejection_time
+        self.slow_factor = slow_factor
+        self.ewma_alpha = ewma_alpha
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._next = 0
+        self._first_chunks: deque[float] = deque(maxlen=window)
+        self.hedges_issued = 0
+        self.hedges_won = 0
+
+    def acquire(self, exclude: set[EndpointState] | None = None) -> EndpointState:
+        """
+        Choose an endpoint and count a request as outstanding on it.
+
+        Every acquire() must be paired with a release().
+
+        Args:
+            exclude: Endpoints to skip, e.g. ones that already failed this
+                request. Ignored if it would leave no endpoint.
+
+        Returns:
+            The chosen endpoint.
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if not exclude or e not in exclude]
+            if not candidates:
+                candidates = self.endpoints
+
+            healthy = [e for e in candidates if e.healthy(now)]
+            if healthy:
+                # Rotate the starting point so ties are spread evenly
+                self._next = (self._next + 1) % len(healthy)
+                ordered = healthy[self._next :] + healthy[: self._next]
+                unknown = self._median_latency()
+                state = min(ordered, key=lambda e: self._cost(e, unknown))
+            else:
+                state = min(candidates, key=lambda e: e.ejected_until)
+
+            state.outstanding += 1
+            state.requests += 1
+            # Set rather than inc/dec, so the gauge is right even when metrics
+            # are turned on while requests are in flight
+            metrics.MODEL_OUTSTANDING.set(
+                state.outstanding, endpoint=state.endpoint.base_url
+            )
+            return state
+
+    def release(
+        self, state: EndpointState, success: bool | None, latency: float | None = None
+    ) -> None:
+        """
+        Finish a request started with acquire().
+
+        Args:
+            state: The endpoint returned by acquire().
+            success: Whether the request succeeded, or None if the caller
+                abandoned it (cancelled), which says nothing about health.
+            latency: Seconds to the first streamed chunk, if one arrived.
+        """
+        base_url = state.endpoint.base_url
+        outcome = {True: "success", False: "failure", None: "cancelled"}[success]
+        metrics.MODEL_REQUESTS.inc(endpoint=base_url, outcome=outcome)
+        if latency is not None:
+            metrics.MODEL_FIRST_CHUNK_SECONDS.observe(latency, endpoint=base_url)
+
+        with self._lock:
+            state.outstanding -= 1
+            metrics.MODEL_OUTSTANDING.set(state.outstanding, endpoint=base_url)
+            now = time.monotonic()
+
+            if latency is not None:
+                self._first_chunks.append(latency)
+                if state.latency is None:
+                    state.latency = latency
+                else:
+                    state.latency += self.ewma_alpha * (latency - state.latency)
+                state.samples += 1
+
+            if success is None:
+                return
+            if success:
+                state.consecutive_failures = 0
+                if self._is_slow(state, now):
+                    self._eject(state, now)
+            else:
+                state.failures += 1
+                state.consecutive_failures += 1
+                if state.consecutive_failures >= self.max_failures:
+                    self._eject(state, now)
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Per-endpoint load and health."""
+        with self._lock:
+            return [state.as_dict() for state in self.endpoints]
+
+    def first_chunk_percentile(
+        self, percentile: float, min_samples: int = 20
+    ) -> float | None:
+        """
+        Recent first-chunk latency at a percentile, across all endpoints.
+
+        Args:
+            percentile: Percentile in (0, 100], e.g. 95.
+            min_samples: Samples needed before a value is returned.
+
+        Returns:
+            Seconds, or None if there are not enough samples yet.
+        """
+        with self._lock:
+            samples = sorted(self._first_chunks)
+        if len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
+
+    def record_hedge(self, won: bool = False) -> None:
+        """Count a hedged request being issued, or the hedge winning."""
+        metrics.MODEL_HEDGES.inc(event="won" if won else "issued")
+        with self._lock:
+            if won:
+                self.hedges_won += 1
+            else:
+                self.hedges_issued += 1
+
+    def hedge_stats(self) -> dict[str, int]:
+        """Hedged requests issued and won by the hedge."""
+        with self._lock:
+            return {"issued": self.hedges_issued, "won": self.hedges_won}
+
+    def _cost(self, state: EndpointState, unknown_latency: float) -> float:
+        if self.policy == "latency_weighted":
+            latency = unknown_latency if state.latency is None else state.latency
+            return latency * (state.outstanding + 1)
+        return state.outstanding
+
+    def _median_latency(self) -> float:
+        """Median latency of the sampled endpoints, 1.0 if there are none."""
+        known = [e.latency for e in self.endpoints if e.latency is not None]
+        return statistics.median(known) if known else 1.0
+
+    def _is_slow(self, state: EndpointState, now: float) -> bool:
+        if self.slow_factor is None or state.samples < self.min_samples:
+            return False
+        others = [
+            e.latency
+            for e in self.endpoints
+            if e is not state and e.healthy(now) and e.latency is not None
+        ]
+        if not others:
+            return False
+        return state.latency > self.slow_factor * statistics.median(others)
+
+    def _eject(self, state: EndpointState, now: float) -> None:
+        state.ejected_until = now + self.ejection_time
+        state.ejections += 1
+        state.consecutive_failures = 0
+        # Start fresh when it comes back, rather than being judged on old samples
+        state.latency = None
+        state.samples = 0
+
+
+_pools: dict[tuple, EndpointPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_endpoint_pool(config) -> EndpointPool:
+    """
+    Get the process-wide pool for a model configuration.
+
+    Agents whose configs list the same endpoints and policy share one pool, so
+    load and health are tracked across all of them.
+
+    Args:
+        config: ModelConfig. Uses config.endpoints if set, otherwise
+            config.base_url and config.api_key.
+
+    Returns:
+        The shared EndpointPool.
+    """
+    endpoints = [
+        Endpoint(endpoint, config.api_key) if isinstance(endpoint, str) else endpoint
+        for endpoint in config.endpoints
+    ] or [Endpoint(config.base_url, config.api_key)]
+
+    key = (tuple(endpoints), config.balancing)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = EndpointPool(endpoints, config.balancing)
+        return _pools[key]
@@ -0,0 +1,162 @@
+"""Destinations for the thinking text streamed by the model."""
+
+import queue
+from typing import Callable
+
+
+class TokenSink:
+    """
+    Receives the thinking part of a model response as it streams.
+
+    write() gets the thinking text in pieces, and end_thinking() is called
+    once the action starts. The action itself is not written. With hedged
+    requests, only the stream that answered first is written.
+
+    Sinks may be called from worker threads.
+    """
+
+    # False lets the client skip marker matching entirely
+    enabled = True
+
+    def write(self, text: str) -> None:
+        """Handle the next piece of thinking text."""
+
+    def end_thinking(self) -> None:
+        """Handle the end of the thinking text."""
+
+
+class NullSink(TokenSink):
+    """Discards the thinking text, for headless runs."""
+
+    enabled = False
+
+
+class ConsoleSink(TokenSink):
+    """Prints the thinking text to stdout as it arrives."""
+
+    def write(self, text: str) -> None:
+        print(text, end="", flush=True)
+
+    def end_thinking(self) -> None:
+        print()
+
+
+class CallbackSink(TokenSink):
+    """
+    Passes the thinking text to a function.
+
+    Args:
+        on_text: Called with each piece of thinking text.
+        on_end: Optional, called when the thinking text is complete.
+    """
+
+    def __init__(
+        self,
+        on_text: Callable[[str], None],
+        on_end: Callable[[], None] | None = None,
+    ):
+        self.on_text = on_text
+        self.on_end = on_end
+
+    def write(self, text: str) -> None:
+        self.on_text(text)
+
+    def end_thinking(self) -> None:
+        if self.on_end is not None:
+            self.on_end()
+
+
+class QueueSink(TokenSink):
+    """
+    Puts the thinking text on a queue, followed by None when it is complete.
+
+    Args:
+        target: A thread-safe queue. For asyncio consumers, use a CallbackSink
+            with loop.call_soon_threadsafe instead.
+    """
+
+    def __init__(self, target: queue.Queue | None = None):
+        self.queue = target if target is not None else queue.Queue()
+
+    def write(self, text: str) -> None:
+        self.queue.put(text)
+
+    def end_thinking(self) -> None:
+        self.queue.put(None)
+
+
+class MarkerMatcher:
+    """
+    Finds the first of several markers in streamed text.
+
+    An Aho-Corasick automaton over the markers: every character costs one
+    amortised transition, however many markers there are and however the
+    text is split into chunks. depth tells how many trailing characters
+    could still be the start of a marker.
+
+    Args:
+        markers: Strings to look for.
+    """
+
+    def __init__(self, markers: list[str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail = [0]
+        self._depth = [0]
+        # Length of the marker that ends at each state, 0 if none
+        self._match = [0]
+
+        for marker in markers:
+            state = 0
+            for char in marker:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._depth.append(self._depth[state] + 1)
+                    self._match.append(0)
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._match[state] = len(marker)
+
+        # Breadth-first, so the fail target of each state is already final
+        pending = list(self._goto[0].values())
+        while pending:
+            state = pending.pop(0)
+            for char, child in self._goto[state].items():
+                self._fail[child] = self._next(self._fail[state], char)
+                self._match[child] = (
+                    self._match[child] or self._match[self._fail[child]]
+                )
+                pending.append(child)
+
+        self.state = 0
+
+    @property
+    def depth(self) -> int:
+        """Length of the longest marker prefix the text seen so far ends with."""
+        return self._depth[self.state]
+
+    def feed(self, text: str) -> int | None:
+        """
+        Advance over a chunk of text.
+
+        Args:
+            text: The next chunk.
+
+        Returns:
+            Index in text just past the first complete marker, or None if no
+            marker has completed yet.
+        """
+        for index, char in enumerate(text):
+            self.state = self._next(self.state, char)
+            if self._match[self.state]:
+                return index + 1
+        return None
+
+    def matched_length(self) -> int:
+        """Length of the marker that completed at the current position."""
+        return self._match[self.state]
+
+    def _next(self, state: int, char: str) -> int:
+        while state and char not in self._goto[state]:
+            state = self._fail[state]
+        return self._goto[state].get(char, 0)
@@ -0,0 +1,320 @@
+"""Record successful trajectories and replay them on later runs of the same task."""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from phone_agent.adb.screenshot import Screenshot, diff_blocks
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "phone_agent", "trajectories"
+)
+
+
+@dataclass
+class TrajectoryStep:
+    """One recorded step: the screen the model saw and what it answered."""
+
+    action: str
+    thinking: str
+    current_app: str
+    blocks: str  # Screenshot.blocks as hex
+
+    @property
+    def replayable(self) -> bool:
+        """
+        Whether the step may be answered from the cache.
+
+        finish and Take_over depend on what is on the screen (an answer read
+        from it, a login wall), so the model is always asked for them.
+        """
+        return not self.action.startswith("finish(") and "Take_over" not in self.action
+
+    def matches(self, current_app: str, blocks: bytes, max_diff: float) -> bool:
+        """Whether a live screen is close enough to replay this step on."""
+        return (
+            current_app == self.current_app
+            and diff_blocks(bytes.fromhex(self.blocks), blocks) <= max_diff
+        )
+
+
+@dataclass
+class Trajectory:
+    """A successful run of a task on one screen size."""
+
+    task: str
+    width: int
+    height: int
+    steps: list[TrajectoryStep] = field(default_factory=list)
+    created: float = 0.0
+    replays: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Summary suitable for logging or JSON export."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Trajectory":
+        """Load a trajectory saved with as_dict()."""
+        steps = [TrajectoryStep(**step) for step in data.get("steps", [])]
+        return cls(**{**data, "steps": steps})
+
+
+@dataclass
+class ReplayStats:
+    """Hit-rate counters of a TrajectoryCache."""
+
+    lookups: int = 0
+    hits: int = 0
+    steps_replayed: int = 0
+    model_steps: int = 0
+    divergences: int = 0
+    completed_replays: int = 0
+    stored: int = 0
+    evicted: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of task runs that found a cached trajectory."""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def step_hit_rate(self) -> float:
+        """Fraction of steps answered from the cache instead of the model."""
+        total = self.steps_replayed + self.model_steps
+        return self.steps_replayed / total if total else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        """Summary suitable for logging or JSON export."""
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate,
+            "steps_replayed": self.steps_replayed,
+            "model_steps": self.model_steps,
+            "step_hit_rate": self.step_hit_rate,
+            "divergences": self.divergences,
+            "completed_replays": self.completed_replays,
+            "stored": self.stored,
+            "evicted": self.evicted,
+        }
+
+
+class TrajectoryCache:
+    """
+    On-disk store of successful trajectories, keyed by task and screen size.
+
+    Each trajectory is one JSON file. Files are written atomically, so several
+    processes can share a directory. When more than max_entries are stored,
+    the least recently used ones (by file modification time, refreshed on
+    every replay) are deleted.
+
+    Args:
+        path: Directory for the trajectory files.
+        max_entries: Maximum number of stored trajectories.
+        max_diff: Largest fraction of changed grid cells (see
+            Screenshot.block_diff) at which a live screen still matches a
+            recorded one.
+
+    Example:
+        >>> cache = TrajectoryCache()
+        >>> agent = PhoneAgent(agent_config=AgentConfig(replay_cache=cache))
+        >>> agent.run("打开小红书搜索美食攻略")  # recorded
+        >>> agent.run("打开小红书搜索美食攻略")  # replayed while screens match
+        >>> print(cache.stats.as_dict())
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_DIR,
+        max_entries: int = 1000,
+        max_diff: float = 0.03,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_diff = max_diff
+        self.stats = ReplayStats()
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def lookup(self, task: str, width: int, height: int) -> Trajectory | None:
+        """
+        Find the recorded trajectory for a task.
+
+        Args:
+            task: Task description.
+            width: Device screen width.
+            height: Device screen height.
+
+        Returns:
+            The trajectory, or None if there is none.
+        """
+        file_path = self._file(task, width, height)
+        try:
+            with open(file_path, encoding="utf-8") as f:
+                trajectory = Trajectory.from_dict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            trajectory = None
+
+        self._count("lookups")
+        if trajectory is not None:
+            self._count("hits")
+        return trajectory
+
+    def store(self, trajectory: Trajectory) -> None:
+        """Save a trajectory, replacing any earlier one for the same task."""
+        trajectory.created = trajectory.created or time.time()
+        self._write(trajectory)
+        self._count("stored")
+        self._evict()
+
+    def touch(self, trajectory: Trajectory) -> None:
+        """Count a full replay and mark the trajectory as recently used."""
+        trajectory.replays += 1
+        self._write(trajectory)
+        self._count("completed_replays")
+
+    def clear(self) -> None:
+        """Delete every stored trajectory."""
+        for name in os.listdir(self.path):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.path, name))
+
+    def __len__(self) -> int:
+        return sum(1 for name in os.listdir(self.path) if name.endswith(".json"))
+
+    def _write(self, trajectory: Trajectory) -> None:
+        file_path = self._file(trajectory.task, trajectory.width, trajectory.height)
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(trajectory.as_dict(), f, ensure_ascii=False)
+        os.replace(temp_path, file_path)
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self.stats, counter, getattr(self.stats, counter) + 1)
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith(".json"):
+                file_path = os.path.join(self.path, name)
+                try:
+                    entries.append((os.path.getmtime(file_path), file_path))
+                except OSError:
+                    continue
+
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+
+        for _, file_path in sorted(entries)[:excess]:
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            self._count("evicted")
+
+    def _file(self, task: str, width: int, height: int) -> str:
+        key = f"{' '.join(task.split())}\n{width}x{height}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, f"{digest}.json")
+
+
+class ReplaySession:
+    """
+    Replays and records one task run against a TrajectoryCache.
+
+    While the live screen matches the recorded one, next_step() returns the
+    recorded step and the agent skips the model. Recorded finish and Take_over
+    steps are never replayed; the model answers them. From the first mismatch
+    on, the session stays diverged and the rest of the task uses the model.
+    Every executed step is recorded; a successful run is stored for next time.
+
+    Args:
+        cache: The trajectory store.
+        task: Task description.
+    """
+
+    def __init__(self, cache: TrajectoryCache, task: str):
+        self.cache = cache
+        self.task = task
+        self.trajectory: Trajectory | None = None
+        self.recorded: list[TrajectoryStep] = []
+        self.diverged = False
+        self._looked_up = False
+        self._screen: tuple[int, int] | None = None
+
+    @property
+    def replaying(self) -> bool:
+        """Whether every step so far came from the cache."""
+        return self.trajectory is not None and not self.diverged
+
+    def next_step(
+        self, screenshot: Screenshot, current_app: str
+    ) -> TrajectoryStep | None:
+        """
+        Get the recorded step for the live screen, if the replay still matches.
+
+        Args:
+            screenshot: Current Screenshot.
+            current_app: Current app name.
+
+        Returns:
+            The step to replay, or None to ask the model.
+        """
+        if not self._looked_up:
+            self._looked_up = True
+            self._screen = (screenshot.width, screenshot.height)
+            self.trajectory = self.cache.lookup(self.task, *self._screen)
+
+        step = None
+        if self.replaying:
+            index = len(self.recorded)
+            if index < len(self.trajectory.steps) and self.trajectory.steps[
+                index
+            ].matches(current_app, screenshot.blocks, self.cache.max_diff):
+                step = self.trajectory.steps[index]
+            else:
+                self.diverged = True
+                self.cache._count("divergences")
+        if step is not None and not step.replayable:
+            step = None
+
+        self.cache._count("steps_replayed" if step is not None else "model_steps")
+        return step
+
+    def record(
+        self, screenshot: Screenshot, current_app: str, action: str, thinking: str
+    ) -> None:
+        """Record the step that was just executed."""
+        self.recorded.append(
+            TrajectoryStep(
+                action=action,
+                thinking=thinking,
+                current_app=current_app,
+                blocks=screenshot.blocks.hex(),
+            )
+        )
+
+    def finish(self, success: bool) -> None:
+        """End the run, storing the trajectory if the task succeeded."""
+        if not success or self._screen is None:
+            return
+        if self.replaying and len(self.recorded) == len(self.trajectory.steps):
+            self.cache.touch(self.trajectory)
+            return
+
+        self.cache.store(
+            Trajectory(
+                task=self.task,
+                width=self._screen[0],
+                height=self._screen[1],
+                steps=self.recorded,
+            )
+        )
@@ -0,0 +1,232 @@
+"""Export per-step timings as JSON lines or Chrome trace events."""
+
+import json
+import os
+import threading
+import time
+from typing import Any
+
+# Chrome trace track of each stage. Stages on one track never overlap, so
+# they nest cleanly in the viewer: the app probe runs alongside the capture,
+# and in pipelined mode the settle wait and capture start before the step.
+_TRACKS = {
+    "observe": "step",
+    "inference": "step",
+    "ttft": "step",
+    "generation": "step",
+    "parse": "step",
+    "action": "step",
+    "settle": "screen",
+    "capture": "screen",
+    "encode": "screen",
+    "app_probe": "app probe",
+}
+_TRACK_ORDER = ("step", "screen", "app probe")
+
+
+class StepTracer:
+    """
+    Receives the result of every agent step (see AgentConfig.tracer).
+
+    One tracer may be shared by several agents, e.g. across a fleet.
+    """
+
+    def record(self, result, step: int, device_id: str | None = None) -> None:
+        """
+        Record one step.
+
+        Args:
+            result: The StepResult.
+            step: 1-based step number within the task.
+            device_id: Device the step ran on.
+        """
+
+    def close(self) -> None:
+        """Flush and release any open file."""
+
+
+class JsonlTracer(StepTracer):
+    """
+    Appends one JSON object per step to a file.
+
+    Each line holds the step number, device, outcome, action, and timings in
+    seconds. offsets gives the start of each stage relative to the step
+    start; negative offsets are stages prefetched during the previous step.
+
+    Args:
+        path: Output file, appended to.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, result, step: int, device_id: str | None = None) -> None:
+        line = json.dumps(
+            step_record(result, step, device_id), ensure_ascii=False, default=str
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class ChromeTracer(StepTracer):
+    """
+    Writes steps as Chrome trace events, viewable in chrome://tracing or
+    https://ui.perfetto.dev.
+
+    Each device gets a process with three tracks: the step and its model and
+    action stages, the screen (settle, capture, encode), and the app probe.
+    Events are streamed as a JSON array whose closing bracket is optional in
+    the trace format, so the file is valid even if the run is interrupted.
+
+    Args:
+        path: Output file, overwritten.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write("[")
+        self._epoch = time.perf_counter()
+        self._pids: dict[str | None, int] = {}
+        self._empty = True
+
+    def record(self, result, step: int, device_id: str | None = None) -> None:
+        with self._lock:
+            pid = self._pids.get(device_id)
+            if pid is None:
+                pid = self._pids[device_id] = len(self._pids) + 1
+                self._write_metadata(pid, device_id)
+
+            # The step encloses its stages, so it is written first
+            if "total" in result.starts:
+                event = self._event(
+                    f"step {step}",
+                    pid,
+                    "step",
+                    result.starts["total"],
+                    result.timings["total"],
+                    step,
+                )
+                event["args"].update(
+                    success=result.success,
+                    finished=result.finished,
+                    action=result.action,
+                )
+                self._write(event)
+
+            for stage, seconds in result.timings.items():
+                start = result.starts.get(stage)
+                if stage != "total" and start is not None:
+                    track = _TRACKS.get(stage, "step")
+                    self._write(self._event(stage, pid, track, start, seconds, step))
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.write("\n]\n")
+            self._file.close()
+
+    def _write(self, event: dict[str, Any]) -> None:
+        self._file.write("\n" if self._empty else ",\n")
+        self._file.write(json.dumps(event, ensure_ascii=False, default=str))
+        self._empty = False
+
+    def _event(
+        self, name: str, pid: int, track: str, start: float, seconds: float, step: int
+    ) -> dict[str, Any]:
+        return {
+            "name": name,
+            "ph": "X",
+            "pid": pid,
+            "tid": _TRACK_ORDER.index(track) + 1,
+            "ts": (start - self._epoch) * 1e6,
+            "dur": seconds * 1e6,
+            "args": {"step": step},
+        }
+
+    def _write_metadata(self, pid: int, device_id: str | None) -> None:
+        events = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": pid,
+                "args": {"name": device_id or "default device"},
+            }
+        ]
+        for tid, track in enumerate(_TRACK_ORDER, start=1):
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": track},
+                }
+            )
+        for event in events:
+            self._write(event)
+
+
+def step_record(result, step: int, device_id: str | None = None) -> dict[str, Any]:
+    """
+    Flatten a StepResult into a JSON-serialisable dictionary.
+
+    Args:
+        result: The StepResult.
+        step: 1-based step number within the task.
+        device_id: Device the step ran on.
+
+    Returns:
+        Dictionary with the step's outcome, timings and stage offsets.
+    """
+    step_start = result.starts.get("total")
+    return {
+        "time": time.time(),
+        "step": step,
+        "device_id": device_id,
+        "success": result.success,
+        "finished": result.finished,
+        "action": result.action,
+        "message": result.message,
+        "prompt_tokens": result.prompt_tokens,
+        "completion_tokens": result.completion_tokens,
+        "cut_off": result.cut_off,
+        "timings": result.timings,
+        "offsets": {
+            stage: start - step_start
+            for stage, start in result.starts.items()
+            if step_start is not None
+        },
+    }
+
+
+def open_tracer(path: str, format: str | None = None) -> StepTracer:
+    """
+    Create a tracer for a file.
+
+    Args:
+        path: Output file.
+        format: "jsonl" or "chrome". None picks jsonl for a .jsonl file and
+            chrome otherwise.
+
+    Returns:
+        The tracer. Call close() when done.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if format is None:
+        format = "jsonl" if os.path.splitext(path)[1] == ".jsonl" else "chrome"
+    if format == "jsonl":
+        return JsonlTracer(path)
+    if format == "chrome":
+        return ChromeTracer(path)
+    raise ValueError(f"Unknown trace format: {format} (expected jsonl or chrome)")
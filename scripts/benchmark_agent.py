@@ -0,0 +1,566 @@
+"""Benchmark PhoneAgent step latency and throughput without a phone or GPU.
+
+A simulated device (an ADB transport that serves recorded screenshots and
+accepts input commands) and a local OpenAI-compatible mock server (streaming
+canned responses at a configurable token rate) are plugged into the real
+agent, so every stage except the device and the model runs as in production.
+"""
+
+import argparse
+import contextlib
+import dataclasses
+import glob
+import json
+import os
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phone_agent import PhoneAgent
+from phone_agent.adb import (
+    ImageEncoding,
+    SettleConfig,
+    set_persistent_shell,
+    set_transport,
+)
+from phone_agent.agent import AgentConfig, TaskUsage
+from phone_agent.config.apps import APP_PACKAGES
+from phone_agent.model import ModelConfig
+from phone_agent.model.history import estimate_message_tokens
+
+# Actions the mock model cycles through before finishing a task
+SCRIPTED_ACTIONS = [
+    'do(action="Tap", element=[500,500])',
+    'do(action="Swipe", start=[500,800], end=[500,200])',
+    'do(action="Tap", element=[200,300])',
+    'do(action="Back")',
+]
+
+# Shell commands that change what is on the screen
+_SCREEN_CHANGING = ("input ", "am start", "monkey ")
+
+
+class SimulatedDevice:
+    """
+    ADB transport that emulates one device from recorded screenshots.
+
+    Every input command advances to the next frame (cycling), so adaptive
+    settle detection and frame diffing see the screen change as on a real
+    device. Install it with phone_agent.adb.set_transport().
+
+    Args:
+        frames: PNG screenshots to serve, in order.
+        app: App name reported as the focused window.
+        capture_latency: Seconds each screenshot takes.
+        raw_capture_latency: Seconds each raw (`screencap` without -p) frame
+            takes, which skips the PNG compression on the device.
+        shell_latency: Seconds each other adb command takes.
+    """
+
+    name = "simulated"
+
+    def __init__(
+        self,
+        frames: list[bytes],
+        app: str = "WeChat",
+        capture_latency: float = 0.15,
+        raw_capture_latency: float = 0.05,
+        shell_latency: float = 0.03,
+    ):
+        if not frames:
+            raise ValueError("At least one frame is required")
+        self.frames = frames
+        self.package = APP_PACKAGES.get(app, "com.android.launcher")
+        self.capture_latency = capture_latency
+        self.raw_capture_latency = raw_capture_latency
+        self._raw_frames: dict[int, bytes] = {}
+        self.shell_latency = shell_latency
+        self.commands: list[str] = []
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def run(
+        self,
+        args: list[str],
+        device_id: str | None = None,
+        timeout: float | None = None,
+        text: bool = True,
+    ) -> subprocess.CompletedProcess:
+        """Run an adb command against the simulated device."""
+        command = " ".join(args[1:]) if args[:1] == ["shell"] else ""
+        with self._lock:
+            index = self._index % len(self.frames)
+            if command.startswith(_SCREEN_CHANGING):
+                self.commands.append(command)
+                self._index += 1
+
+        if args == ["exec-out", "screencap"]:
+            self._sleep(self.raw_capture_latency, args, timeout)
+            stdout = self._raw_frame(index)
+        elif args[:2] == ["exec-out", "screencap"]:
+            self._sleep(self.capture_latency, args, timeout)
+            stdout = self.frames[index]
+        else:
+            self._sleep(self.shell_latency, args, timeout)
+            stdout = self._shell_output(command).encode("utf-8")
+
+        if text:
+            stdout = stdout.decode("utf-8", errors="replace")
+        return subprocess.CompletedProcess(
+            ["adb"] + args, 0, stdout, "" if text else b""
+        )
+
+    def _sleep(self, latency: float, args: list[str], timeout: float | None) -> None:
+        """Take latency seconds, or time out like a real adb command."""
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise subprocess.TimeoutExpired(["adb"] + args, timeout)
+        time.sleep(latency)
+
+    def _raw_frame(self, index: int) -> bytes:
+        """A frame in the raw screencap format (Android 9+ header, RGBA_8888)."""
+        if index not in self._raw_frames:
+            image = Image.open(BytesIO(self.frames[index])).convert("RGBA")
+            header = struct.pack("<IIII", image.width, image.height, 1, 0)
+            self._raw_frames[index] = header + image.tobytes()
+        return self._raw_frames[index]
+
+    def _shell_output(self, command: str) -> str:
+        if "; " in command:
+            return "".join(self._shell_output(part) for part in command.split("; "))
+        if command.startswith("dumpsys window"):
+            return f"  mCurrentFocus=Window{{0 u0 {self.package}/.MainActivity}}\n"
+        if command.startswith("settings get"):
+            return "com.android.adbkeyboard/.AdbIME\n"
+        if command.startswith("am broadcast"):
+            return "Broadcasting: Intent\nBroadcast completed: result=0\n"
+        return ""
+
+
+class MockModelServer:
+    """
+    Local OpenAI-compatible chat completions server streaming canned answers.
+
+    The answer depends only on the number of assistant messages in the
+    request: the first steps - 1 answers cycle through SCRIPTED_ACTIONS and
+    the last one finishes the task. This assumes the full history is sent
+    (the default history policy).
+
+    Args:
+        steps: Steps per task.
+        ttft: Seconds before the first token.
+        tokens_per_sec: Generation speed. Each token is four characters.
+        thinking_tokens: Length of the thinking text before the action.
+        port: Port to listen on; 0 picks a free one.
+    """
+
+    def __init__(
+        self,
+        steps: int = 5,
+        ttft: float = 0.3,
+        tokens_per_sec: float = 50.0,
+        thinking_tokens: int = 60,
+        port: int = 0,
+    ):
+        self.steps = steps
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.thinking_tokens = thinking_tokens
+        self.requests = 0
+        self.cancelled = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        """API base URL for ModelConfig."""
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def start(self) -> None:
+        """Serve requests on a background thread."""
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        """Shut the server down."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def answer(self, step: int) -> str:
+        """Content the model streams at a 0-based step of a task."""
+        thinking = ("Looking at the screen. " * self.thinking_tokens)[
+            : self.thinking_tokens * 4
+        ]
+        if step >= self.steps - 1:
+            action = 'finish(message="Done")'
+        else:
+            action = SCRIPTED_ACTIONS[step % len(SCRIPTED_ACTIONS)]
+        return f"{thinking}\n{action}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length))
+                server.requests += 1
+                step = sum(
+                    1 for m in body.get("messages", []) if m["role"] == "assistant"
+                )
+                text = server.answer(step)
+                for stop in body.get("stop") or []:
+                    text = text.split(stop, 1)[0]
+                chunks = [text[i : i + 4] for i in range(0, len(text), 4)]
+                usage = None
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    prompt_tokens = sum(
+                        estimate_message_tokens(m) for m in body["messages"]
+                    )
+                    usage = {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(chunks),
+                        "total_tokens": prompt_tokens + len(chunks),
+                    }
+
+                time.sleep(server.ttft)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for content in chunks:
+                        self._send(_chunk(content))
+                        time.sleep(1 / server.tokens_per_sec)
+                    self._send(_chunk(None, finish_reason="stop"))
+                    if usage is not None:
+                        self._send(_usage_chunk(usage))
+                    self._send("[DONE]")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading once it had the action
+                    server.cancelled += 1
+
+            def _send(self, data: str) -> None:
+                event = f"data: {data}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def _chunk(content: str | None, finish_reason: str | None = None) -> str:
+    delta = {"content": content} if content is not None else {}
+    return json.dumps(
+        {
+            "id": "bench",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "mock",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+    )
+
+
+def _usage_chunk(usage: dict) -> str:
+    return json.dumps(
+        {
+            "id": "bench",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "mock",
+            "choices": [],
+            "usage": usage,
+        }
+    )
+
+
+def run_benchmark(
+    agent_config: AgentConfig,
+    model_config: ModelConfig,
+    tasks: int,
+    trace_memory: bool = False,
+) -> dict:
+    """
+    Run tasks through PhoneAgent and summarise per-stage timings.
+
+    Args:
+        agent_config: Agent configuration (device and model are simulated).
+        model_config: Model configuration pointing at the mock server.
+        tasks: Number of tasks to run.
+        trace_memory: Track Python heap allocations with tracemalloc. Slows
+            the run down, so stage timings are less representative.
+
+    Returns:
+        Report with steps, steps_per_sec, per-stage latency percentiles in
+        milliseconds, and memory use.
+    """
+    agent = PhoneAgent(model_config=model_config, agent_config=agent_config)
+    stages: dict[str, list[float]] = {}
+    steps = 0
+    usage = TaskUsage()
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        # The agent prints its progress; keep it out of the report
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for task_index in range(tasks):
+                agent.reset()
+                result = agent.step(f"Benchmark task {task_index}")
+                while True:
+                    steps += 1
+                    for stage, seconds in result.timings.items():
+                        stages.setdefault(stage, []).append(seconds)
+                    if result.finished or agent.step_count >= agent_config.max_steps:
+                        break
+                    result = agent.step()
+                for name in (f.name for f in dataclasses.fields(TaskUsage)):
+                    total = getattr(usage, name) + getattr(agent.usage, name)
+                    setattr(usage, name, total)
+    finally:
+        wall_time = time.perf_counter() - start
+        heap_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+        agent.close()
+
+    report = {
+        "tasks": tasks,
+        "steps": steps,
+        "wall_time": wall_time,
+        "steps_per_sec": steps / wall_time if wall_time > 0 else 0.0,
+        "stages": {stage: _summarize(samples) for stage, samples in stages.items()},
+        "usage": usage.as_dict(),
+        "memory": {"heap_peak_mb": heap_peak / 2**20 if heap_peak else None},
+    }
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        scale = 2**20 if sys.platform == "darwin" else 2**10
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["memory"]["max_rss_mb"] = rss / scale
+    return report
+
+
+def _summarize(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def print_report(report: dict) -> None:
+    """Print a report as a table."""
+    print("=" * 72)
+    print(
+        f"Tasks: {report['tasks']}, steps: {report['steps']}, "
+        f"wall time: {report['wall_time']:.2f}s, "
+        f"steps/sec: {report['steps_per_sec']:.2f}"
+    )
+    print("-" * 72)
+    print(
+        f"{'stage':<14}{'count':>8}{'mean ms':>12}{'p50 ms':>12}{'p95 ms':>12}{'max ms':>12}"
+    )
+    print("-" * 72)
+    for stage, summary in report["stages"].items():
+        print(
+            f"{stage:<14}{summary['count']:>8}{summary['mean_ms']:>12.1f}"
+            f"{summary['p50_ms']:>12.1f}{summary['p95_ms']:>12.1f}"
+            f"{summary['max_ms']:>12.1f}"
+        )
+    print("-" * 72)
+    usage = report["usage"]
+    print(
+        f"Model calls: {usage['model_calls']}, prompt tokens: "
+        f"{usage['prompt_tokens']}, completion tokens: "
+        f"{usage['completion_tokens']} ({usage['estimated_calls']} estimated), "
+        f"streams cut off: {usage['cut_off_calls']}"
+    )
+    print(
+        f"Mean TTFT: {usage['mean_time_to_first_token'] * 1000:.1f} ms, "
+        f"inter-token latency: {usage['mean_inter_token_latency'] * 1000:.1f} ms"
+    )
+    memory = report["memory"]
+    if memory.get("max_rss_mb") is not None:
+        print(f"Max RSS: {memory['max_rss_mb']:.1f} MB")
+    if memory.get("heap_peak_mb") is not None:
+        print(f"Python heap peak: {memory['heap_peak_mb']:.1f} MB")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure PhoneAgent step latency and throughput against a "
+        "simulated device and a mock model server",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Usage examples:
+  python scripts/benchmark_agent.py
+  python scripts/benchmark_agent.py --tasks 5 --steps 8 --adaptive-settle
+  python scripts/benchmark_agent.py --adaptive-settle --pipelined
+  python scripts/benchmark_agent.py --ttft 0.8 --token-rate 30 --json report.json
+        """,
+    )
+
+    parser.add_argument(
+        "frames",
+        nargs="*",
+        help="PNG frames the device serves (default: resources/screenshot-*.png)",
+    )
+    parser.add_argument(
+        "--tasks", type=int, default=3, help="Tasks to run (default: 3)"
+    )
+    parser.add_argument(
+        "--steps", type=int, default=5, help="Steps per task (default: 5)"
+    )
+    parser.add_argument(
+        "--ttft",
+        type=float,
+        default=0.3,
+        help="Mock model seconds to first token (default: 0.3)",
+    )
+    parser.add_argument(
+        "--token-rate",
+        type=float,
+        default=50.0,
+        help="Mock model tokens per second (default: 50)",
+    )
+    parser.add_argument(
+        "--thinking-tokens",
+        type=int,
+        default=60,
+        help="Tokens of thinking before each action (default: 60)",
+    )
+    parser.add_argument(
+        "--capture-latency",
+        type=float,
+        default=0.15,
+        help="Simulated seconds per screenshot (default: 0.15)",
+    )
+    parser.add_argument(
+        "--raw-capture-latency",
+        type=float,
+        default=0.05,
+        help="Simulated seconds per raw settle-probe frame (default: 0.05)",
+    )
+    parser.add_argument(
+        "--shell-latency",
+        type=float,
+        default=0.03,
+        help="Simulated seconds per other adb command (default: 0.03)",
+    )
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="Reuse the last settle frame as the next screenshot (with "
+        "--adaptive-settle)",
+    )
+    parser.add_argument(
+        "--adaptive-settle",
+        action="store_true",
+        help="Detect settling after actions instead of sleeping --settle-delay",
+    )
+    parser.add_argument(
+        "--settle-delay",
+        type=float,
+        default=1.0,
+        help="Fixed settle delay in seconds (default: 1.0)",
+    )
+    parser.add_argument(
+        "--image-format",
+        default="png",
+        help="Screenshot encoding sent to the model (default: png)",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Also report the Python heap peak (slows the run down)",
+    )
+    parser.add_argument(
+        "--json", metavar="FILE", help="Also write the report as JSON to FILE"
+    )
+
+    args = parser.parse_args()
+
+    paths = args.frames or sorted(glob.glob("resources/screenshot-*.png"))
+    if not paths:
+        print("Error: No frames found")
+        exit(1)
+
+    frames = []
+    for path in paths:
+        with open(path, "rb") as f:
+            frames.append(f.read())
+
+    server = MockModelServer(
+        steps=args.steps,
+        ttft=args.ttft,
+        tokens_per_sec=args.token_rate,
+        thinking_tokens=args.thinking_tokens,
+    )
+    server.start()
+
+    set_transport(
+        SimulatedDevice(
+            frames,
+            capture_latency=args.capture_latency,
+            raw_capture_latency=args.raw_capture_latency,
+            shell_latency=args.shell_latency,
+        )
+    )
+    set_persistent_shell(False)
+
+    agent_config = AgentConfig(
+        max_steps=args.steps * 2,
+        device_id="simulated",
+        verbose=False,
+        pipelined=args.pipelined,
+        settle_delay=args.settle_delay,
+        settle_config=SettleConfig() if args.adaptive_settle else None,
+        image_encoding=ImageEncoding(format=args.image_format),
+    )
+    model_config = ModelConfig(base_url=server.base_url, model_name="mock")
+
+    print(
+        f"Frames: {len(frames)}, model: ttft {args.ttft}s, "
+        f"{args.token_rate} tokens/s, device: capture {args.capture_latency}s"
+    )
+    try:
+        report = run_benchmark(
+            agent_config, model_config, args.tasks, trace_memory=args.trace_memory
+        )
+    finally:
+        server.stop()
+
+    report["model_requests"] = server.requests
+    report["streams_cancelled"] = server.cancelled
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
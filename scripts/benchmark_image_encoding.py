@@ -0,0 +1,112 @@
+"""Benchmark screenshot encoding policies (payload size and encode time)."""
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phone_agent.adb.screenshot import ImageEncoding, screenshot_from_png
+
+DEFAULT_POLICIES = [
+    "png",
+    "png:1280",
+    "jpeg:1280:85",
+    "jpeg:1024:75",
+    "webp:1280:85",
+    "webp:1024:75",
+]
+
+
+def parse_policy(spec: str) -> ImageEncoding:
+    """Parse a policy spec of the form format[:max_long_edge[:quality]]."""
+    parts = spec.split(":")
+    encoding = ImageEncoding(format=parts[0])
+    if len(parts) > 1 and parts[1]:
+        encoding.max_long_edge = int(parts[1])
+    if len(parts) > 2 and parts[2]:
+        encoding.quality = int(parts[2])
+    return encoding
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure payload bytes and encode time per screenshot encoding policy",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Usage examples:
+  python scripts/benchmark_image_encoding.py
+  python scripts/benchmark_image_encoding.py frames/*.png --policy png --policy jpeg:1024:80
+        """,
+    )
+
+    parser.add_argument(
+        "frames",
+        nargs="*",
+        help="PNG frames to encode (default: resources/screenshot-*.png)",
+    )
+
+    parser.add_argument(
+        "--policy",
+        action="append",
+        help="Policy as format[:max_long_edge[:quality]], may be repeated "
+        f"(default: {', '.join(DEFAULT_POLICIES)})",
+    )
+
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Encodes per frame and policy (default: 5)",
+    )
+
+    args = parser.parse_args()
+
+    frames = args.frames or sorted(glob.glob("resources/screenshot-*.png"))
+    if not frames:
+        print("Error: No frames found")
+        exit(1)
+
+    images = []
+    for path in frames:
+        with open(path, "rb") as f:
+            images.append(f.read())
+
+    policies = args.policy or DEFAULT_POLICIES
+
+    print(f"Frames: {len(images)}, repeats: {args.repeat}")
+    print("=" * 72)
+    print(
+        f"{'policy':<16}{'avg bytes':>12}{'avg base64':>12}{'ratio':>8}"
+        f"{'avg ms':>10}{'p95 ms':>10}"
+    )
+    print("-" * 72)
+
+    baseline_bytes = None
+    for spec in policies:
+        encoding = parse_policy(spec)
+        sizes = []
+        timings = []
+        for data in images:
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                screenshot = screenshot_from_png(data, encoding)
+                timings.append((time.perf_counter() - start) * 1000)
+            sizes.append(len(screenshot.base64_data))
+
+        avg_base64 = statistics.mean(sizes)
+        avg_bytes = avg_base64 * 3 / 4
+        if baseline_bytes is None:
+            baseline_bytes = avg_bytes
+        p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+
+        print(
+            f"{spec:<16}{avg_bytes:>12.0f}{avg_base64:>12.0f}"
+            f"{avg_bytes / baseline_bytes:>8.2f}"
+            f"{statistics.mean(timings):>10.2f}{p95:>10.2f}"
+        )
+
+    print("=" * 72)
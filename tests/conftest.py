@@ -0,0 +1,13 @@
+import pytest
+from fake_adb_server import FakeADBServer, FakeDevice
+
+
+@pytest.fixture
+def adb_device() -> FakeDevice:
+    return FakeDevice()
+
+
+@pytest.fixture
+def adb_server(adb_device):
+    with FakeADBServer([adb_device]) as server:
+        yield server
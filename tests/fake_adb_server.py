@@ -0,0 +1,196 @@
+"""A stand-in for the adb server that speaks the host protocol on localhost."""
+
+import socket
+import socketserver
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class FakeDevice:
+    """
+    State of one device behind the fake server.
+
+    Args:
+        serial: Device serial.
+        shell_v2: Whether the device advertises the shell_v2 feature.
+        shell: Shell command line -> (exit status, stdout, stderr).
+        exec_out: exec: command line -> raw output.
+        files: Device path -> contents, served over sync:.
+    """
+
+    serial: str = "emulator-5554"
+    shell_v2: bool = True
+    shell: dict[str, tuple[int, bytes, bytes]] = field(default_factory=dict)
+    exec_out: dict[str, bytes] = field(default_factory=dict)
+    files: dict[str, bytes] = field(default_factory=dict)
+
+
+class FakeADBServer:
+    """
+    Serves the adb host protocol for a set of FakeDevices.
+
+    Every request is logged in requests, and the number of sync: connections
+    opened in sync_connections. stall_seconds delays every device service
+    answer, to exercise timeouts.
+    """
+
+    VERSION = 41
+
+    def __init__(self, devices: list[FakeDevice] | None = None):
+        self.devices = {d.serial: d for d in devices or [FakeDevice()]}
+        self.requests: list[str] = []
+        self.sync_connections = 0
+        self.stall_seconds = 0.0
+
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                try:
+                    server._handle(self.request)
+                except (ConnectionError, OSError):
+                    pass
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeADBServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handle(self, sock: socket.socket) -> None:
+        device = None
+        while True:
+            request = _read_request(sock)
+            if request is None:
+                return
+            self.requests.append(request)
+
+            if device is not None:
+                self._device_service(sock, device, request)
+                return
+
+            if request == "host:version":
+                _okay(sock, f"{self.VERSION:04x}".encode())
+            elif request in ("host:devices", "host:devices-l"):
+                lines = [f"{serial}\tdevice" for serial in self.devices]
+                _okay(sock, "\n".join(lines).encode())
+            elif request.endswith(":features"):
+                target = self._find(request)
+                if target is None:
+                    _fail(sock, "device not found")
+                else:
+                    _okay(sock, b"shell_v2,cmd" if target.shell_v2 else b"cmd")
+            elif request.startswith("host:connect:"):
+                _okay(sock, f"connected to {request[13:]}".encode())
+            elif request.startswith("host:disconnect:"):
+                _okay(sock, f"disconnected {request[16:]}".encode())
+            elif request == "host:kill":
+                sock.sendall(b"OKAY")
+            elif request.startswith("host:transport"):
+                device = self._find(request)
+                if device is None:
+                    _fail(sock, "device not found")
+                    return
+                sock.sendall(b"OKAY")
+            else:
+                _fail(sock, f"unknown host service {request}")
+                return
+
+            if not request.startswith("host:transport"):
+                return
+
+    def _find(self, request: str) -> FakeDevice | None:
+        if request in ("host:transport-any", "host:features"):
+            return next(iter(self.devices.values())) if self.devices else None
+        for serial, device in self.devices.items():
+            if request in (
+                f"host:transport:{serial}",
+                f"host-serial:{serial}:features",
+            ):
+                return device
+        return None
+
+    def _device_service(self, sock: socket.socket, device: FakeDevice, request: str):
+        time.sleep(self.stall_seconds)
+
+        if request.startswith("shell,v2,raw:"):
+            if not device.shell_v2:
+                _fail(sock, "closed")
+                return
+            returncode, stdout, stderr = device.shell.get(request[13:], (0, b"", b""))
+            sock.sendall(b"OKAY")
+            for packet_id, payload in ((1, stdout), (2, stderr)):
+                if payload:
+                    sock.sendall(bytes([packet_id]) + struct.pack("<I", len(payload)))
+                    sock.sendall(payload)
+            sock.sendall(bytes([3]) + struct.pack("<I", 1) + bytes([returncode]))
+        elif request.startswith("shell:"):
+            _, stdout, stderr = device.shell.get(request[6:], (0, b"", b""))
+            sock.sendall(b"OKAY" + stdout + stderr)
+        elif request.startswith("exec:"):
+            sock.sendall(b"OKAY" + device.exec_out.get(request[5:], b""))
+        elif request.startswith("tcpip:"):
+            sock.sendall(
+                b"OKAY" + f"restarting in TCP mode port: {request[6:]}\n".encode()
+            )
+        elif request == "sync:":
+            self.sync_connections += 1
+            sock.sendall(b"OKAY")
+            self._sync(sock, device)
+        else:
+            _fail(sock, f"unknown device service {request}")
+
+    def _sync(self, sock: socket.socket, device: FakeDevice) -> None:
+        while True:
+            header = _read_exactly(sock, 8)
+            if header is None:
+                return
+            packet_id, length = header[:4], struct.unpack("<I", header[4:])[0]
+            if packet_id == b"QUIT":
+                return
+            path = _read_exactly(sock, length).decode()
+            data = device.files.get(path)
+            if data is None:
+                message = b"No such file or directory"
+                sock.sendall(b"FAIL" + struct.pack("<I", len(message)) + message)
+                continue
+            for offset in range(0, len(data), 4096):
+                chunk = data[offset : offset + 4096]
+                sock.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+            sock.sendall(b"DONE" + struct.pack("<I", 0))
+
+
+def _read_exactly(sock: socket.socket, size: int) -> bytes | None:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _read_request(sock: socket.socket) -> str | None:
+    length = _read_exactly(sock, 4)
+    if length is None:
+        return None
+    return _read_exactly(sock, int(length, 16)).decode()
+
+
+def _okay(sock: socket.socket, payload: bytes) -> None:
+    sock.sendall(b"OKAY" + f"{len(payload):04x}".encode() + payload)
+
+
+def _fail(sock: socket.socket, message: str) -> None:
+    data = message.encode()
+    sock.sendall(b"FAIL" + f"{len(data):04x}".encode() + data)
@@ -0,0 +1,25 @@
+import base64
+import shlex
+
+from phone_agent.adb.input import _deliver_command, _type_command
+
+
+def _message(command: str) -> str:
+    args = shlex.split(command)
+    return args[args.index("msg") + 1]
+
+
+def test_type_command_encodes_text():
+    message = _message(_type_command("héllo wörld"))
+
+    assert base64.b64decode(message).decode("utf-8") == "héllo wörld"
+
+
+def test_type_command_passes_empty_text_as_an_empty_extra():
+    assert _message(_type_command("")) == ""
+
+
+def test_deliver_command_with_empty_text_ends_with_the_type_broadcast():
+    args = shlex.split(_deliver_command(""))
+
+    assert args[-4:] == ["ADB_INPUT_B64", "--es", "msg", ""]
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from phone_agent.actions.handler import ActionResult, AsyncActionHandler
+from phone_agent.adb.screenshot import Screenshot
+from phone_agent.agent import AgentConfig, Observation, PhoneAgent
+from phone_agent.model.client import ModelResponse
+
+
+class FinishingClient:
+    """Stands in for ModelClient, finishing the task on the first step."""
+
+    def request(self, messages):
+        return ModelResponse(
+            thinking="", action='finish(message="Done")', raw_content=""
+        )
+
+    def complete_usage(self, response):
+        return response
+
+
+def _failing_restore():
+    raise ConnectionError("device offline")
+
+
+def _agent() -> PhoneAgent:
+    agent = PhoneAgent(agent_config=AgentConfig(lang="en", verbose=False))
+    agent.model_client = FinishingClient()
+    agent._capture_observation = lambda: Observation(
+        Screenshot(base64_data="c2NyZWVu", width=1080, height=2400), "Settings"
+    )
+    agent.action_handler.execute = lambda action, *args, **kwargs: ActionResult(
+        success=True, should_finish=True, message=action.get("message")
+    )
+    agent.action_handler.keyboard.restore = _failing_restore
+    return agent
+
+
+def test_keyboard_error_does_not_replace_the_task_result(capsys):
+    assert _agent().run("Open settings") == "Done"
+    assert "device offline" in capsys.readouterr().out
+
+
+def test_keyboard_error_does_not_replace_the_task_error():
+    agent = _agent()
+
+    def lost():
+        raise RuntimeError("screenshot failed")
+
+    agent._capture_observation = lost
+
+    with pytest.raises(RuntimeError, match="screenshot failed"):
+        agent.run("Open settings")
+
+
+def test_async_keyboard_error_is_not_raised():
+    handler = AsyncActionHandler()
+
+    async def failing_restore():
+        _failing_restore()
+
+    handler.keyboard.restore = failing_restore
+
+    asyncio.run(handler.release_keyboard())
@@ -0,0 +1,28 @@
+from phone_agent.model.client import ImageHistory, MessageBuilder, _image_bytes
+
+
+def _image_message(size: int) -> dict:
+    return {
+        "role": "user",
+        "content": [
+            {"type": "image_url", "image_url": {"url": "x" * size}},
+            {"type": "text", "text": "screen"},
+        ],
+    }
+
+
+def test_compact_images_drops_everything_older_than_the_first_drop():
+    context = [_image_message(size) for size in (20, 30, 40, 45)]
+    context.append({"role": "assistant", "content": "do(action=...)"})
+
+    MessageBuilder.compact_images(context, ImageHistory(keep=3, max_bytes=90))
+
+    assert [_image_bytes(m) for m in context[:4]] == [0, 0, 40, 45]
+
+
+def test_compact_images_keeps_the_most_recent():
+    context = [_image_message(10) for _ in range(5)]
+
+    MessageBuilder.compact_images(context, ImageHistory(keep=3, max_bytes=1000))
+
+    assert [_image_bytes(m) for m in context] == [0, 0, 10, 10, 10]
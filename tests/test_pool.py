@@ -0,0 +1,49 @@
+import asyncio
+
+from phone_agent import metrics
+from phone_agent.model.pool import Endpoint, EndpointPool, EndpointState
+
+
+def test_async_client_per_event_loop():
+    state = EndpointState(Endpoint("http://127.0.0.1:1/v1"))
+
+    async def client():
+        assert state.async_client is state.async_client
+        return state.async_client
+
+    first = asyncio.run(client())
+    second = asyncio.run(client())
+    assert first is not second
+    # The client of the first, closed loop was dropped
+    assert list(state._async_clients.values()) == [second]
+
+
+def _pool(policy: str = "least_outstanding", count: int = 2) -> EndpointPool:
+    endpoints = [Endpoint(f"http://127.0.0.1:{port}/v1") for port in range(count)]
+    return EndpointPool(endpoints, policy)
+
+
+def test_latency_weighted_spreads_load_onto_an_unsampled_endpoint():
+    pool = _pool("latency_weighted")
+    sampled, fresh = pool.endpoints
+    sampled.latency = 0.5
+
+    chosen = [pool.acquire() for _ in range(4)]
+    # Without samples, the new endpoint is weighed by the median latency and
+    # still pays for its outstanding requests, instead of taking all of them
+    assert chosen.count(fresh) == 2
+    assert chosen.count(sampled) == 2
+
+
+def test_outstanding_gauge_when_metrics_start_mid_request():
+    pool = _pool()
+    state = pool.acquire()
+    url = state.endpoint.base_url
+    metrics.set_metrics_enabled(True)
+    try:
+        pool.release(state, success=True)
+        assert metrics.MODEL_OUTSTANDING.value(endpoint=url) == 0
+        pool.acquire(exclude={e for e in pool.endpoints if e is not state})
+        assert metrics.MODEL_OUTSTANDING.value(endpoint=url) == 1
+    finally:
+        metrics.set_metrics_enabled(False)
@@ -0,0 +1,50 @@
+from phone_agent.adb.screenshot import Screenshot
+from phone_agent.replay import (
+    ReplaySession,
+    Trajectory,
+    TrajectoryCache,
+    TrajectoryStep,
+)
+
+TASK = "Open settings"
+
+
+def _screen(value: int = 0) -> Screenshot:
+    screenshot = Screenshot(base64_data="", width=1080, height=2400)
+    screenshot._blocks = bytes([value]) * 512
+    return screenshot
+
+
+def _store(cache: TrajectoryCache, *actions: str) -> None:
+    steps = [
+        TrajectoryStep(action, "", "Settings", _screen().blocks.hex())
+        for action in actions
+    ]
+    cache.store(Trajectory(TASK, 1080, 2400, steps))
+
+
+def test_replays_matching_steps(tmp_path):
+    cache = TrajectoryCache(str(tmp_path))
+    _store(cache, 'do(action="Back")', 'do(action="Home")')
+    session = ReplaySession(cache, TASK)
+
+    step = session.next_step(_screen(), "Settings")
+    assert step.action == 'do(action="Back")'
+    session.record(_screen(), "Settings", step.action, "")
+
+    assert session.next_step(_screen(255), "Settings") is None
+    assert session.diverged
+
+
+def test_finish_and_take_over_are_not_replayed(tmp_path):
+    cache = TrajectoryCache(str(tmp_path))
+    take_over = 'do(action="Take_over", message="Log in")'
+    _store(cache, take_over, 'finish(message="The battery is at 80%")')
+    session = ReplaySession(cache, TASK)
+
+    assert session.next_step(_screen(), "Settings") is None
+    session.record(_screen(), "Settings", take_over, "")
+    assert session.next_step(_screen(), "Settings") is None
+    assert not session.diverged
+    assert cache.stats.steps_replayed == 0
+    assert cache.stats.model_steps == 2
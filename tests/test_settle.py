@@ -0,0 +1,63 @@
+import asyncio
+import struct
+import time
+
+import pytest
+
+from phone_agent.adb import (
+    SettleConfig,
+    set_transport,
+    wait_for_settle,
+    wait_for_settle_async,
+)
+from phone_agent.adb.socket_client import SocketTransport
+
+FAST = SettleConfig(stable_ms=50, timeout=0.5, poll_interval=0.01, min_wait=0.1)
+
+
+def _raw_frame(value: int, width: int = 32, height: int = 64) -> bytes:
+    header = struct.pack("<IIII", width, height, 1, 0)
+    return header + bytes([value, value, value, 255]) * (width * height)
+
+
+@pytest.fixture
+def transport(adb_server):
+    transport = SocketTransport(port=adb_server.port)
+    set_transport(transport)
+    yield transport
+    set_transport("subprocess")
+
+
+def test_static_screen_settles_after_min_wait(transport, adb_device):
+    adb_device.exec_out["screencap"] = _raw_frame(128)
+
+    result = wait_for_settle(config=FAST)
+    assert result.settled
+    assert FAST.min_wait <= result.elapsed < FAST.timeout
+    assert (result.frame.width, result.frame.height) == (32, 64)
+
+
+def test_slow_capture_is_cut_off_at_the_timeout(transport, adb_server, adb_device):
+    adb_device.exec_out["screencap"] = _raw_frame(128)
+    adb_server.stall_seconds = 2.0
+
+    start = time.perf_counter()
+    result = wait_for_settle(config=FAST)
+    assert not result.settled
+    assert result.supported
+    assert time.perf_counter() - start < FAST.timeout + 0.2
+
+
+def test_device_without_raw_frames_is_unsupported(transport):
+    result = wait_for_settle(config=FAST)
+    assert not result.settled
+    assert not result.supported
+
+
+def test_async_wait_stops_at_the_timeout(transport, adb_server, adb_device):
+    adb_device.exec_out["screencap"] = _raw_frame(128)
+    adb_server.stall_seconds = 2.0
+
+    result = asyncio.run(wait_for_settle_async(config=FAST))
+    assert not result.settled
+    assert result.elapsed < FAST.timeout + 0.2
@@ -0,0 +1,132 @@
+import asyncio
+import subprocess
+
+import pytest
+
+from phone_agent import metrics
+from phone_agent.adb import run_adb, run_adb_async, set_transport
+from phone_agent.adb.socket_client import (
+    ADBProtocolError,
+    SocketTransport,
+    parse_shell_v2,
+)
+
+
+@pytest.fixture
+def transport(adb_server):
+    transport = SocketTransport(port=adb_server.port)
+    set_transport(transport)
+    yield transport
+    set_transport("subprocess")
+
+
+def test_version_and_devices(transport):
+    result = transport.run(["version"])
+    assert result.returncode == 0
+    assert result.stdout == "Android Debug Bridge version 1.0.41\n"
+
+    result = transport.run(["devices"])
+    assert result.stdout == "List of devices attached\nemulator-5554\tdevice\n"
+
+
+def test_shell_reports_exit_status_and_stderr(transport, adb_device):
+    adb_device.shell["ls /missing"] = (1, b"", b"ls: /missing: No such file\n")
+    adb_device.shell["echo hi"] = (0, b"hi\n", b"")
+
+    result = transport.run(["shell", "ls", "/missing"])
+    assert result.returncode == 1
+    assert result.stdout == ""
+    assert result.stderr == "ls: /missing: No such file\n"
+
+    result = transport.run(["shell", "echo", "hi"], device_id="emulator-5554")
+    assert (result.returncode, result.stdout) == (0, "hi\n")
+
+
+def test_shell_without_v2_merges_output(transport, adb_server, adb_device):
+    adb_device.shell_v2 = False
+    adb_device.shell["false"] = (1, b"out\n", b"err\n")
+
+    result = transport.run(["shell", "false"])
+    assert (result.returncode, result.stdout, result.stderr) == (0, "out\nerr\n", "")
+    assert "shell:false" in adb_server.requests
+
+
+def test_features_are_queried_once(transport, adb_server):
+    for _ in range(3):
+        transport.run(["shell", "true"])
+    assert adb_server.requests.count("host:features") == 1
+
+
+def test_exec_out_is_binary_safe(transport, adb_device):
+    data = bytes(range(256)) * 4
+    adb_device.exec_out["screencap -p"] = data
+
+    result = transport.run(["exec-out", "screencap", "-p"], text=False)
+    assert result.returncode == 0
+    assert result.stdout == data
+
+
+def test_pull_reuses_sync_connection(transport, adb_server, adb_device, tmp_path):
+    adb_device.files["/sdcard/a.png"] = b"a" * 10000
+    adb_device.files["/sdcard/b.png"] = b"b"
+
+    for name in ("a", "b"):
+        target = tmp_path / f"{name}.png"
+        result = transport.run(["pull", f"/sdcard/{name}.png", str(target)])
+        assert result.returncode == 0
+        assert target.read_bytes() == adb_device.files[f"/sdcard/{name}.png"]
+    assert adb_server.sync_connections == 1
+
+
+def test_pull_missing_file_fails(transport, tmp_path):
+    result = transport.run(["pull", "/sdcard/none.png", str(tmp_path / "x")])
+    assert result.returncode == 1
+    assert "No such file" in result.stderr
+
+
+def test_unknown_device_fails(transport):
+    result = transport.run(["exec-out", "echo"], device_id="missing")
+    assert result.returncode == 1
+    assert "device not found" in result.stderr
+
+
+def test_timeout(transport, adb_server):
+    adb_server.stall_seconds = 1.0
+    with pytest.raises(subprocess.TimeoutExpired):
+        transport.run(["exec-out", "echo"], timeout=0.2)
+
+
+def test_unmapped_command_falls_back(transport):
+    calls = []
+
+    class Fallback:
+        def run(self, args, device_id=None, timeout=None, text=True):
+            calls.append(args)
+            return subprocess.CompletedProcess(["adb"] + args, 0, "", "")
+
+    transport.fallback = Fallback()
+    assert transport.run(["install", "app.apk"]).returncode == 0
+    assert calls == [["install", "app.apk"]]
+
+
+def test_failed_shell_counts_exit_error(transport, adb_device):
+    adb_device.shell["false"] = (1, b"", b"")
+    metrics.set_metrics_enabled(True)
+    try:
+        before = metrics.ADB_ERRORS.value(command="shell", kind="exit")
+        assert run_adb(["shell", "false"]).returncode == 1
+        assert metrics.ADB_ERRORS.value(command="shell", kind="exit") == before + 1
+    finally:
+        metrics.set_metrics_enabled(False)
+
+
+def test_async_shell_reports_exit_status(transport, adb_device):
+    adb_device.shell["exit 3"] = (3, b"", b"bye\n")
+
+    result = asyncio.run(run_adb_async(["shell", "exit", "3"], timeout=5))
+    assert (result.returncode, result.stderr) == (3, "bye\n")
+
+
+def test_parse_shell_v2_requires_exit_packet():
+    with pytest.raises(ADBProtocolError):
+        parse_shell_v2(b"\x01\x02\x00\x00\x00hi")
@@ -0,0 +1,78 @@
+import copy
+import json
+
+import pytest
+
+from phone_agent.actions.handler import ActionResult
+from phone_agent.adb.screenshot import Screenshot
+from phone_agent.agent import AgentConfig, Observation, PhoneAgent
+from phone_agent.config import prompts_en
+from phone_agent.model.client import ModelResponse
+from phone_agent.model.history import LastTurns
+
+ACTIONS = ['do(action="Back")', 'do(action="Home")', 'finish(message="Done")']
+
+
+class RecordingClient:
+    """Stands in for ModelClient, keeping the messages of every request."""
+
+    def __init__(self):
+        self.requests: list[list[dict]] = []
+
+    def request(self, messages):
+        self.requests.append(copy.deepcopy(messages))
+        step = sum(1 for m in messages if m["role"] == "assistant")
+        return ModelResponse(thinking="", action=ACTIONS[step], raw_content="")
+
+    def complete_usage(self, response):
+        return response
+
+
+def _agent() -> PhoneAgent:
+    agent = PhoneAgent(
+        agent_config=AgentConfig(lang="en", stable_prefix=True, verbose=False)
+    )
+    agent.model_client = RecordingClient()
+    agent._capture_observation = lambda: Observation(
+        Screenshot(base64_data="c2NyZWVu", width=1080, height=2400), "Settings"
+    )
+    agent.action_handler.execute = lambda action, *args, **kwargs: ActionResult(
+        success=True, should_finish=action.get("_metadata") == "finish"
+    )
+    return agent
+
+
+def _dump(messages) -> str:
+    return json.dumps(messages, ensure_ascii=False, sort_keys=True)
+
+
+def test_each_request_extends_the_previous_one():
+    agent = _agent()
+    agent.run("Open settings")
+
+    requests = agent.model_client.requests
+    assert len(requests) == len(ACTIONS)
+    for previous, current in zip(requests, requests[1:]):
+        assert _dump(current[: len(previous)]) == _dump(previous)
+
+
+def test_system_prompt_is_shared_across_tasks_and_days(monkeypatch):
+    agent = _agent()
+    agent.run("Open settings")
+    agent.run("Turn on wifi")
+
+    monkeypatch.setattr(prompts_en, "format_date", lambda: "2031-01-01, Wednesday")
+    other_day = _agent()
+    other_day.run("Open settings")
+
+    first, second = agent.model_client.requests[0], agent.model_client.requests[3]
+    assert _dump(first[0]) == _dump(second[0])
+    assert _dump(first[0]) == _dump(other_day.model_client.requests[0][0])
+    assert prompts_en.DATE_PREFIX not in first[0]["content"]
+    # The date moves into the task message instead
+    assert "2031-01-01" in other_day.model_client.requests[0][1]["content"][-1]["text"]
+
+
+def test_stable_prefix_rejects_rewriting_history():
+    with pytest.raises(ValueError):
+        AgentConfig(stable_prefix=True, history=LastTurns())